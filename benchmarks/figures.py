@@ -0,0 +1,92 @@
+"""
+Compares building each output figure with plotly express on every request against
+filling in a prebuilt skeleton with the figure factory in src.utils.figures.
+
+Run from the repository root with:
+
+    python -m benchmarks.figures
+"""
+import timeit
+import numpy as np
+import plotly.express as px
+from src.utils.figures import FIGURES, skeleton, figure_layout, build_figure
+
+
+def sample_data() -> dict:
+    """
+    Data the size of a typical Submit click for each figure.
+
+    Returns:
+        dict: For each name in FIGURES, (x, y, layout)
+    """
+
+    return {
+        'roll-prob': (np.arange(1, 101), np.linspace(0, 100, 100), figure_layout('roll-prob', star=2, name='Unit')),
+        'n-other': (np.arange(9, 0, -1).astype(str), np.linspace(30, 60, 9), figure_layout('n-other', name='Unit')),
+        'n-pool': (np.arange(119, 9, -1), np.linspace(20, 40, 110), figure_layout('n-pool', cost=4)),
+    }
+
+
+def express_figure(name:str, x, y, layout:dict):
+    """
+    How the figures were built before the factory: plotly express, then the styling
+    applied with update_layout and update_traces on every call.
+
+    Args:
+        name (str): One of FIGURES
+        x (array-like): x values
+        y (array-like): y values
+        layout (dict): Dotted layout paths and their text
+
+    Returns:
+        plotly.graph_objects._figure.Figure: The styled figure
+    """
+
+    styled = skeleton(name)
+    style = { key: value for key, value in styled['data'][0].items() if key not in ('x', 'y', 'type') }
+
+    # the named template, as the styling code passes it, not the expanded one in the skeleton
+    fig = px.bar(x=x, y=y)
+    fig.update_layout({ key: value for key, value in styled['layout'].items() if key != 'template' }, template='simple_white')
+    fig.update_layout({ path.replace('.', '_'): value for path, value in layout.items() })
+    fig.update_traces(**style)
+
+    return fig
+
+
+def build_time(build, number:int=20) -> float:
+    """
+    Seconds per call of build.
+
+    Args:
+        build (callable): Called without arguments
+        number (int): Number of calls to time
+
+    Returns:
+        float: Best seconds per call over 3 repeats
+    """
+
+    return min(timeit.repeat(build, number=number, repeat=3)) / number
+
+
+def main() -> dict:
+    # skeletons are built at startup, not per request
+    skeleton(FIGURES[0])
+
+    results = {}
+
+    for name, (x, y, layout) in sample_data().items():
+        results[name] = {
+            'express_ms': build_time(lambda: express_figure(name, x, y, layout)) * 1e3,
+            'factory_ms': build_time(lambda: build_figure(name, x=x, y=y, layout=layout)) * 1e3,
+        }
+
+    for name, result in results.items():
+        speedup = result['express_ms'] / result['factory_ms']
+        print(f"{name:>10}: {result['express_ms']:7.2f} ms express, {result['factory_ms']:6.2f} ms factory ({speedup:.0f}x)")
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Load test of the Submit callback under different gunicorn worker/thread configurations.
+Each configuration starts src.app:server with gunicorn on offline fixture data, replays
+a mix of Submit clicks (different units, costs, levels, star targets and contested
+counts, with the repeats real traffic has) against /_dash-update-component from
+concurrent clients, and reports throughput, latency percentiles and the memory of every
+worker. RSS counts pages shared with the master and other workers in full; PSS splits
+shared pages between the processes sharing them, and USS counts only private pages,
+so the total PSS shows what more workers really cost.
+
+Run from the repository root with gunicorn installed:
+
+    python -m benchmarks.load                                   # 1x8 (the Dockerfile), 2x4 and 4x2
+    python -m benchmarks.load --configs 1x8,1x16 --clients 32 --duration 60
+    python -m benchmarks.load --output load.json
+    python -m benchmarks.load --configs 1x8,2x8,4x8 --no-preload   # without gunicorn.conf.py
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import numpy as np
+import psutil
+from src.classes.testdata import FIXTURE_GAME_DATA, fixture_snapshot
+from src.classes.snapshot import write_snapshot
+from src.utils.figures import FIGURES
+
+
+def submit_body(unit:str, cost:int, star:int, level:int, nteam:int, nother:int, n_out_of_pool:int, client_figures:bool=True) -> dict:
+    """
+    Body of a Submit click as the browser posts it to /_dash-update-component.
+
+    Args:
+        unit (str): Unit name
+        cost (int): Unit cost
+        star (int): Star level wanted
+        level (int): Team level
+        nteam (int): Copies owned
+        nother (int): Copies on other boards
+        n_out_of_pool (int): Other units of the same cost out of the pool
+        client_figures (bool): Whether the server runs with TFT_FIGURES=client (the default)
+
+    Returns:
+        dict: json body
+    """
+
+    outputs = [{'id': 'roll-string', 'property': 'children'}] + [
+        {'id': f'{name}-data', 'property': 'data'} if client_figures else {'id': f'{name}-plot', 'property': 'figure'}
+        for name in FIGURES
+    ]
+
+    return {
+        'output': '..' + '...'.join( f"{output['id']}.{output['property']}" for output in outputs ) + '..',
+        'outputs': outputs,
+        'inputs': [{'id': 'submit-val', 'property': 'n_clicks', 'value': 1}],
+        'changedPropIds': ['submit-val.n_clicks'],
+        'state': [
+            {'id': 'selected-unit', 'property': 'data', 'value': json.dumps({'unit_name': unit, 'cost': cost})},
+            {'id': 'star-level', 'property': 'value', 'value': star},
+            {'id': 'nteam', 'property': 'value', 'value': nteam},
+            {'id': 'nother', 'property': 'value', 'value': nother},
+            {'id': 'n_out_of_pool', 'property': 'value', 'value': n_out_of_pool},
+            {'id': 'level', 'property': 'value', 'value': level},
+            {'id': 'engine', 'property': 'value', 'value': 'geometric'},
+            {'id': 'game-data', 'property': 'value', 'value': ''},
+        ],
+    }
+
+
+def click_mix(n:int, seed:int=0) -> list:
+    """
+    Submit clicks resembling real use: mostly 2 stars, levels around the cost of the unit,
+    a few contested copies, and popular units asked for far more often than the rest.
+
+    Args:
+        n (int): Number of clicks
+        seed (int): Seed of the mix
+
+    Returns:
+        list: Encoded json bodies
+    """
+
+    rng = np.random.default_rng(seed)
+    bodies = []
+
+    for _ in range(n):
+        cost = int(rng.choice([1, 2, 3, 4, 5], p=[.15, .2, .25, .3, .1]))
+        names = FIXTURE_GAME_DATA.unit_dict[cost]
+        # popular units, Zipf-like
+        unit = names[min(int(rng.zipf(1.5)) - 1, len(names) - 1)]
+        star = int(rng.choice([1, 2, 3], p=[.1, .6, .3]))
+        level = int(np.clip(cost + 3 + rng.integers(-1, 3), 3, 11))
+        nteam = int(rng.integers(0, 3 if star < 3 else 6))
+        nother = int(rng.integers(0, 5))
+        n_out_of_pool = int(rng.integers(0, 25))
+
+        bodies.append(json.dumps(submit_body(unit, cost, star, level, nteam, nother, n_out_of_pool)).encode())
+
+    return bodies
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers:int, threads:int, port:int, env:dict, config:str='gunicorn.conf.py') -> subprocess.Popen:
+    """
+    Starts gunicorn the way the Dockerfile does, and waits until it answers.
+
+    Args:
+        workers (int): Worker processes
+        threads (int): Threads per worker
+        port (int): Port to bind on localhost
+        env (dict): Environment of the server
+        config (str): Gunicorn config file, the command line overrides its bind, workers and threads
+
+    Returns:
+        subprocess.Popen: The gunicorn master
+    """
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', config, '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--threads', str(threads), '--timeout', '0', '--log-level', 'warning', 'src.app:server'],
+        env=env,
+    )
+
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/_dash-layout')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.kill()
+    raise RuntimeError('gunicorn did not start')
+
+
+def worker_memory(server:subprocess.Popen) -> dict:
+    # rss, pss and uss of each gunicorn worker in MiB
+    memory = {'rss': [], 'pss': [], 'uss': []}
+    try:
+        for child in psutil.Process(server.pid).children():
+            info = child.memory_full_info()
+            for name in memory:
+                memory[name].append(getattr(info, name, 0) / 2**20)
+    except psutil.NoSuchProcess:
+        pass
+    return memory
+
+
+def run_clients(port:int, bodies:list, clients:int, duration:float) -> tuple:
+    """
+    Closed-loop load: every client posts the next click as soon as its last one answered,
+    over a kept-alive connection, until the duration is over.
+
+    Args:
+        port (int): Server port
+        bodies (list): Encoded Submit bodies, cycled through
+        clients (int): Concurrent clients
+        duration (float): Seconds of load
+
+    Returns:
+        latencies (np.ndarray): Seconds per successful request
+        errors (int): Failed requests
+    """
+
+    latencies = [ [] for _ in range(clients) ]
+    errors = [0] * clients
+    stop = time.perf_counter() + duration
+    headers = {'Content-Type': 'application/json'}
+
+    def client(i:int):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        k = i
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/_dash-update-component', bodies[k % len(bodies)], headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                ok = False
+            if ok:
+                latencies[i].append(time.perf_counter() - start)
+            else:
+                errors[i] += 1
+            k += clients
+
+    threads = [ threading.Thread(target=client, args=(i,)) for i in range(clients) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return np.concatenate([ np.array(l) for l in latencies ]), sum(errors)
+
+
+def run_config(workers:int, threads:int, bodies:list, clients:int, duration:float, warmup:float, env:dict, config:str) -> dict:
+    """
+    Load test of one worker/thread configuration.
+
+    Returns:
+        dict: throughput (requests/s), p50/p95/p99 latency (ms), errors, peak RSS, PSS and
+            USS per worker and the total PSS of the workers (MiB)
+    """
+
+    port = free_port()
+    server = start_server(workers, threads, port, env, config)
+
+    try:
+        run_clients(port, bodies, clients, warmup)
+
+        # sample worker memory while the load runs, keep the peak of each
+        peaks = {}
+        sampling = threading.Event()
+
+        def sample():
+            while not sampling.wait(0.5):
+                for name, values in worker_memory(server).items():
+                    peaks[name] = values if name not in peaks else [ max(a, b) for a, b in zip(peaks[name], values) ]
+
+        sampler = threading.Thread(target=sample)
+        sampler.start()
+        latencies, errors = run_clients(port, bodies, clients, duration)
+        sampling.set()
+        sampler.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3 if latencies.size else (np.nan,)*3
+
+    return {
+        'workers': workers,
+        'threads': threads,
+        'requests': int(latencies.size),
+        'errors': errors,
+        'throughput': latencies.size / duration,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'rss_mib': [ round(rss, 1) for rss in peaks.get('rss', []) ],
+        'pss_mib': [ round(pss, 1) for pss in peaks.get('pss', []) ],
+        'uss_mib': [ round(uss, 1) for uss in peaks.get('uss', []) ],
+        'total_pss_mib': round(sum(peaks.get('pss', [])), 1),
+    }
+
+
+def main(argv:list=None) -> list:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--configs', default='1x8,2x4,4x2', help='Comma separated WORKERSxTHREADS (default 1x8,2x4,4x2)')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent clients (default 16)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load per configuration (default 30)')
+    parser.add_argument('--warmup', type=float, default=5, help='Seconds of load before measuring (default 5)')
+    parser.add_argument('--clicks', type=int, default=5000, help='Distinct clicks in the replayed mix (default 5000)')
+    parser.add_argument('--no-preload', action='store_true', help='Build the app in every worker instead of once before fork')
+    parser.add_argument('--output', help='Save the results as json')
+    args = parser.parse_args(argv)
+
+    configs = [ tuple(int(n) for n in config.split('x')) for config in args.configs.split(',') ]
+    bodies = click_mix(args.clicks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # offline game data, and no answer table so the math is measured
+        snapshot = os.path.join(tmp, 'game_data.json')
+        write_snapshot(fixture_snapshot(), snapshot)
+        env = dict(os.environ, TFT_SNAPSHOT_PATH=snapshot, TFT_ANSWERS_PATH=os.path.join(tmp, 'answers.bin'))
+
+        config = 'gunicorn.conf.py'
+        if args.no_preload:
+            # gunicorn's defaults, every worker imports and builds the app itself
+            config = os.path.join(tmp, 'gunicorn.conf.py')
+            open(config, 'w').close()
+
+        results = []
+        for workers, threads in configs:
+            result = run_config(workers, threads, bodies, args.clients, args.duration, args.warmup, env, config)
+            results.append(result)
+            print(f"{workers}x{threads:<3}: {result['throughput']:7.1f} req/s, p50 {result['p50_ms']:6.1f} ms, "
+                  f"p95 {result['p95_ms']:6.1f} ms, p99 {result['p99_ms']:6.1f} ms, {result['errors']} errors, "
+                  f"RSS per worker {result['rss_mib']} MiB, USS {result['uss_mib']} MiB, total PSS {result['total_pss_mib']} MiB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'clients': args.clients, 'duration': args.duration, 'results': results}, f, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compares the list-of-ids Pool with the count-vector CountPool on offline fixture data.
+
+Run from the repository root with:
+
+    python -m benchmarks.pool
+"""
+import timeit
+import tracemalloc
+from src.classes.Pool import Pool
+from src.classes.CountPool import CountPool
+from src.classes.testdata import FIXTURE_GAME_DATA
+
+
+def construction_memory(pool_class) -> int:
+    """
+    Bytes allocated while building a pool.
+
+    Args:
+        pool_class (type): Pool or CountPool
+
+    Returns:
+        int: Bytes still allocated once the pool is built
+    """
+
+    tracemalloc.start()
+    pool = pool_class(game_data=FIXTURE_GAME_DATA)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size
+
+
+def draw_return_time(pool_class, number:int=20000) -> float:
+    """
+    Seconds per get_unit/get_odds/return_unit cycle, cycling through every cost.
+
+    Args:
+        pool_class (type): Pool or CountPool
+        number (int): Number of cycles to time
+
+    Returns:
+        float: Seconds per cycle
+    """
+
+    pool = pool_class(game_data=FIXTURE_GAME_DATA)
+    costs = [1, 2, 3, 4, 5]
+
+    def cycle():
+        for cost in costs:
+            unit = pool.get_unit(cost)
+            pool.get_odds(unit)
+            pool.return_unit(unit)
+
+    return timeit.timeit(cycle, number=number//len(costs)) / number
+
+
+def main() -> dict:
+    results = {}
+
+    for pool_class in (Pool, CountPool):
+        results[pool_class.__name__] = {
+            'memory_bytes': construction_memory(pool_class),
+            'cycle_us': draw_return_time(pool_class) * 1e6,
+        }
+
+    for name, result in results.items():
+        print(f"{name:>10}: {result['memory_bytes']/1024:8.1f} KiB, {result['cycle_us']:6.2f} us per draw/odds/return")
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
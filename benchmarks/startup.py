@@ -0,0 +1,131 @@
+"""
+Cold start report: where the time to import src.app goes, and how long a fresh process
+takes to serve its first page and first Submit click. Every run is a new interpreter,
+as on a Cloud Run cold start, on offline fixture data.
+
+Run from the repository root with:
+
+    python -m benchmarks.startup               # with the prebuilt figure skeletons, if any
+    python -m benchmarks.startup --top 40      # more modules in the import profile
+    python -m benchmarks.startup --no-skeletons
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from collections import defaultdict
+from src.classes.testdata import fixture_snapshot
+from src.classes.snapshot import write_snapshot
+
+# run in a fresh interpreter, prints the seconds spent in each phase
+COLD_START = '''
+import json, time
+start = time.perf_counter()
+import src.app
+imported = time.perf_counter()
+server = src.app.server
+created = time.perf_counter()
+client = server.test_client()
+assert client.get('/').status_code == 200
+assert client.get('/_dash-layout').status_code == 200
+page = time.perf_counter()
+from benchmarks.load import submit_body
+from src.classes.testdata import FIXTURE_GAME_DATA
+body = submit_body(FIXTURE_GAME_DATA.unit_dict[4][0], 4, 2, 8, 0, 0, 0, src.app.CLIENT_FIGURES)
+assert client.post('/_dash-update-component', json=body).status_code == 200
+submit = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'first_page': page - created, 'first_submit': submit - page}))
+'''
+
+
+def import_profile(env:dict) -> list:
+    """
+    python -X importtime of src.app.
+
+    Args:
+        env (dict): Environment of the interpreter
+
+    Returns:
+        list: (module, own seconds, cumulative seconds, depth) in import order
+    """
+
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import src.app'], env=env,
+                            capture_output=True, text=True, check=True).stderr
+
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6, depth))
+
+    return modules
+
+
+def cold_start(env:dict) -> dict:
+    """
+    Seconds spent by a fresh interpreter importing src.app, building the app, serving the
+    page and layout, and answering a first Submit click. Also the wall time of the whole
+    process, including interpreter start and exit.
+
+    Args:
+        env (dict): Environment of the interpreter
+
+    Returns:
+        dict: Seconds per phase and total
+    """
+
+    import time
+
+    start = time.perf_counter()
+    stdout = subprocess.run([sys.executable, '-c', COLD_START], env=env, capture_output=True, text=True, check=True).stdout
+    total = time.perf_counter() - start
+
+    phases = json.loads(stdout.strip().splitlines()[-1])
+    phases['process'] = total
+
+    return phases
+
+
+def main(argv:list=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=20, help='Modules shown in the import profile (default 20)')
+    parser.add_argument('--no-skeletons', action='store_true', help='Ignore prebuilt figure skeletons')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, 'game_data.json')
+        write_snapshot(fixture_snapshot(), snapshot)
+        env = dict(os.environ, TFT_SNAPSHOT_PATH=snapshot)
+        if args.no_skeletons:
+            env['TFT_SKELETONS_PATH'] = os.path.join(tmp, 'figures.json')
+
+        modules = import_profile(env)
+        phases = cold_start(env)
+
+    # own time of each top-level package, the modules it pulled in included
+    packages = defaultdict(float)
+    for name, own, _, _ in modules:
+        packages[name.split('.')[0]] += own
+
+    print(f"Import of src.app: {sum(own for _, own, _, _ in modules):.3f} s\n")
+    print('By package:')
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'{package:>40}: {seconds*1e3:8.1f} ms')
+
+    print('\nSlowest modules (cumulative):')
+    for name, own, cumulative, depth in sorted(modules, key=lambda module: -module[2])[:args.top]:
+        print(f'{name:>40}: {cumulative*1e3:8.1f} ms cumulative, {own*1e3:7.1f} ms own')
+
+    print('\nCold start:')
+    for phase, seconds in phases.items():
+        print(f'{phase:>40}: {seconds:8.3f} s')
+
+    return {'packages': dict(packages), 'phases': phases}
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Times every hot path of the app on offline fixture data and records peak memory,
+from the pool and shop classes up to a whole Submit click through the Dash server.
+Results are saved as json so runs on different commits can be compared.
+
+Run from the repository root with:
+
+    python -m benchmarks.suite                     # saves benchmarks/results/<commit>.json
+    python -m benchmarks.suite --compare OLD.json  # also prints the change against OLD.json
+    python -m benchmarks.suite --filter cdf_plot   # only cases whose name contains cdf_plot
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import subprocess
+import tracemalloc
+import numpy as np
+from src.classes.testdata import FIXTURE_GAME_DATA
+from src.classes.registry import set_game_data
+from src.classes.Unit import Unit
+from src.classes.Pool import Pool
+from src.classes.Shop import Shop
+from src.classes.util import number_shops, cdf_plot, n_other_shop_distribution, n_pool_shop_distribution
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# level at which every cost can be rolled in the fixture odds
+LEVEL = 9
+
+
+def cases() -> dict:
+    """
+    Every benchmarked call, with its state built up front.
+
+    Returns:
+        dict: Case name to a callable taking no arguments
+    """
+
+    pool = Pool(game_data=FIXTURE_GAME_DATA)
+    shop = Shop(LEVEL, game_data=FIXTURE_GAME_DATA)
+    units = { cost: Unit(FIXTURE_GAME_DATA.unit_dict[cost][0], cost) for cost in range(1, 6) }
+
+    def pool_cycle():
+        for cost in range(1, 6):
+            unit = pool.get_unit(cost)
+            pool.get_odds(unit)
+            pool.return_unit(unit)
+
+    def fresh_shop():
+        shop.fresh_shop(pool)
+        for unit in shop.slots:
+            pool.return_unit(unit)
+
+    shop.fresh_shop(pool)
+
+    benchmarks = {
+        'pool_construction': lambda: Pool(game_data=FIXTURE_GAME_DATA),
+        'pool_get_odds_return': pool_cycle,
+        'shop_fresh_shop': fresh_shop,
+        'shop_refresh_shop': lambda: shop.refresh_shop(pool),
+    }
+
+    for cost, unit in units.items():
+        npool = pool.size(cost)
+        for star in (1, 2, 3):
+            benchmarks[f'number_shops[cost={cost},star={star}]'] = lambda unit=unit, npool=npool, star=star: number_shops(unit, 0, npool, 0, star, LEVEL, shop)
+            benchmarks[f'cdf_plot[cost={cost},star={star}]'] = lambda unit=unit, npool=npool, star=star: cdf_plot(unit, 0, npool, 0, star, LEVEL, shop)
+
+    for star in (1, 2, 3):
+        benchmarks[f'n_other_shop_distribution[star={star}]'] = lambda star=star: n_other_shop_distribution(units[4], 0, pool.size(4), star, LEVEL, shop)
+        benchmarks[f'n_pool_shop_distribution[star={star}]'] = lambda star=star: n_pool_shop_distribution(units[4], 0, 0, star, LEVEL, shop, FIXTURE_GAME_DATA.units_per_cost[3])
+
+    benchmarks.update(submit_cases())
+
+    return benchmarks
+
+
+def submit_cases() -> dict:
+    """
+    A Submit click posted to the Dash server the way the browser does, once with the
+    result cache cleared (every output computed) and once served from the cache.
+
+    Returns:
+        dict: Case name to a callable taking no arguments
+    """
+
+    # importing the app does no work, the factory builds its pool and shops from the fixture data
+    set_game_data(FIXTURE_GAME_DATA)
+    from src import app as dash_app
+    from src.utils.cache import set_answer_table, results
+
+    app = dash_app.create_app(FIXTURE_GAME_DATA)
+
+    # time the math, not a lookup in whatever answer table the factory mapped from disk
+    set_answer_table(None)
+
+    outputs = [{'id': 'roll-string', 'property': 'children'}] + [
+        {'id': f'{name}-data', 'property': 'data'} if dash_app.CLIENT_FIGURES else {'id': f'{name}-plot', 'property': 'figure'}
+        for name in dash_app.FIGURES
+    ]
+    body = {
+        'output': '..' + '...'.join( f"{output['id']}.{output['property']}" for output in outputs ) + '..',
+        'outputs': outputs,
+        'inputs': [{'id': 'submit-val', 'property': 'n_clicks', 'value': 1}],
+        'changedPropIds': ['submit-val.n_clicks'],
+        'state': [
+            {'id': 'selected-unit', 'property': 'data', 'value': json.dumps({'unit_name': FIXTURE_GAME_DATA.unit_dict[4][0], 'cost': 4})},
+            {'id': 'star-level', 'property': 'value', 'value': 2},
+            {'id': 'nteam', 'property': 'value', 'value': 1},
+            {'id': 'nother', 'property': 'value', 'value': 2},
+            {'id': 'n_out_of_pool', 'property': 'value', 'value': 5},
+            {'id': 'level', 'property': 'value', 'value': 8},
+            {'id': 'engine', 'property': 'value', 'value': 'geometric'},
+            {'id': 'game-data', 'property': 'value', 'value': ''},
+        ],
+    }
+
+    client = app.server.test_client()
+
+    def post():
+        response = client.post('/_dash-update-component', json=body)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    def cold():
+        results.clear()
+        post()
+
+    return {'submit_cold': cold, 'submit_cached': post}
+
+
+def measure(call) -> dict:
+    """
+    Best time per call over 3 repeats, and the peak memory allocated during one call.
+
+    Args:
+        call (callable): Called without arguments
+
+    Returns:
+        dict: time_us and peak_kib
+    """
+
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat=3, number=number)) / number
+
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'time_us': seconds * 1e6, 'peak_kib': peak / 1024}
+
+
+def commit() -> str:
+    # short hash of HEAD, with a suffix when the tree has uncommitted changes
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+    return head + ('-dirty' if dirty else '')
+
+
+def compare(results:dict, baseline:dict) -> None:
+    """
+    Prints the change of every case against a saved run.
+
+    Args:
+        results (dict): Results of this run
+        baseline (dict): Results of a saved run
+
+    Returns:
+        None
+    """
+
+    print(f"\nAgainst {baseline['commit']}:")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"{name:>40}: new")
+            continue
+        ratio = result['time_us'] / old['time_us']
+        flag = '  <- slower' if ratio > 1.2 else ''
+        print(f"{name:>40}: {ratio:5.2f}x time, {result['peak_kib'] - old['peak_kib']:+9.1f} KiB peak{flag}")
+
+
+def main(argv:list=None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='Where to save the results (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Saved results to compare against')
+    parser.add_argument('--filter', default='', help='Only run cases whose name contains this')
+    args = parser.parse_args(argv)
+
+    # same draws on every run
+    np.random.seed(0)
+
+    results = {}
+    for name, call in cases().items():
+        if args.filter in name:
+            results[name] = measure(call)
+            print(f"{name:>40}: {results[name]['time_us']:10.1f} us, {results[name]['peak_kib']:9.1f} KiB peak")
+
+    run = {
+        'commit': commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'results': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{run['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f'\nSaved to {output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+    return run
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Compares the interned __slots__ Unit and the id-holding Pool and Shop with the earlier
+design: one Unit object with a __dict__ per copy in the pool, drawn with np.random.choice
+and counted by name, and a fresh Unit built for every request.
+
+Run from the repository root with:
+
+    python -m benchmarks.units
+"""
+import sys
+import json
+import timeit
+import tracemalloc
+import numpy as np
+from src.classes.Unit import Unit
+from src.classes.Pool import Pool
+from src.classes.Shop import Shop
+from src.classes.testdata import FIXTURE_GAME_DATA
+from src.utils.pipeline import parse_state
+
+# level at which every cost can be rolled in the fixture odds
+LEVEL = 9
+
+
+class DictUnit():
+    # the earlier Unit, a plain class with a per-instance __dict__
+    def __init__(self, name:str, cost:int):
+        assert cost in [1, 2, 3, 4, 5], "Cost must be between 1 and 5"
+        self.name = name
+        self.cost = cost
+
+
+class ObjectPool():
+    # the earlier Pool, one DictUnit per copy
+    def __init__(self, game_data) -> None:
+        self.units = { cost: [] for cost in range(1, 6) }
+        for cost, bag_size in zip(range(1, 6), game_data.bag_sizes):
+            for i in range(bag_size):
+                self.units[cost] += [ DictUnit(name, cost=cost) for name in game_data.unit_dict[cost] ]
+
+    def get_unit(self, cost:int):
+        unit = np.random.choice(self.units[cost])
+        self.units[cost].remove(unit)
+        return unit
+
+    def return_unit(self, unit) -> None:
+        self.units[unit.cost].append(unit)
+
+    def size(self, cost:int) -> int:
+        return len(self.units[cost])
+
+    def get_odds(self, unit) -> float:
+        count = sum([ 1 for unit_shop in self.units[unit.cost] if unit.name==unit_shop.name])
+        return count/len(self.units[unit.cost])
+
+
+def unit_bytes() -> dict:
+    """
+    Bytes of one unit object, its __dict__ included.
+
+    Returns:
+        dict: Bytes per DictUnit and per Unit
+    """
+
+    dict_unit = DictUnit('Unit', 1)
+
+    return {
+        'DictUnit': sys.getsizeof(dict_unit) + sys.getsizeof(dict_unit.__dict__),
+        'Unit': sys.getsizeof(Unit('Unit', 1)),
+    }
+
+
+def construction_memory(build) -> tuple:
+    """
+    Bytes and blocks still allocated once a pool is built.
+
+    Args:
+        build (callable): Builds the pool
+
+    Returns:
+        tuple: (bytes, blocks)
+    """
+
+    build() # units interned before measuring
+
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    pool = build()
+    stats = tracemalloc.take_snapshot().compare_to(start, 'filename')
+    tracemalloc.stop()
+
+    return sum(stat.size_diff for stat in stats), sum(stat.count_diff for stat in stats)
+
+
+def draw_time(pool, number:int=20000) -> float:
+    """
+    Seconds per get_unit/get_odds/return_unit cycle, cycling through every cost.
+
+    Args:
+        pool (Pool or ObjectPool): Pool to draw from
+        number (int): Number of cycles to time
+
+    Returns:
+        float: Seconds per cycle
+    """
+
+    def cycle():
+        for cost in range(1, 6):
+            unit = pool.get_unit(cost)
+            pool.get_odds(unit)
+            pool.return_unit(unit)
+
+    return timeit.timeit(cycle, number=number//5) / number
+
+
+def request_allocations(make_unit, number:int=10000) -> tuple:
+    """
+    Unit objects a stream of requests leaves behind, and the time to make each one,
+    as the Submit callback did once per click.
+
+    Args:
+        make_unit (callable): Makes the unit of a request from a name and cost
+        number (int): Requests
+
+    Returns:
+        tuple: (distinct unit objects, microseconds per request)
+    """
+
+    names = [ (FIXTURE_GAME_DATA.unit_dict[4][i % 13], 4) for i in range(number) ]
+    units = [ make_unit(name, cost) for name, cost in names ]
+    seconds = timeit.timeit(lambda: [ make_unit(name, cost) for name, cost in names ], number=5) / 5
+
+    return len({ id(unit) for unit in units }), seconds / number * 1e6
+
+
+def main() -> dict:
+    results = {'unit_bytes': unit_bytes()}
+
+    for name, build in (('ObjectPool', lambda: ObjectPool(FIXTURE_GAME_DATA)), ('Pool', lambda: Pool(game_data=FIXTURE_GAME_DATA))):
+        memory, blocks = construction_memory(build)
+        results[name] = {'memory_bytes': memory, 'blocks': blocks, 'cycle_us': draw_time(build()) * 1e6}
+
+    results['requests'] = {
+        'DictUnit': request_allocations(DictUnit),
+        'Unit': request_allocations(Unit),
+        'parse_state': request_allocations(lambda name, cost: parse_state(json.dumps({'unit_name': name, 'cost': cost}), 2, 0, 0, 0, LEVEL, FIXTURE_GAME_DATA)['unit']),
+    }
+
+    shop, pool = Shop(LEVEL, game_data=FIXTURE_GAME_DATA), Pool(game_data=FIXTURE_GAME_DATA)
+    shop.fresh_shop(pool)
+    results['refresh_shop_us'] = timeit.timeit(lambda: shop.refresh_shop(pool), number=5000) / 5000 * 1e6
+
+    print(f"Bytes per unit: {results['unit_bytes']['DictUnit']} with a __dict__, {results['unit_bytes']['Unit']} with __slots__")
+    for name in ('ObjectPool', 'Pool'):
+        result = results[name]
+        print(f"{name:>10}: {result['memory_bytes']/1024:8.1f} KiB in {result['blocks']} blocks, {result['cycle_us']:6.2f} us per draw/odds/return")
+    for name, (objects, us) in results['requests'].items():
+        print(f"{name:>11}: {objects} unit objects for 10000 requests, {us:.2f} us per request")
+    print(f"refresh_shop: {results['refresh_shop_us']:.2f} us")
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Gunicorn settings for the Docker image. The app is built once in the master before
+workers fork (preload_app), so the game data, pool counts, figure skeletons and the
+memory-mapped answer table are shared copy-on-write between workers instead of
+being rebuilt in each one.
+
+Environment:
+    PORT: Port to bind, 8080 by default (set by Cloud Run)
+    WEB_CONCURRENCY: Worker processes, 1 by default, raise it to the number of cores
+    GUNICORN_THREADS: Threads per worker, 8 by default
+"""
+import os
+import gc
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = 0
+loglevel = 'info'
+preload_app = True
+
+# the master only forks workers, what it fetched and swapped in would never reach them,
+# so only the workers check for new patches (see post_fork)
+if preload_app:
+    os.environ.setdefault('TFT_REFRESH_AFTER_FORK', '1')
+
+# no collections in the master while the app is built, so its objects are laid out
+# together instead of around the holes freed objects leave. Enabled again once it is built
+gc.disable()
+
+def when_ready(server):
+    # Dash finishes its setup (callbacks, scripts) on the first request and marks it done
+    # before it is, so concurrent first requests in a threaded worker can miss the
+    # callbacks. One request in the master does it once, in memory the workers share
+    if preload_app:
+        server.app.wsgi().test_client().get('/_dash-layout')
+
+    # the app is built, the master and the workers forked from it collect as usual
+    gc.freeze()
+    gc.enable()
+
+def pre_fork(server, worker):
+    # everything built so far moves to a generation the collector never scans, so
+    # collections in the workers do not write to (and copy) the shared pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # only the workers check for new patches, each with its own thread
+    if preload_app:
+        from src.app import start_refresher
+        start_refresher()
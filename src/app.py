@@ -1,369 +1,425 @@
+import os
 import json
-import plotly.express as px
-from dash import Dash, html, dcc, callback, Output, Input, State, ctx, ALL, no_update
+import threading
+from dash import Dash, html, dcc, callback, clientside_callback, ClientsideFunction, Output, Input, State, ctx, ALL, no_update
 import dash_bootstrap_components as dbc
-from .classes.Unit import Unit
-from .classes.Pool import Pool
+from .classes.CountPool import CountPool
 from .classes.Shop import Shop
-from .classes.util import number_shops, cdf_plot, n_other_shop_distribution, n_pool_shop_distribution
-
-# Initialize the app - incorporate css
-external_stylesheets = [dbc.themes.BOOTSTRAP]
-app = Dash(__name__, external_stylesheets=external_stylesheets)
-app.title = "TFT Rolling: Probability of Hitting a Unit"
+from .classes.answers import load_answer_table
+from .classes.registry import GameData, SET_KEY, get_game_data, set_game_data, store
+from .classes.refresh import Refresher
+from .classes.snapshot import SNAPSHOT_PATH
+from .utils.cache import results, set_answer_table
+from .utils.pipeline import parse_state, compute_outputs, select_game
+from .utils.api import create_api
+from .utils.metrics import instrument, register_metrics
+from .classes.util import cdf_figure, n_other_figure, n_pool_figure
+from .utils.figures import FIGURES, blank_figures, figure_templates, figure_payloads
+
+# 'client' sends only the numbers of each figure and the browser builds it from templates
+# sent with the layout, 'server' sends whole figures
+CLIENT_FIGURES = os.environ.get('TFT_FIGURES', 'client') != 'server'
+
+# seconds between checks for a new patch, 0 (default) never checks
+REFRESH_INTERVAL = float(os.environ.get('TFT_REFRESH_INTERVAL', 0))
+
+# set by gunicorn.conf.py when the master builds the app before forking: the master never
+# serves, so the refresher only starts in the forked workers (see start_refresher())
+REFRESH_AFTER_FORK = os.environ.get('TFT_REFRESH_AFTER_FORK', '') not in ('', '0')
+
+# game state of the app made by create_app(), a (pool, shops, layout) tuple read by the
+# callbacks below. A new patch replaces the whole tuple in one assignment, so a request
+# sees the old state or the new one, never a mix of both (see swap_game_data())
+game = None
+
+# patch refresher of the default app, None when TFT_REFRESH_INTERVAL is 0
+refresher = None
+
+def build_layout(pool:CountPool) -> dbc.Container:
+    """
+    Page layout, with a button for every unit in the pool and a choice of the other
+    sets and patches in classes.registry.store.
 
-server = app.server
+    Args:
+        pool (CountPool): Pool giving the units of each cost
 
-# Initialize game state
-pool = Pool()
-shops = [Shop(i) for i in range(1,12)]
+    Returns:
+        dbc.Container: The layout
+    """
 
-cost_colors = ['secondary', 'success','primary', '4-cost', 'warning']
+    cost_colors = ['secondary', 'success','primary', '4-cost', 'warning']
 
 
-# Unit selection buttons
-unit_collapse_buttons = html.Div(
-    dbc.Container(
-        [ 
-            dbc.Button(
-                f"{i}",
-                id={'type': 'collapse-btn', 'cost': i},
-                className="me-1",
-                n_clicks=0,
-                color=[cost_colors[i-1]],
-                outline=True,
-                style={'width': '18%'},
-            ) for i in range(1, 6)
-        ]
-    )
-)
-collapse_group = dbc.Container([
-    dbc.Collapse([
-        dbc.Button(
-            unit_name, 
-            id={
-                'index':unit_name, 
-                'type': 'btn-unit', 
-                'cost':i
-                }, 
-            color=[cost_colors[i-1]], 
-            outline=True, 
-            className="me-1", 
-            n_clicks=0) 
-        for unit_name in sorted(pool.unit_dict[i])
-        ],
-        id={'type': 'collapse', 'cost': i},
-        is_open=False) 
-    for i in range (1, 6)
-])
-
-# Inputs to describe game state
-controls = html.Div([
-    html.Div(
-        children=[
-            html.P('Select a unit and cost (default is random 4-cost)'),
-            unit_collapse_buttons,
-            html.Br(),
-            collapse_group,
-            dcc.Store('selected-unit', 
-                      data=json.dumps({
-                          'unit_name': '4-cost Unit',
-                          'cost': 4
-                      })),
-            html.Br(),
-            html.P('Star level of desired unit'),
-            dcc.Dropdown(
-                options=[1, 2, 3], 
-                value=2, 
-                id='star-level'),
-            html.Br(),
-            html.P('Level'),
-            dcc.Dropdown(
-                options=list(range(1, 11)), 
-                value=8, 
-                id='level'),
-            html.Br(),
-            html.P("Number of desired unit you've already purchased"),
-            dcc.Dropdown(
-                options=list(range(9)), 
-                value=0, 
-                id='nteam'),
-            html.Br(),
-            html.P('Number of desired unit on other boards and benches'),
-            dbc.Input(
-                placeholder='Integer (0+)', 
-                type='number',
-                value=0, 
-                id='nother'),
-            html.Br(),
-            html.P('Number of others units of the same cost out of the pool'),
-            dbc.Input(
-                placeholder='Integer (0+)', 
-                type='number',
-                value=0, 
-                id='n_out_of_pool'),
-            html.Br(),
-            html.Br(),
-            html.Div(
-                dbc.Button(
-                    'Submit',
-                    # [dbc.Spinner(size="sm"), " Loading..."],
-                    id='submit-val', 
-                    n_clicks=0),
-                className="d-grid gap-2 col-12 mx-auto"
-            ),
-
-        ]
-    )
-])
-
-# Output information and graphs
-output = dbc.Card(
-    [
-        dbc.Container([
-            html.Br(),
-            html.Div(id='roll-string', children=''),
-            html.Br(),
-            ]),
+    # Unit selection buttons
+    unit_collapse_buttons = html.Div(
         dbc.Container(
-            dbc.Tabs([
-                dbc.Tab(
-                    dcc.Graph(id='roll-prob-plot', config = {'displayModeBar': False}), 
-                    label='Roll Probability',
-                    ),
-                dbc.Tab(
-                    dcc.Graph(id='n-other-plot', config = {'displayModeBar': False}), 
-                    label='Units Held'),
-                dbc.Tab(
-                    dcc.Graph(id='n-pool-plot', config = {'displayModeBar': False}),
-                    label='Pool Size'
-                    )
-            ])
+            [ 
+                dbc.Button(
+                    f"{i}",
+                    id={'type': 'collapse-btn', 'cost': i},
+                    className="me-1",
+                    n_clicks=0,
+                    color=[cost_colors[i-1]],
+                    outline=True,
+                    style={'width': '18%'},
+                ) for i in range(1, 6)
+            ]
         )
+    )
+    collapse_group = dbc.Container([
+        dbc.Collapse([
+            dbc.Button(
+                unit_name, 
+                id={
+                    'index':unit_name, 
+                    'type': 'btn-unit', 
+                    'cost':i
+                    }, 
+                color=[cost_colors[i-1]], 
+                outline=True, 
+                className="me-1", 
+                n_clicks=0) 
+            for unit_name in sorted(pool.unit_dict[i])
+            ],
+            id={'type': 'collapse', 'cost': i},
+            is_open=False) 
+        for i in range (1, 6)
     ])
 
-# define layout
-app.layout = dbc.Container([
-    html.Div(className='row',children='TFT: Expected Number of Rolls', style = {'textAlign': 'center', 'fontSize': 30}),
-    html.Hr(),
-    dbc.Row([
-        dbc.Col(controls, width=4),
-        dbc.Col(output, width=8)  
-        ]),
+    # Inputs to describe game state
+    controls = html.Div([
+        html.Div(
+            children=[
+                html.P('Select a unit and cost (default is random 4-cost)'),
+                unit_collapse_buttons,
+                html.Br(),
+                collapse_group,
+                dcc.Store('selected-unit', 
+                          data=json.dumps({
+                              'unit_name': '4-cost Unit',
+                              'cost': 4
+                          })),
+                html.Br(),
+                html.P('Star level of desired unit'),
+                dcc.Dropdown(
+                    options=[1, 2, 3], 
+                    value=2, 
+                    id='star-level'),
+                html.Br(),
+                html.P('Level'),
+                dcc.Dropdown(
+                    options=list(range(1, 11)), 
+                    value=8, 
+                    id='level'),
+                html.Br(),
+                html.P("Number of desired unit you've already purchased"),
+                dcc.Dropdown(
+                    options=list(range(9)), 
+                    value=0, 
+                    id='nteam'),
+                html.Br(),
+                html.P('Number of desired unit on other boards and benches'),
+                dbc.Input(
+                    placeholder='Integer (0+)', 
+                    type='number',
+                    value=0, 
+                    id='nother'),
+                html.Br(),
+                html.P('Number of others units of the same cost out of the pool'),
+                dbc.Input(
+                    placeholder='Integer (0+)', 
+                    type='number',
+                    value=0, 
+                    id='n_out_of_pool'),
+                html.Br(),
+                html.P('Shop model'),
+                dcc.Dropdown(
+                    options=[
+                        {'label': 'Independent slots (approximate)', 'value': 'geometric'},
+                        {'label': 'Whole shop draws (exact)', 'value': 'exact'},
+                    ],
+                    value='geometric',
+                    clearable=False,
+                    id='engine'),
+                html.Br(),
+                html.P('Game data'),
+                dcc.Dropdown(
+                    options=[{'label': f'Set {pool.game_data.set_} (current)', 'value': ''}] + [
+                        {'label': f'Set {key}' if SET_KEY.fullmatch(key) else f'Earlier patch {key}', 'value': key}
+                        for key in store.keys() if key not in (pool.game_data.set_, pool.game_data.version)
+                    ],
+                    value='',
+                    clearable=False,
+                    id='game-data'),
+                html.Br(),
+                html.Br(),
+                html.Div(
+                    dbc.Button(
+                        'Submit',
+                        # [dbc.Spinner(size="sm"), " Loading..."],
+                        id='submit-val', 
+                        n_clicks=0),
+                    className="d-grid gap-2 col-12 mx-auto"
+                ),
+
+            ]
+        )
     ])
 
-@callback(
-    Output(component_id='roll-string', component_property='children'),
-    Input(component_id='submit-val', component_property='n_clicks'),
-    State(component_id='selected-unit', component_property='data'),
-    State(component_id='star-level', component_property='value'),
-    State(component_id='nteam', component_property='value'),
-    State(component_id='nother', component_property='value'),
-    State(component_id='n_out_of_pool', component_property='value'),
-    State(component_id='level', component_property='value'),
-)
-def update_number_of_shops(n_clicks:int, unit_data:str, star_level:int, nteam:int, nother:int, n_out_of_pool:int, level:int)->str:
+    # Output information and graphs
+    output = dbc.Card(
+        [
+            dbc.Container([
+                html.Br(),
+                html.Div(id='roll-string', children=''),
+                html.Br(),
+                ]),
+            dbc.Container(
+                dbc.Tabs([
+                    dbc.Tab(
+                        dcc.Graph(id='roll-prob-plot', config = {'displayModeBar': False}), 
+                        label='Roll Probability',
+                        ),
+                    dbc.Tab(
+                        dcc.Graph(id='n-other-plot', config = {'displayModeBar': False}), 
+                        label='Units Held'),
+                    dbc.Tab(
+                        dcc.Graph(id='n-pool-plot', config = {'displayModeBar': False}),
+                        label='Pool Size'
+                        )
+                ])
+            )
+        ] + ([
+            dcc.Store(id=f'{name}-template', data=template) for name, template in figure_templates().items()
+        ] + [
+            dcc.Store(id=f'{name}-data') for name in FIGURES
+        ] if CLIENT_FIGURES else []))
+
+    # define layout
+    layout = dbc.Container([
+        html.Div(className='row',children='TFT: Expected Number of Rolls', style = {'textAlign': 'center', 'fontSize': 30}),
+        html.Hr(),
+        dbc.Row([
+            dbc.Col(controls, width=4),
+            dbc.Col(output, width=8)  
+            ]),
+        ])
+
+    return layout
+
+def build_game(game_data:GameData) -> tuple:
     """
-    Callback running classes.util.number_shops() to calculate the expected number of shops given 
-    the inputs from the user. The function returns a string to be displayed in the output
-    panel in the roll-string div.
-    
+    Game state of the app for some game data.
+
     Args:
-        n_clicks (int): How many times the submit button has been clicked
-        unit_data (str): json string of unit data, comes from the selected unit button
-        star_level (int): Star level of the unit, reads from star-level dropdown
-        nteam (int): The number of the selected unit you have on your team, input from the nteam dropdown
-        nother (int): The number of the selected unit on other boards and benches, input from the nother input
-        n_out_of_pool (int): The number of units of the same cost as the desired unit that are out of the pool, 
-            input from the n_out_of_pool input
-        level (int): Your team level, input from the level dropdown
+        game_data (GameData): Game data to build it from
 
     Returns:
-        str: The expected number of shops until the desired unit is hit, formatted as a string
+        tuple: (pool, shops for every level of the odds, layout)
     """
-    
-    text = 'Expected # of shops:'
-
-    if n_clicks > 0:
-        unit_data = json.loads(unit_data)
-        text = 'Expected # of shops until {} {} star: {}'.format(
-            unit_data['unit_name'],
-            star_level,
-            number_shops(
-                Unit(unit_data['unit_name'], unit_data['cost']), 
-                nteam=nteam, 
-                npool=pool.size(unit_data['cost']) - n_out_of_pool - nteam - nother, 
-                nother=nother, 
-                star=star_level,
-                level=level, 
-                shop=shops[level-1],
-                round_to_int=True
-                )
-            )
 
-    return text
+    # the app only reads pool sizes, and count arrays keep the state small and
+    # shareable between forked workers (see gunicorn.conf.py)
+    pool = CountPool(game_data=game_data)
+    shops = [Shop(i, game_data=game_data) for i in range(1, game_data.odds.shape[0] + 1)]
 
-@callback(
-    Output(component_id='roll-prob-plot', component_property='figure'),
-    Input(component_id='submit-val', component_property='n_clicks'),
-    State(component_id='selected-unit', component_property='data'),
-    State(component_id='star-level', component_property='value'),
-    State(component_id='nteam', component_property='value'),
-    State(component_id='nother', component_property='value'),
-    State(component_id='n_out_of_pool', component_property='value'),
-    State(component_id='level', component_property='value'),
-)
-def roll_probability(n_clicks:int, unit_data:str, star_level:int, nteam:int, nother:int, n_out_of_pool:int, level:int):
+    return pool, shops, build_layout(pool)
+
+def serve_layout() -> dbc.Container:
+    # built with the game state, a new patch brings its own unit buttons
+    return game[2]
+
+def swap_game_data(game_data:GameData) -> None:
     """
-    Callback running classes.util.cdf_plot() to display CDF for the probability of hitting the desired unit
-    star level after a certain number of rolls. Please see classes.util.cdf_plot() for more details on the how
-    the CDF is calculated. 
-    
+    Switches the app to new game data, e.g. a new patch found by the refresher. The old
+    data stays in classes.registry.store for comparison. The new state is built in full
+    before it replaces the current one. The answer table is left
+    out during the swap, since it only matches the data it was built from. The result
+    cache is emptied: its keys hold the old data version, so those entries would never be
+    served again.
+
     Args:
-        n_clicks (int): How many times the submit button has been clicked
-        unit_data (str): json string of unit data, comes from the selected unit button
-        star_level (int): Star level of the unit, reads from star-level dropdown
-        nteam (int): The number of the selected unit you have on your team, input from the nteam dropdown
-        nother (int): The number of the selected unit on other boards and benches, input from the nother input
-        n_out_of_pool (int): The number of units of the same cost as the desired unit that are out of the pool, 
-            input from the n_out_of_pool input
-        level (int): Your team level, input from the level dropdown
+        game_data (GameData): New game data
 
     Returns:
-        plotly.graph_objects._figure.Figure: CDF barplot of the probability of hitting the desired unit
+        None
     """
-    
-    if n_clicks > 0:
-        
-        unit_data = json.loads(unit_data)
-        fig = cdf_plot(
-            Unit(unit_data['unit_name'], unit_data['cost']), 
-            nteam=nteam, 
-            npool=pool.size(unit_data['cost']) - n_out_of_pool - nteam - nother, 
-            nother=nother, 
-            star=star_level,
-            level=level, 
-            shop=shops[level-1]
-        )
-    
-    else:
-        
-        fig = px.bar()
-        fig.update_layout(
-            xaxis_title="Shop rolls",
-            yaxis_title="Probability of hitting",
-            title="Probability of hitting a unit as you roll",
-            template="simple_white",
-            font_size=14,
-            title_font_size=20,
-        )
 
-    return fig
+    global game
 
-@callback(
-    Output(component_id='n-other-plot', component_property='figure'),
-    Input(component_id='submit-val', component_property='n_clicks'),
-    State(component_id='selected-unit', component_property='data'),
-    State(component_id='star-level', component_property='value'),
-    State(component_id='nteam', component_property='value'),
-    State(component_id='n_out_of_pool', component_property='value'),
-    State(component_id='level', component_property='value'),
-)
-def n_other_plot(n_clicks:int, unit_data:str, star_level:int, nteam:int, n_out_of_pool:int, level:int):
+    store.put(game[0].game_data)
+    new_game = build_game(game_data)
+    table = load_answer_table(game_data=game_data)
+
+    set_answer_table(None)
+    set_game_data(game_data)
+    game = new_game
+    set_answer_table(table)
+    results.clear()
+
+    return None
+
+def create_app(game_data=None) -> Dash:
     """
-    Callback running classes.util.n_other_shop_distribution() to display the expected number of shops
-    until the desired unit star level is hit as the copies of this unit in the pool changes. Please see
-    classes.util.n_other_shop_distribution() for more details on the how the expected number of shops is calculated.
+    App factory. Builds the game state, the layout and the JSON and metrics routes, so
+    that importing this module does no work until an app is asked for. The callbacks
+    below are registered globally and use the game state of the latest app. With
+    TFT_REFRESH_INTERVAL set, the default app also starts a classes.refresh.Refresher
+    that swaps in new patches, in the forked workers only with TFT_REFRESH_AFTER_FORK.
 
     Args:
-        n_clicks (int): How many times the submit button has been clicked
-        unit_data (str): json string of unit data, comes from the selected unit button
-        star_level (int): Star level of the unit, reads from star-level dropdown
-        nteam (int): The number of the selected unit you have on your team, input from the nteam dropdown
-        n_out_of_pool (int): The number of units of the same cost as the desired unit that are out of the pool, 
-            input from the n_out_of_pool input
-        level (int): Your team level, input from the level dropdown
+        game_data (GameData): Game data to use. When None (default), the process-wide registry is used.
 
     Returns:
-        plotly.graph_objects._figure.Figure: Bar plot showing expected number of shops. 
+        Dash: The app, its Flask server is app.server
     """
-    
-    
-    if n_clicks > 0:
-        unit_data = json.loads(unit_data)
-        fig = n_other_shop_distribution(
-            Unit(unit_data['unit_name'], unit_data['cost']), 
-            nteam=nteam, 
-            npool=pool.size(unit_data['cost']) - n_out_of_pool - nteam, 
-            star=star_level,
-            level=level, 
-            shop=shops[level-1]
-        )
-    else:
-        fig = px.bar()
-        fig.update_layout(
-            xaxis_title="# of unit left in pool",
-            yaxis_title="Expected # of shops",
-            title="Effect of # left in pool on expected # of shops",
-            template="simple_white",
-            font_size=14,
-            title_font_size=20,
-        )
-        fig.update_traces(hovertemplate="# Left: %{x}<br>Expected # Shops: %{y}")
-   
 
-    return fig
+    global game, refresher
+
+    refresh = game_data is None and REFRESH_INTERVAL > 0
+    game_data = get_game_data() if game_data is None else game_data
+
+    # Initialize the app - incorporate css
+    app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    app.title = "TFT Rolling: Probability of Hitting a Unit"
+
+    # Initialize game state
+    game = build_game(game_data)
+
+    # memory-map precomputed answers when they have been built for this game data
+    set_answer_table(load_answer_table(game_data=game_data))
+
+    # JSON endpoints for bots and overlays, see utils.api
+    app.server.register_blueprint(create_api(current=lambda: game[:2]))
+
+    # Prometheus histograms of every callback and computation, see utils.metrics
+    register_metrics(app.server)
+
+    app.layout = serve_layout
+
+    if refresh and refresher is None:
+        refresher = Refresher(swap_game_data, game_data, REFRESH_INTERVAL, path=SNAPSHOT_PATH)
+        if not REFRESH_AFTER_FORK:
+            refresher.start()
+
+    return app
+
+def start_refresher() -> None:
+    """
+    Starts the patch refresher of the default app, if it has one. Called by gunicorn's
+    post_fork hook in each worker, since a preloading master builds the refresher without
+    starting it and threads do not survive fork anyway.
+
+    Returns:
+        None
+    """
+
+    if refresher is not None:
+        refresher.start()
+
+    return None
+
+_default = None
+_lock = threading.Lock()
+
+def __getattr__(name:str):
+    # `src.app:server` (gunicorn) and `src.app.app` build the default app on first access
+    global _default
+
+    if name not in ('app', 'server'):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    if _default is None:
+        with _lock:
+            if _default is None:
+                _default = create_app()
+
+    return _default if name == 'app' else _default.server
 
 @callback(
-    Output(component_id='n-pool-plot', component_property='figure'),
+    Output(component_id='roll-string', component_property='children'),
+    *[
+        Output(component_id=f'{name}-data', component_property='data') if CLIENT_FIGURES
+        else Output(component_id=f'{name}-plot', component_property='figure')
+        for name in FIGURES
+    ],
     Input(component_id='submit-val', component_property='n_clicks'),
     State(component_id='selected-unit', component_property='data'),
     State(component_id='star-level', component_property='value'),
     State(component_id='nteam', component_property='value'),
     State(component_id='nother', component_property='value'),
+    State(component_id='n_out_of_pool', component_property='value'),
     State(component_id='level', component_property='value'),
+    State(component_id='engine', component_property='value'),
+    State(component_id='game-data', component_property='value'),
 )
-def n_pool_plot(n_clicks,unit_data, star_level, nteam, nother, level):
+@instrument('callback', callback='submit')
+def submit(n_clicks:int, unit_data:str, star_level:int, nteam:int, nother:int, n_out_of_pool:int, level:int, engine:str, data_key:str) -> tuple:
     """
-    Callback running classes.util.n_pool_shop_distribution() to display the expected number of shops
-    until the desired unit star level is hit as pool size of that unit's cost changes. Please see
-    classes.util.n_pool_shop_distribution() for more details on the how the expected number of shops is calculated.
-
+    Single callback filling every output of a Submit click in one request. The inputs are parsed 
+    and validated once by utils.pipeline.parse_state(), then utils.pipeline.compute_outputs() runs
+    classes.util.number_shops(), cdf_curve(), n_other_shop_curve() and n_pool_shop_curve() through 
+    the result cache. Please see classes.util for details on how each output is calculated.
+    
     Args:
         n_clicks (int): How many times the submit button has been clicked
         unit_data (str): json string of unit data, comes from the selected unit button
         star_level (int): Star level of the unit, reads from star-level dropdown
         nteam (int): The number of the selected unit you have on your team, input from the nteam dropdown
         nother (int): The number of the selected unit on other boards and benches, input from the nother input
+        n_out_of_pool (int): The number of units of the same cost as the desired unit that are out of the pool, 
+            input from the n_out_of_pool input
         level (int): Your team level, input from the level dropdown
+        engine (str): Shop model, input from the engine dropdown (see utils.cache.ENGINES)
+        data_key (str): Set or patch to use, '' for the current one, input from the game-data dropdown
+
+    With CLIENT_FIGURES the figures go out as compact payloads (utils.figures.figure_payloads()) 
+    and the clientside callbacks below build them in the browser.
 
     Returns:
-        plotly.graph_objects._figure.Figure: Bar plot showing expected number of shops.
+        str: The expected number of shops until the desired unit is hit, formatted as a string
+        plotly.graph_objects._figure.Figure or dict: CDF barplot of the probability of hitting the desired unit
+        plotly.graph_objects._figure.Figure or dict: Bar plot showing expected number of shops as copies are held by others
+        plotly.graph_objects._figure.Figure or dict: Bar plot showing expected number of shops as the pool size changes
     """
-    
-    if n_clicks > 0:
-        unit_data = json.loads(unit_data)
-        fig = n_pool_shop_distribution(
-            Unit(unit_data['unit_name'], unit_data['cost']), 
-            nteam=nteam, 
-            nother=nother, 
-            star=star_level,
-            level=level, 
-            shop=shops[level-1],
-            units_per_cost=len(set(unit.name for unit in pool.units[unit_data['cost']]))
-        )
-    else:
-        fig = px.bar()
-        fig.update_layout(
-            xaxis_title="# of other same-costs left in pool",
-            yaxis_title="Expected # of shops",
-            title="Effect of same-cost pool size on expected # of shops",
-            template="simple_white",       
-            font_size=14,
-            title_font_size=20,
+
+    # no payload makes the client show the blank template
+    blank = (None, None, None) if CLIENT_FIGURES else blank_figures()
+
+    if n_clicks == 0:
+        return ('Expected # of shops:',) + blank
+
+    pool, shops, _ = game
+
+    try:
+        pool, shops = select_game(data_key, pool, shops)
+        state = parse_state(unit_data, star_level, nteam, nother, n_out_of_pool, level, pool.game_data, engine)
+        outputs = compute_outputs(state, pool, shops)
+    except (ValueError, ArithmeticError) as e:
+        return (str(e),) + blank
+
+    unit = state['unit']
+
+    text = 'Expected # of shops until {} {} star: {}'.format(unit.name, state['star'], outputs['expected'])
+
+    if CLIENT_FIGURES:
+        return (text,) + figure_payloads(state, outputs)
+
+    return (
+        text,
+        cdf_figure(*outputs['cdf'], unit, state['star']),
+        n_other_figure(*outputs['n_other'], unit),
+        n_pool_figure(*outputs['n_pool'], unit.cost),
+    )
+
+if CLIENT_FIGURES:
+    for name in FIGURES:
+        clientside_callback(
+            ClientsideFunction(namespace='figures', function_name='build'),
+            Output(component_id=f'{name}-plot', component_property='figure'),
+            Input(component_id=f'{name}-data', component_property='data'),
+            State(component_id=f'{name}-template', component_property='data'),
         )
-        fig.update_traces(hovertemplate="# Left: %{x}<br>Expected # Shops: %{y}")
-    return fig
 
     
 @callback(
@@ -372,6 +428,7 @@ def n_pool_plot(n_clicks,unit_data, star_level, nteam, nother, level):
     Input({"type": "btn-unit", "index":ALL, "cost":ALL}, "n_clicks"),
     Input({"type": "btn-unit", "index":ALL, "cost":ALL}, "id"),
     prevent_initial_call=True)
+@instrument('callback', callback='btn_active')
 def btn_active(n_clicks:list, ids:list) -> list:
     """
     Callback to update the class of selected button (btn-unit) to "active",
@@ -403,6 +460,7 @@ def btn_active(n_clicks:list, ids:list) -> list:
     Input({"type": "collapse-btn", "index":ALL, "cost":ALL}, "id"),
     State({"type": "collapse", "cost": ALL}, "is_open"),
     prevent_initial_call=True)
+@instrument('callback', callback='toggle_collapse')
 def toggle_collapse(n_clicks:list, collapse_btn_ids:list, is_open:list) -> list:
     """
     Callback to toggle the collapse of the unit selection buttons.
@@ -431,4 +489,4 @@ def toggle_collapse(n_clicks:list, collapse_btn_ids:list, is_open:list) -> list:
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
@@ -0,0 +1,38 @@
+// Rebuilds the output figures from the compact payloads of utils/figures.py:figure_payloads()
+// and the templates sent once with the layout, so a Submit click only carries the numbers.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figures: {
+        build: function(payload, template) {
+            if (!template) {
+                return window.dash_clientside.no_update;
+            }
+            if (!payload) {
+                return template.blank;
+            }
+
+            const fig = JSON.parse(JSON.stringify(template.figure));
+            const trace = fig.data[0];
+
+            if (payload.x0 !== undefined) {
+                delete trace.x;
+                trace.x0 = payload.x0;
+                trace.dx = payload.dx;
+            } else {
+                trace.x = payload.x;
+            }
+            trace.y = payload.y;
+
+            // dotted paths, e.g. 'xaxis.title.text'
+            Object.entries(payload.layout || {}).forEach(([path, value]) => {
+                const keys = path.split('.');
+                let node = fig.layout;
+                keys.slice(0, -1).forEach(key => {
+                    node = node[key] = node[key] || {};
+                });
+                node[keys[keys.length - 1]] = value;
+            });
+
+            return fig;
+        }
+    }
+});
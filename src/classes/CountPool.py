@@ -0,0 +1,148 @@
+import numpy as np
+from .Unit import Unit
+from .registry import GameData, resolve_game_data
+
+class CountPool():
+    """
+    Collection of units available to the player, stored as one copy count per
+    unique unit instead of one Unit object per copy. Drop-in replacement for Pool:
+    drawing and returning a unit only update integer counts in place.
+
+    Attributes:
+        counts (dict): Keys are cost levels (1-5) and values are integer arrays with the
+            copies left of each unit, in the order of unit_dict.
+        unit_dict (MappingProxyType): Unique units available in the game, shared with
+            the game data registry. Keys are cost levels (1-5) and values are tuples of unit names.
+        game_data (GameData): Shared game data the pool is built from.
+        __totals (np.ndarray): Copies left for each cost, kept in sync with counts.
+        __index (dict): Position of each unit id in its cost's count array.
+        __units (dict): The interned Unit of each unique unit, handed out by get_unit().
+    """
+
+    def __init__(self, game_data:GameData=None) -> None:
+        """
+        Initializes pool from the shared game data according to bag sizes.
+
+        Args:
+            game_data (GameData or str): Game data to use, or the key of a set or patch
+                (see registry.GameDataStore). When None (default), the process-wide registry is used.
+        """
+        self.game_data = resolve_game_data(game_data)
+        self.unit_dict = self.game_data.unit_dict
+        self.__units = { cost: [ Unit(name, cost=cost) for name in names ] for cost, names in self.unit_dict.items() }
+        self.__index = { cost: { unit.id: i for i, unit in enumerate(units) } for cost, units in self.__units.items() }
+        self.new_game()
+
+    def new_game(self) -> None:
+        """
+        Resets every unit to the bag size of its cost.
+
+        Returns:
+            None
+        """
+
+        self.counts = {
+            cost: np.full(len(self.unit_dict[cost]), bag_size, dtype=np.int64)
+            for cost, bag_size in zip(range(1, 6), self.game_data.bag_sizes)
+        }
+        self.__totals = np.array([ self.counts[cost].sum() for cost in range(1, 6) ])
+
+        return None
+
+    def get_unit(self, cost:int, rng=None) -> Unit:
+        """
+        Get a random unit of a cost and return it,
+        removing it from the pool. Each unit is picked with
+        probability proportional to its copies left.
+
+        Args:
+            cost (int): Cost of unit to get. Must be 1, 2, 3, 4, or 5.
+            rng (np.random.Generator): Random generator. When None (default), the global np.random state is used.
+
+        Returns:
+            Unit: Random unit of the specified cost.
+        """
+
+        assert cost in [1, 2, 3, 4, 5], "Cost must be 1, 2, 3, 4, or 5."
+        assert self.__totals[cost-1] > 0, f"No {cost} cost units left in the pool."
+
+        counts = self.counts[cost]
+
+        # position of a uniform draw in the cumulative counts gives the unit
+        draw = np.random.randint(self.__totals[cost-1]) if rng is None else int(rng.integers(self.__totals[cost-1]))
+        i = int(np.searchsorted(np.cumsum(counts), draw, side='right'))
+
+        counts[i] -= 1
+        self.__totals[cost-1] -= 1
+
+        return self.__units[cost][i]
+
+    def return_unit(self, unit:Unit) -> None:
+        """
+        Return a unit to the pool. This simulates a unit being
+        sold.
+
+        Args:
+            Unit: The unit to return to the pool. Must be a Unit object.
+
+        Returns:
+            None
+        """
+
+        self.counts[unit.cost][self.__index[unit.cost][unit.id]] += 1
+        self.__totals[unit.cost-1] += 1
+
+        return None
+
+    def size(self, cost=None) -> int:
+        """
+        Getter for size of pool
+
+        Args:
+            cost (int): If 1, 2, 3, 4, or 5, is
+                provided, will return the size of the
+                pool for that cost only. When None (default),
+                returns size of whole pool.
+
+        Returns:
+            int: Size of pool
+
+        """
+
+        if cost is None: # if no cost provided
+            return int(self.__totals.sum())
+
+        return int(self.__totals[cost-1])
+
+    def count(self, unit:Unit) -> int:
+        """
+        Copies of a unit left in the pool.
+
+        Args:
+            unit (Unit): The unit to count. Must be a Unit object.
+
+        Returns:
+            int: Copies left, 0 for units not in the game
+        """
+
+        i = self.__index[unit.cost].get(unit.id)
+
+        return 0 if i is None else int(self.counts[unit.cost][i])
+
+    def get_odds(self, unit:Unit) -> float:
+
+        """
+        Odds of getting a specific unit from a cost level.
+        The odds are equal to the proportion of a cost pool that
+        are that unit.
+
+        Args:
+            unit (Unit): The unit to get the odds for. Must be a Unit object.
+
+        Returns:
+            float: Odds of getting the unit from the pool, 0 when no units of its cost are left.
+        """
+
+        total = int(self.__totals[unit.cost-1])
+
+        return self.count(unit)/total if total > 0 else 0
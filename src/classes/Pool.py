@@ -1,26 +1,30 @@
 import numpy as np
-import requests
-import json
-from .Unit import Unit
-from .util import BagSizes
+from .Unit import Unit, unit_by_id
+from .registry import GameData, resolve_game_data
 
 class Pool():
     """
     Collection of units available to the player.
     
     Attributes:
-        units (dict): Dictionary of all units available to the player.
-            Keys are cost levels (1-5) and values are lists of Unit objects.
-        unit_dict (dict): Dictionary of unique units available in the game.
-            Keys are cost levels (1-5) and values are lists of unit names.
+        units (dict): Dictionary of all units available to the player. Keys are cost
+            levels (1-5) and values map the id of each unit (see Unit.unit_by_id()) to its copies left.
+        unit_dict (MappingProxyType): Unique units available in the game, shared with
+            the game data registry. Keys are cost levels (1-5) and values are tuples of unit names.
+        game_data (GameData): Shared game data the pool is built from.
+        __sizes (dict): Copies left for each cost, kept in sync with units.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, game_data:GameData=None) -> None:
         """
-        Loads units and initializes pool according to bag sizes.
+        Initializes pool from the shared game data according to bag sizes.
+
+        Args:
+            game_data (GameData or str): Game data to use, or the key of a set or patch
+                (see registry.GameDataStore). When None (default), the process-wide registry is used.
         """
-        self.units = {i:[] for i in range(1,6)}
-        self.unit_dict = self.__load_units()
+        self.game_data = resolve_game_data(game_data)
+        self.unit_dict = self.game_data.unit_dict
         self.new_game()
 
     def new_game(self) -> None:
@@ -34,63 +38,23 @@ class Pool():
             None
         """
         
-        for i in range(BagSizes._1COST.value):
-            self.units[1] += [Unit(unit_name, cost=1) for unit_name in self.unit_dict[1]]
-        
-        for i in range(BagSizes._2COST.value):
-            self.units[2] += [Unit(unit_name, cost=2) for unit_name in self.unit_dict[2]]
-
-        for i in range(BagSizes._3COST.value):
-            self.units[3] += [Unit(unit_name, cost=3) for unit_name in self.unit_dict[3]]
-            
-        for i in range(BagSizes._4COST.value):
-            self.units[4] += [Unit(unit_name, cost=4) for unit_name in self.unit_dict[4]]
-
-        for i in range(BagSizes._5COST.value):
-            self.units[5] += [Unit(unit_name, cost=5) for unit_name in self.unit_dict[5]]
+        # one count per champion instead of one entry per copy, every copy of a champion is the same Unit
+        self.units = {
+            cost: { Unit(unit_name, cost=cost).id: int(bag_size) for unit_name in self.unit_dict[cost] }
+            for cost, bag_size in zip(range(1, 6), self.game_data.bag_sizes)
+        }
+        self.__sizes = { cost: sum(ids.values()) for cost, ids in self.units.items() }
         
         return None
     
-    def __load_units(self, set_:str='14') -> dict: 
-        """
-        Load CDragon TFT JSON data, which contains all units
-        and their costs. Traitless and 0 cost units are removed.
-
-        Args:
-            set_ (str): Set number to load. Default is '14'.
-        
-        Returns: 
-            dict: Units sorted by unit cost
-        """
-
-        # url to CDragon for TFT latest patch, could change in the future
-        url = 'https://raw.communitydragon.org/latest/cdragon/tft/en_us.json'
-
-        r = requests.get(url)
-
-        data = json.loads(r.text)
-
-        units = dict()
-
-        for unit in data['sets'][set_]['champions']:
-        
-            if unit['cost'] <= 5 and len(unit['traits'])>0:
-
-                if unit['cost'] not in units.keys():
-                    units[unit['cost']] = [unit['name']]
-                
-                else:
-                    units[unit['cost']].append(unit['name'])
-
-        return units
-
-    def get_unit(self, cost:int) -> Unit:
+    def get_unit(self, cost:int, rng=None) -> Unit:
         """
         Get a random unit of a cost and return it, 
         removing it from the pool.
         
         Args:
             cost (int): Cost of unit to get. Must be 1, 2, 3, 4, or 5.
+            rng (np.random.Generator): Random generator. When None (default), the global np.random state is used.
             
         Returns:
             Unit: Random unit of the specified cost.
@@ -98,11 +62,20 @@ class Pool():
         
         assert cost in [1, 2, 3, 4, 5], "Cost must be 1, 2, 3, 4, or 5."
 
-        unit = np.random.choice(self.units[cost])
+        # one integer per draw, as np.random.choice() over the copies used, walked through the counts
+        size = self.__sizes[cost]
+        draw = np.random.randint(size) if rng is None else int(rng.integers(size))
+
+        ids = self.units[cost]
+        for unit_id, copies in ids.items():
+            if draw < copies:
+                break
+            draw -= copies
 
-        self.units[cost].remove(unit)
+        ids[unit_id] -= 1
+        self.__sizes[cost] -= 1
 
-        return unit
+        return unit_by_id(unit_id)
 
     def return_unit(self, unit:Unit) -> None:
         """
@@ -116,7 +89,9 @@ class Pool():
             None
         """
 
-        self.units[unit.cost].append(unit)
+        ids = self.units[unit.cost]
+        ids[unit.id] = ids.get(unit.id, 0) + 1
+        self.__sizes[unit.cost] += 1
 
         return None
     
@@ -139,11 +114,11 @@ class Pool():
 
         if cost is None: # if no cost provided
 
-            for cost_ in self.units.values():
-                n += len(cost_)
+            for cost_ in self.__sizes.values():
+                n += cost_
 
         else:
-            n = len(self.units[cost])
+            n = self.__sizes[cost]
         
         return n
 
@@ -161,9 +136,9 @@ class Pool():
         Returns:
             float: Odds of getting the unit from the pool.
         """
-        count = sum([ 1 for unit_shop in self.units[unit.cost] if unit.name==unit_shop.name])
+        count = self.units[unit.cost].get(unit.id, 0)
 
-        return count/len(self.units[unit.cost])
+        return count/self.__sizes[unit.cost]
         
 
 
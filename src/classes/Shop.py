@@ -1,65 +1,42 @@
 import numpy as np
-import requests
-import json
-from .Unit import Unit
+from .Unit import Unit, unit_by_id
 from .Pool import Pool
+from .registry import GameData, resolve_game_data
 
 class Shop():
     """
     Representation of a shop in TFT. 
     
     Attributes:
-        slots (list): List of units in the shop.
-        odds (list): List of odds for each cost and level.
+        slots (list): List of units in the shop, None for an empty slot.
+        odds (np.ndarray): Read-only level x cost array of shop odds, shared with the game data registry.
+        game_data (GameData): Shared game data the odds come from.
         __level (int): Current team level.
+        __slot_ids (list): Id of the unit in each slot, -1 when empty.
     """
 
-    def __init__(self, level:int) -> None:
+    def __init__(self, level:int, game_data:GameData=None) -> None:
         """
-        Initializes the shop with a given level and loads shop odds
+        Initializes the shop with a given level and references the shared shop odds
 
         Args:
-            level (int): _description_
+            level (int): Current team level
+            game_data (GameData or str): Game data to use, or the key of a set or patch
+                (see registry.GameDataStore). When None (default), the process-wide registry is used.
         """
         self.__level = level
-        self.slots = [ None for i in range(5) ]
-        self.odds = self.__load_shop_odds()
+        self.__slot_ids = [-1] * 5
+        self.game_data = resolve_game_data(game_data)
+        self.odds = self.game_data.odds
         
-    def __load_shop_odds(self) -> list:
-
-        """
-        Uses requests to grab shop odds from DDragon for each level
-        
-        Returns:
-            list: Odds of getting each cost in the shop at each level.
-        """
-
-        # url to DDragon for TFT latest patch
-        url = 'https://raw.githubusercontent.com/InFinity54/LoL_DDragon/refs/heads/master/latest/data/en_US/tft-shop-drop-rates-data.json'
-
-        r = requests.get(url)
-
-        data = json.loads(r.text)
-
-        shop_odds = list()
-
-        for level in data['data']['Shop']:
-
-            level_drop_rates = level['dropRatesByTier'][0:5]
-
-            odds_array = np.array([ cost['rate'] for cost in level_drop_rates ])/100
-            shop_odds.append(odds_array)
-
-
-        return shop_odds
-    
-    def fresh_shop(self, pool:Pool) -> None:
+    def fresh_shop(self, pool:Pool, rng=None) -> None:
         """
         Fills the shop with different units from the pool 
         according to self.odds()
 
         Args:
             pool (Pool): The unit pool to draw from.
+            rng (np.random.Generator): Random generator. When None (default), the global np.random state is used.
 
         Returns:
             None
@@ -69,31 +46,33 @@ class Shop():
 
         for i in range(5):
 
-            cost = np.random.choice(range(1,6), p=odds)
+            cost = (np.random if rng is None else rng).choice(range(1,6), p=odds)
 
-            self.slots[i] = pool.get_unit(cost)
+            self.__slot_ids[i] = pool.get_unit(cost, rng).id
         
         return None
     
-    def refresh_shop(self, pool:Pool) -> None:
+    def refresh_shop(self, pool:Pool, rng=None) -> None:
         """
         Returns current units in shop to the pool and fills 
         the shop with new units.
 
         Args:
             pool (Pool): The unit pool to draw from.
+            rng (np.random.Generator): Random generator. When None (default), the global np.random state is used.
             
         Returns:
             None
         """
 
-        for unit in self.slots:
+        for unit_id in self.__slot_ids:
 
-            pool.return_unit(unit)
+            if unit_id >= 0:
+                pool.return_unit(unit_by_id(unit_id))
         
-        self.slots = [ None for i in range(5) ]
+        self.__slot_ids = [-1] * 5
 
-        self.fresh_shop(pool)
+        self.fresh_shop(pool, rng)
 
         return None
 
@@ -107,6 +86,26 @@ class Shop():
         """
 
         return [unit.name for unit in self.slots]
+
+    @property
+    def slots(self) -> list:
+        """
+        Getter for the units in the shop
+
+        Returns:
+            list: Unit in each slot, None for an empty slot
+        """
+        return [ None if unit_id < 0 else unit_by_id(unit_id) for unit_id in self.__slot_ids ]
+
+    @slots.setter
+    def slots(self, units:list) -> None:
+        """
+        Setter for the units in the shop
+
+        Args:
+            units (list): Unit for each slot, None for an empty slot
+        """
+        self.__slot_ids = [ -1 if unit is None else unit.id for unit in units ]
     
     def level_up(self) -> None:
         """
@@ -1,23 +1,100 @@
+import threading
+
+# every interned unit, the position of a unit is its id
+_units = []
+_ids = {}
+_lock = threading.Lock()
+
 class Unit():
     """
-    Simple representation a TFT unit
+    Simple representation a TFT unit. Units are interned: Unit(name, cost) returns the
+    same read-only object for every call with the same champion, numbered with a small
+    integer id, so pools and shops can hold ids and the process holds one Unit per champion.
+    Ids are given in order of first use and only mean something within one process.
 
     Attributes:
         name (str): Name of the unit
         cost (int): Cost of the unit (1-5)
+        id (int): Position of the unit in the registry (see unit_by_id()), -1 when not interned
     """
-    def __init__(self, name:str, cost:int):
+
+    __slots__ = ('name', 'cost', 'id')
+
+    def __new__(cls, name:str, cost:int) -> 'Unit':
         """
-        Unit constructor
+        Unit constructor, returns the interned unit of a champion
 
         Args:
             name (str): Name of the unit
             cost (unit): Cost of the unit (1-5)
         """
-        
+
+        unit = _ids.get((name, cost))
+
+        if unit is None:
+            assert cost in [1, 2, 3, 4, 5], "Cost must be between 1 and 5"
+
+            with _lock:
+                unit = _ids.get((name, cost))
+                if unit is None:
+                    unit = cls.unregistered(name, cost)
+                    object.__setattr__(unit, 'id', len(_units))
+                    _units.append(unit)
+                    _ids[(name, cost)] = unit
+
+        return unit
+
+    @classmethod
+    def unregistered(cls, name:str, cost:int) -> 'Unit':
+        """
+        Unit outside the registry, e.g. for a name typed by a user that is no champion of
+        the game data. Interning those would grow the registry with every new name.
+
+        Args:
+            name (str): Name of the unit
+            cost (unit): Cost of the unit (1-5)
+
+        Returns:
+            Unit: A new unit with id -1
+        """
+
         assert cost in [1, 2, 3, 4, 5], "Cost must be between 1 and 5"
 
-        self.name = name
-        self.cost = cost
-        
+        unit = object.__new__(cls)
+        object.__setattr__(unit, 'name', name)
+        object.__setattr__(unit, 'cost', cost)
+        object.__setattr__(unit, 'id', -1)
+
+        return unit
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Unit is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError('Unit is read-only')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # interned again on unpickling, ids differ between processes
+        return (Unit, (self.name, self.cost)) if self.id >= 0 else (Unit.unregistered, (self.name, self.cost))
+
+    def __repr__(self) -> str:
+        return f'Unit({self.name!r}, {self.cost})'
+
+def unit_by_id(id_:int) -> Unit:
+    """
+    Getter for an interned unit from its id.
+
+    Args:
+        id_ (int): Unit id
+
+    Returns:
+        Unit: The unit
+    """
 
+    return _units[id_]
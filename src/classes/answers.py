@@ -0,0 +1,293 @@
+import os
+import json
+import numpy as np
+from .registry import GameData, resolve_game_data
+from .distribution import hit_cdf
+from .util import process_state, expected_shops
+
+# bump whenever the layout of the table file changes
+TABLE_VERSION = 2
+
+MAGIC = b'TFTANSWR'
+
+ALIGN = 64
+
+# shortest curve distribution.hit_cdf() returns, which is the whole curve when the tail is within tol by then
+HORIZON = 100
+
+# expected shops the table cannot answer
+MISSING = -1
+
+TABLE_PATH = os.environ.get(
+    'TFT_ANSWERS_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'answers.bin')
+)
+
+
+def build_answer_table(game_data:GameData=None, path:str=TABLE_PATH, nout_max:int=8, tol:float=1e-4) -> None:
+    """
+    Precomputes the answers for every game state with the util math and writes them to one
+    binary file that AnswerTable memory-maps. Game states are stored in the normalized form
+    process_state() reduces them to, for each cost:
+
+    - expected[level, nneeded-1, nleft, npool]: expected shops as in number_shops(), in
+      hundredths of a shop, for every pool size, which also covers both sweeps. MISSING where
+      the unit cannot be hit. Every answer is rounded to the hundredths, so this is exact.
+    - cdf_index[level, nneeded-1, nleft, nout]: row of cdf holding cdf_curve() for up to
+      nout_max other same-cost units out of the pool, MISSING when it is not stored.
+    - cdf[row, shop]: curves whose tail is within tol by HORIZON shops, the ones cdf_curve()
+      stops at HORIZON. Longer curves are computed on request, storing them all would take
+      hundreds of megabytes.
+
+    Args:
+        game_data (GameData or str): Game data to build from, or a set or patch key. When None (default), the process-wide registry is used.
+        path (str): Destination of the table file
+        nout_max (int): Most other same-cost units out of the pool with a stored CDF
+        tol (float): Tail probability of cdf_curve() the curves are stored for
+
+    Returns:
+        None
+    """
+
+    game_data = resolve_game_data(game_data)
+    nlevels = game_data.odds.shape[0]
+
+    arrays = {}
+
+    for cost in range(1, 6):
+
+        ntot = int(game_data.bag_sizes[cost-1])
+        size = ntot * int(game_data.units_per_cost[cost-1])
+
+        nleft = np.arange(ntot + 1)[:, None]
+        npool = np.arange(size + 1)[None, :]
+
+        expected = np.full((nlevels, 9, ntot + 1, size + 1), MISSING, dtype=np.int32)
+        cdf_index = np.full((nlevels, 9, ntot + 1, nout_max + 1), MISSING, dtype=np.int32)
+        curves = []
+
+        for level in range(1, nlevels + 1):
+
+            cost_odd = float(game_data.odds[level-1, cost-1])
+
+            if cost_odd == 0:
+                continue
+
+            for nneeded in range(1, 10):
+
+                shops = np.where(npool >= nleft, expected_shops(nneeded, nleft, npool, cost_odd), np.nan)
+                # same rounding as number_shops(), the hundredths give back exactly the rounded floats
+                hundredths = np.array([ np.nan if np.isnan(rolls) else round(round(rolls, 2) * 100) for rolls in shops.ravel().tolist() ])
+                if np.nanmax(hundredths, initial=0) > np.iinfo(np.int32).max:
+                    raise ValueError(f'Expected shops of {cost} cost units do not fit the table')
+                expected[level-1, nneeded-1] = np.where(np.isnan(hundredths), MISSING, hundredths).reshape(shops.shape)
+
+                for n in range(nneeded, ntot + 1):
+                    for nout in range(nout_max + 1):
+
+                        pool_size = size - ntot + n - nout
+                        found = np.arange(nneeded)
+                        probs = (n - found) / (pool_size - found) * cost_odd
+
+                        # the same blocks cdf_curve() computes, so a stored curve is the one it returns
+                        curve = hit_cdf(probs, tol=tol, max_shops=HORIZON)
+                        if curve[-1] >= 1 - tol:
+                            cdf_index[level-1, nneeded-1, n, nout] = len(curves)
+                            curves.append(curve * 100)
+
+        arrays[f'expected_{cost}'] = expected
+        arrays[f'cdf_index_{cost}'] = cdf_index
+        arrays[f'cdf_{cost}'] = np.array(curves).reshape(-1, HORIZON)
+
+    specs = {}
+    offset = 0
+    for name, array in arrays.items():
+        specs[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({
+        'version': TABLE_VERSION,
+        'game_data': game_data.version,
+        'nout_max': nout_max,
+        'tol': tol,
+        'arrays': specs,
+    }).encode()
+
+    # arrays start on an aligned offset after the magic, header length and header
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+
+        for name, array in arrays.items():
+            f.seek(start + specs[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    os.replace(tmp_path, path)
+
+    return None
+
+
+class AnswerTable():
+    """
+    Memory-mapped answers built by build_answer_table(). The file is mapped read-only,
+    so every worker process serving from the same file shares its pages. Lookups give the
+    same answers as the util functions, and return None for states outside the table
+    (unreachable units, more units out of the pool than were precomputed, CDFs longer
+    than HORIZON shops or odd pool sizes) and the caller computes those directly.
+
+    Attributes:
+        game_data (GameData): Game data the table was built from.
+        nout_max (int): Most other same-cost units out of the pool with a stored CDF.
+        tol (float): Tail probability of the stored CDFs.
+    """
+
+    def __init__(self, path:str=TABLE_PATH, game_data:GameData=None) -> None:
+        """
+        Maps the table file and checks that it matches the game data.
+
+        Args:
+            path (str): Location of the table file
+            game_data (GameData): Game data the table must be built from. When None
+                (default), the process-wide registry is used.
+        """
+
+        self.game_data = resolve_game_data(game_data)
+
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not an answer table')
+            length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(length))
+
+        if header['version'] != TABLE_VERSION or header['game_data'] != self.game_data.version:
+            raise ValueError(f'{path} was built for other game data')
+
+        self.nout_max = header['nout_max']
+        self.tol = header['tol']
+
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        start = -(-(len(MAGIC) + 8 + length) // ALIGN) * ALIGN
+
+        self.__arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            offset = start + spec['offset']
+            count = int(np.prod(spec['shape']))
+            self.__arrays[name] = buffer[offset:offset + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    def __state(self, unit, nteam:int, nother:int, star:int, level:int, shop) -> tuple:
+        # normalized state, or None when the unit cannot be hit and util should give the message
+        nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+        if shop.game_data is not self.game_data or nneeded == 0 or cost_odd == 0 or nleft <= 0 or nleft < nneeded:
+            return None
+
+        return nneeded, nleft, cost
+
+    def number_shops(self, unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, round_to_int=True):
+        """
+        Table lookup of classes.util.number_shops(), same arguments. Returns None outside the table.
+        """
+
+        state = self.__state(unit, nteam, nother, star, level, shop)
+        expected = self.__arrays[f'expected_{unit.cost}']
+
+        if state is None or not state[1] <= npool < expected.shape[3]:
+            return None
+
+        nneeded, nleft, cost = state
+        hundredths = int(expected[level-1, nneeded-1, nleft, npool])
+
+        # halfway between two shops in the hundredths can round either way unrounded
+        if hundredths == MISSING or (round_to_int and hundredths % 100 == 50):
+            return None
+
+        return round(hundredths / 100) if round_to_int else hundredths / 100
+
+    def cdf_curve(self, unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, tol:float=1e-4) -> tuple:
+        """
+        Table lookup of classes.util.cdf_curve(), same arguments. Returns None outside the table.
+        """
+
+        state = self.__state(unit, nteam, nother, star, level, shop)
+
+        if state is None or tol != self.tol:
+            return None
+
+        nneeded, nleft, cost = state
+        ntot = int(self.game_data.bag_sizes[cost-1])
+        nout = ntot * int(self.game_data.units_per_cost[cost-1]) - ntot + nleft - npool
+
+        if not 0 <= nout <= self.nout_max:
+            return None
+
+        row = int(self.__arrays[f'cdf_index_{cost}'][level-1, nneeded-1, nleft, nout])
+
+        if row == MISSING:
+            return None
+
+        return np.arange(1, HORIZON + 1), self.__arrays[f'cdf_{cost}'][row]
+
+    def n_other_shop_curve(self, unit, nteam:int, npool:int, star:int, level:int, shop) -> tuple:
+        """
+        Table lookup of classes.util.n_other_shop_curve(), same arguments. Returns None outside the table.
+        """
+
+        nneeded, ntot_left, cost, cost_odd = process_state(unit, nteam, 0, star, level, shop)
+        expected = self.__arrays[f'expected_{cost}']
+
+        if shop.game_data is not self.game_data or nneeded not in range(1, 10) or not ntot_left <= npool < expected.shape[3]:
+            return None
+
+        nother = np.arange(1, ntot_left)
+        hundredths = expected[level-1, nneeded-1, ntot_left - nother, npool - nother]
+
+        return ntot_left - nother, np.where(hundredths == MISSING, np.nan, hundredths / 100)
+
+    def n_pool_shop_curve(self, unit, nteam:int, nother:int, star:int, level:int, shop, units_per_cost:int) -> tuple:
+        """
+        Table lookup of classes.util.n_pool_shop_curve(), same arguments. Returns None outside the table.
+        """
+
+        nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+        expected = self.__arrays[f'expected_{cost}']
+        ntot = int(self.game_data.bag_sizes[cost-1])
+
+        if shop.game_data is not self.game_data or nneeded not in range(1, 10) or not 0 <= nleft <= ntot \
+                or units_per_cost != self.game_data.units_per_cost[cost-1]:
+            return None
+
+        npool = np.arange(ntot*units_per_cost - 1, ntot - 1, -1)
+        hundredths = expected[level-1, nneeded-1, nleft, npool]
+
+        return npool - ntot, np.where(hundredths == MISSING, np.nan, hundredths / 100)
+
+
+def load_answer_table(path:str=TABLE_PATH, game_data:GameData=None) -> AnswerTable:
+    """
+    Maps the answer table if it exists and matches the game data.
+
+    Args:
+        path (str): Location of the table file
+        game_data (GameData): Game data the table must be built from
+
+    Returns:
+        AnswerTable: The mapped table, or None when it is missing or stale
+    """
+
+    try:
+        return AnswerTable(path, game_data)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+if __name__ == '__main__':
+    # written once at image build after the snapshot, see Dockerfile
+    build_answer_table(nout_max=int(os.environ.get('TFT_ANSWERS_NOUT_MAX', 8)))
+    print(f'Wrote answer table to {TABLE_PATH}')
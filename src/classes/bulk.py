@@ -0,0 +1,254 @@
+import numpy as np
+from .registry import GameData, resolve_game_data
+
+# columns of a bulk request, in the order of the arguments of process_state()
+COLUMNS = ('cost', 'star', 'level', 'nteam', 'nother', 'n_out_of_pool')
+
+# why number_shops() has no number for a state, indexed by the reason codes of bulk_process_state()
+MESSAGES = (
+    None,
+    "Unit is already 3 starred",
+    "Level too low to find {cost} cost unit",
+    "Not enough units left in pool",
+)
+
+def validate_states(states:dict, game_data:GameData) -> dict:
+    """
+    Checks a batch of game states and converts the columns to int64 arrays of one length.
+    The same limits as utils.pipeline.build_state() apply to every row.
+
+    Args:
+        states (dict): Array or list for each name in COLUMNS, nteam, nother and n_out_of_pool default to 0
+        game_data (GameData): Shared game data, used for the valid levels
+
+    Returns:
+        dict: int64 array for each name in COLUMNS
+
+    Raises:
+        ValueError: When the states are not an object of columns, a column is missing or
+            malformed, or a row is out of range
+    """
+
+    if not isinstance(states, dict):
+        raise ValueError('States must be a json object of columns')
+
+    missing = [ name for name in COLUMNS[:3] if name not in states ]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    try:
+        n = len(states['cost'])
+        columns = { name: np.asarray(states.get(name, np.zeros(n)), dtype=np.int64) for name in COLUMNS }
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('Columns must be arrays of integers')
+
+    if any( column.shape != (n,) for column in columns.values() ):
+        raise ValueError('Columns must be one-dimensional and of the same length')
+
+    limits = {
+        'cost': (1, 5),
+        'star': (1, 3),
+        'level': (1, game_data.odds.shape[0]),
+        'nteam': (0, 8),
+        'nother': (0, None),
+        'n_out_of_pool': (0, None),
+    }
+
+    for name, (low, high) in limits.items():
+        bad = (columns[name] < low) | (columns[name] > high if high is not None else False)
+        if bad.any():
+            row = int(np.argmax(bad))
+            raise ValueError(f'{name} out of range in row {row}: {columns[name][row]}')
+
+    # as in build_state(), only the other units of the cost can be out of the pool
+    cost = columns['cost']
+    others = (game_data.units_per_cost[cost-1] - 1) * game_data.bag_sizes[cost-1]
+    bad = columns['n_out_of_pool'] > others
+    if bad.any():
+        row = int(np.argmax(bad))
+        raise ValueError(f'n_out_of_pool out of range in row {row}: at most {others[row]} other {cost[row]} cost units can be out of the pool')
+
+    return columns
+
+def bulk_process_state(columns:dict, game_data:GameData) -> tuple:
+    """
+    Array version of util.process_state() for validated columns, with the pool size
+    worked out the way utils.pipeline.compute_outputs() does for an untouched pool.
+
+    Args:
+        columns (dict): Validated columns from validate_states()
+        game_data (GameData): Shared game data giving the bag sizes and odds
+
+    Returns:
+        nneeded (np.ndarray): Copies needed to reach the star level
+        nleft (np.ndarray): Copies left in the pool
+        npool (np.ndarray): Units of the same cost left in the pool
+        cost_odd (np.ndarray): Odds of a shop slot rolling the cost
+        reason (np.ndarray): 0 when the unit can be hit, else an index into MESSAGES
+    """
+
+    cost, star, level = columns['cost'], columns['star'], columns['level']
+    nteam, nother = columns['nteam'], columns['nother']
+
+    nneeded = np.select([star == 3, star == 2, star == 1], [9 - nteam, 3 - nteam % 3, np.ones_like(nteam)], 0)
+
+    ntot = game_data.bag_sizes[cost-1]
+    cost_odd = game_data.odds[level-1, cost-1]
+    nleft = ntot - nteam - nother
+    npool = ntot * game_data.units_per_cost[cost-1] - columns['n_out_of_pool'] - nteam - nother
+
+    # same order of checks as number_shops()
+    reason = np.select([nneeded == 0, cost_odd == 0, (nleft <= 0) | (nleft < nneeded)], [1, 2, 3], 0).astype(np.int8)
+
+    return nneeded, nleft, npool, cost_odd, reason
+
+def bulk_number_shops(nneeded:np.ndarray, nleft:np.ndarray, npool:np.ndarray, cost_odd:np.ndarray) -> np.ndarray:
+    """
+    Array version of util.number_shops() over states with different copies needed.
+    The copies are laid out along a first axis of length 9 (the most ever needed), and
+    copies past those needed add nothing, so the sums match number_shops() exactly.
+
+    Args:
+        nneeded (np.ndarray): Copies needed to reach the star level
+        nleft (np.ndarray): Copies left in the pool
+        npool (np.ndarray): Units of the same cost left in the pool
+        cost_odd (np.ndarray): Odds of a shop slot rolling the cost
+
+    Returns:
+        np.ndarray: Expected number of shops (unrounded), NaN where the unit cannot be hit
+    """
+
+    found = np.arange(9)[:, None]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = (nleft - found)/(npool - found) * cost_odd
+        shops = np.where(found < nneeded, 1/p, 0).sum(axis=0)/5
+
+    return np.where((nleft >= nneeded) & (nleft > 0) & (nneeded > 0) & (cost_odd > 0), shops, np.nan)
+
+def bulk_hit_probability(nneeded:np.ndarray, nleft:np.ndarray, npool:np.ndarray, cost_odd:np.ndarray, shops:int) -> np.ndarray:
+    """
+    Probability of having every needed copy within a number of shop rolls, for many states
+    at once. The chain over copies found from distribution.hit_cdf() is advanced for all
+    states together, one slot at a time.
+
+    Args:
+        nneeded (np.ndarray): Copies needed to reach the star level
+        nleft (np.ndarray): Copies left in the pool
+        npool (np.ndarray): Units of the same cost left in the pool
+        cost_odd (np.ndarray): Odds of a shop slot rolling the cost
+        shops (int): Number of shop rolls
+
+    Returns:
+        np.ndarray: Probability (0-1) of hitting within shops rolls, NaN where the unit cannot be hit
+    """
+
+    found = np.arange(9)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        probs = (nleft[:, None] - found)/(npool[:, None] - found) * cost_odd[:, None]
+    probs = np.where(found < nneeded[:, None], probs, 0)
+
+    # state[:, j] is the probability of having found j copies, the needed count absorbs
+    state = np.zeros((nneeded.size, 10))
+    state[:, 0] = 1
+
+    for _ in range(5 * shops):
+        moved = state[:, :9] * probs
+        state[:, :9] -= moved
+        state[:, 1:] += moved
+
+    hit = np.take_along_axis(state, np.clip(nneeded, 0, 9)[:, None], axis=1)[:, 0]
+
+    return np.where((nleft >= nneeded) & (nleft > 0) & (nneeded > 0) & (cost_odd > 0), hit, np.nan)
+
+def bulk_query(states:dict, game_data:GameData=None, shops:int=None) -> dict:
+    """
+    Evaluates a batch of game states at once.
+
+    Args:
+        states (dict): Array or list for each name in COLUMNS, nteam, nother and n_out_of_pool default to 0
+        game_data (GameData or str): Game data to use, or the key of a set or patch (see registry.GameDataStore). When None (default), the process-wide registry is used.
+        shops (int): When given, also the probability of hitting within this many shop rolls
+
+    Returns:
+        dict: The validated columns, expected (unrounded expected shops), reason (see MESSAGES)
+            and, with shops, probability
+
+    Raises:
+        ValueError: When the states are invalid, see validate_states()
+    """
+
+    game_data = resolve_game_data(game_data)
+    columns = validate_states(states, game_data)
+
+    nneeded, nleft, npool, cost_odd, reason = bulk_process_state(columns, game_data)
+
+    result = dict(columns)
+    result['expected'] = bulk_number_shops(nneeded, nleft, npool, cost_odd)
+    result['reason'] = reason
+
+    if shops is not None:
+        result['probability'] = bulk_hit_probability(nneeded, nleft, npool, cost_odd, shops)
+
+    return result
+
+def iter_bulk(chunks, game_data:GameData=None, shops:int=None, chunk_size:int=10_000):
+    """
+    Evaluates game states chunk by chunk, so memory stays flat however many states
+    go through. Large chunks are split to at most chunk_size rows.
+
+    Args:
+        chunks (iterable): Dicts of columns as taken by bulk_query()
+        game_data (GameData or str): Game data to use, or the key of a set or patch (see registry.GameDataStore). When None (default), the process-wide registry is used.
+        shops (int): When given, also the probability of hitting within this many shop rolls
+        chunk_size (int): Most rows evaluated at once
+
+    Yields:
+        dict: Results of bulk_query() for each piece of each chunk
+
+    Raises:
+        ValueError: When a chunk is invalid, after the chunks before it were yielded
+    """
+
+    game_data = resolve_game_data(game_data)
+
+    for chunk in chunks:
+        columns = validate_states(chunk, game_data)
+        n = columns['cost'].size
+
+        for start in range(0, n, chunk_size):
+            yield bulk_query({ name: column[start:start + chunk_size] for name, column in columns.items() }, game_data, shops)
+
+def result_rows(result:dict, round_to_int:bool=True):
+    """
+    Rows of a bulk_query() result, for writing one state per line.
+
+    Args:
+        result (dict): Result of bulk_query()
+        round_to_int (bool): Rounds the expected shops to an integer as number_shops()
+            does, else to the hundredths
+
+    Yields:
+        dict: Columns, expected shops (None with a message when the unit cannot be hit)
+            and, when computed, probability
+    """
+
+    columns = [ result[name].tolist() for name in COLUMNS ]
+    expected = result['expected'].tolist()
+    reason = result['reason'].tolist()
+    probability = result['probability'].tolist() if 'probability' in result else None
+
+    for i, values in enumerate(zip(*columns)):
+        row = dict(zip(COLUMNS, values))
+
+        if reason[i]:
+            row['expected'] = None
+            row['message'] = MESSAGES[reason[i]].format(cost=row['cost'])
+        else:
+            row['expected'] = round(expected[i]) if round_to_int else round(expected[i], 2)
+
+        if probability is not None:
+            row['probability'] = None if reason[i] else probability[i]
+
+        yield row
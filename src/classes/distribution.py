@@ -0,0 +1,94 @@
+import numpy as np
+
+def shop_transition(probs) -> np.ndarray:
+    """
+    Transition matrix of one shop reroll over the number of copies found.
+    A single slot finds the next copy with probability probs[j] when j copies
+    have been found, and a reroll is 5 slots in a row.
+
+    Args:
+        probs (np.ndarray): Odds of a slot hitting the next copy, indexed by copies found
+
+    Returns:
+        np.ndarray: (n+1) x (n+1) matrix, entry [i, j] is the probability of going from
+            i to j copies found in one reroll. State n (all copies found) is absorbing.
+    """
+
+    probs = np.asarray(probs, dtype=np.float64)
+    n = probs.size
+
+    slot = np.diag(np.append(1 - probs, 1))
+    slot[np.arange(n), np.arange(1, n + 1)] = probs
+
+    return np.linalg.matrix_power(slot, 5)
+
+def hit_cdf(probs, tol:float=1e-4, min_shops:int=100, max_shops:int=100_000, block:int=64) -> np.ndarray:
+    """
+    Probability of having found every copy by each shop reroll. The sum of geometric
+    slot counts is followed as an absorbing Markov chain over copies found, stepping
+    a whole block of rerolls at a time with precomputed matrix powers. The horizon
+    grows until the probability of still missing a copy is below tol, so unlikely
+    3-star rolls are not cut off and likely ones stop after a few blocks.
+
+    Args:
+        probs (np.ndarray): Odds of a slot hitting the next copy, indexed by copies found
+        tol (float): Tail probability (0-1) left when the horizon stops growing
+        min_shops (int): Shortest horizon returned, e.g. to fill a plot axis
+        max_shops (int): Longest horizon computed, whatever the tail
+        block (int): Rerolls advanced per step
+
+    Returns:
+        np.ndarray: Probability (0-1) of having every copy after shop 1, 2, ...
+    """
+
+    return transition_cdf(shop_transition(probs), tol, min_shops, max_shops, block)
+
+def transition_cdf(transition:np.ndarray, tol:float=1e-4, min_shops:int=100, max_shops:int=100_000, block:int=64) -> np.ndarray:
+    """
+    Probability of reaching the last, absorbing state by each step of a chain that starts
+    in state 0, with the adaptive horizon described in hit_cdf().
+
+    Args:
+        transition (np.ndarray): (n+1) x (n+1) transition matrix of one shop reroll
+        tol (float): Tail probability (0-1) left when the horizon stops growing
+        min_shops (int): Shortest horizon returned, e.g. to fill a plot axis
+        max_shops (int): Longest horizon computed, whatever the tail
+        block (int): Rerolls advanced per step
+
+    Returns:
+        np.ndarray: Probability (0-1) of being absorbed after shop 1, 2, ...
+    """
+
+    n = transition.shape[0] - 1
+
+    # powers[b] moves the chain b+1 rerolls ahead
+    powers = np.empty((block, n + 1, n + 1))
+    powers[0] = transition
+    for b in range(1, block):
+        powers[b] = powers[b-1] @ transition
+
+    state = np.zeros(n + 1)
+    state[0] = 1
+
+    cdf = []
+    shops = 0
+
+    while shops < max_shops:
+
+        states = np.einsum('i,bij->bj', state, powers)
+        cdf.append(states[:, n])
+        state = states[-1]
+        shops += block
+
+        if shops >= min_shops and 1 - state[n] <= tol:
+            break
+
+    cdf = np.concatenate(cdf)
+
+    horizon = cdf.size
+
+    # trim the last block back to the first shop within tolerance
+    if cdf[-1] >= 1 - tol:
+        horizon = max(min_shops, int(np.argmax(cdf >= 1 - tol)) + 1)
+
+    return cdf[:min(horizon, max_shops)]
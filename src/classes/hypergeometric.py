@@ -0,0 +1,205 @@
+import math
+import numpy as np
+from .util import process_state
+from .distribution import transition_cdf
+
+SLOTS = 5
+
+def _comb(n, r:int) -> np.ndarray:
+    # n choose r for an array n and a small r, 0 where n < r
+    n = np.asarray(n, dtype=np.float64)
+    out = np.ones(n.shape)
+    for i in range(r):
+        out *= (n - i) / (i + 1)
+    return np.where(n >= r, out, 0)
+
+def reroll_transition(nneeded:int, nleft, npool, cost_odd:float) -> np.ndarray:
+    """
+    Exact transition of one shop reroll over the number of copies found. Each of the 5
+    slots rolls the unit's cost with probability cost_odd, so the number of slots of that
+    cost is binomial. Those slots are drawn together from the cost pool without
+    replacement, the way Shop.fresh_shop() takes them out of the Pool, so the copies in
+    one reroll are hypergeometric. Every copy found is bought and leaves the pool.
+    nleft and npool can be arrays that broadcast against each other, e.g. for a sweep.
+
+    Args:
+        nneeded (int): Number of copies of the unit needed to reach the desired star level
+        nleft (int or np.ndarray): Number of unit copies left in the pool
+        npool (int or np.ndarray): Number of units of the same cost left in the pool
+        cost_odd (float): Odds of a shop slot rolling the cost
+
+    Returns:
+        np.ndarray: (..., n+1, n+1) matrices, entry [i, j] is the probability of going from i
+            to j copies found in one reroll. State nneeded is absorbing, every row has at
+            most 6 entries.
+    """
+
+    n = nneeded
+    found = np.arange(n)
+
+    # copies and cost pool left with j copies found, j along the last axis
+    copies = np.asarray(nleft, dtype=np.float64)[..., None] - found
+    pool = np.asarray(npool, dtype=np.float64)[..., None] - found
+    copies, pool = np.broadcast_arrays(copies, pool)
+    others = pool - copies
+
+    # slots of the unit's cost in one reroll
+    weights = [ math.comb(SLOTS, k) * cost_odd**k * (1 - cost_odd)**(SLOTS - k) for k in range(SLOTS + 1) ]
+
+    copies_comb = [ _comb(copies, h) for h in range(SLOTS + 1) ]
+    others_comb = [ _comb(others, m) for m in range(SLOTS + 1) ]
+
+    # hits[h] is the probability of h copies in one reroll, for every j
+    hits = np.zeros((SLOTS + 1,) + copies.shape)
+
+    for k, weight in enumerate(weights):
+        if weight == 0:
+            continue
+
+        draws = _comb(pool, k)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(draws > 0, weight / draws, 0)
+
+        for h in range(k + 1):
+            hits[h] += copies_comb[h] * others_comb[k - h] * scale
+
+    transition = np.zeros(copies.shape[:-1] + (n + 1, n + 1))
+    transition[..., n, n] = 1
+
+    for h in range(1, SLOTS + 1):
+        transition[..., found, np.minimum(found + h, n)] += hits[h]
+
+    # a cost pool with fewer units than slots leaves mass unplaced, those slots miss
+    transition[..., found, found] += 1 - hits[1:].sum(axis=0)
+
+    return transition
+
+def expected_rerolls(nneeded:int, nleft, npool, cost_odd:float) -> np.ndarray:
+    """
+    Exact expected number of shops until every needed copy is found, from the
+    fundamental matrix of reroll_transition().
+
+    Args:
+        nneeded (int): Number of copies of the unit needed to reach the desired star level
+        nleft (int or np.ndarray): Number of unit copies left in the pool
+        npool (int or np.ndarray): Number of units of the same cost left in the pool
+        cost_odd (float): Odds of a shop slot rolling the cost
+
+    Returns:
+        np.ndarray: Expected number of shops (unrounded), NaN where the unit cannot be hit
+    """
+
+    nleft = np.asarray(nleft)
+    npool = np.asarray(npool)
+    hittable = (nleft >= nneeded) & (nleft > 0) & (nneeded > 0) & (cost_odd > 0) & (npool >= nleft)
+
+    if nneeded <= 0 or not hittable.any():
+        return np.full(np.broadcast(nleft, npool).shape, np.nan)
+
+    transient = reroll_transition(nneeded, nleft, npool, cost_odd)[..., :nneeded, :nneeded]
+    # states that cannot be left would make the system singular, they are masked below
+    transient = np.where(hittable[..., None, None], transient, 0)
+
+    system = np.eye(nneeded) - transient
+    shops = np.linalg.solve(system, np.ones(system.shape[:-1] + (1,)))[..., 0, 0]
+
+    return np.where(hittable, shops, np.nan)
+
+def exact_number_shops(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, round_to_int=True):
+    """
+    util.number_shops() with the exact reroll model of reroll_transition(), same
+    arguments and messages.
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        npool (int): Number of units of the same cost of the desired unit left in the pool
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        round_to_int (bool): If True (default), rounds to the nearest integer, else to the hundredths
+
+    Returns:
+        int or float: Expected number of shops until the desired star level is reached
+    """
+
+    nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+    if nneeded == 0:
+        return "Unit is already 3 starred"
+
+    if cost_odd == 0:
+        return f"Level too low to find {cost} cost unit"
+
+    if nleft <= 0 or nleft < nneeded or npool < nleft:
+        return "Not enough units left in pool"
+
+    rolls = float(expected_rerolls(nneeded, nleft, npool, cost_odd))
+
+    return round(rolls) if round_to_int else round(rolls, 2)
+
+def exact_cdf_curve(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, tol:float=1e-4) -> tuple:
+    """
+    util.cdf_curve() with the exact reroll model of reroll_transition(), same arguments
+    and return value.
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        npool (int): Number of units of the same cost of the desired unit left in the pool
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        tol (float): Tail probability left when the horizon stops growing
+
+    Returns:
+        rolls (np.ndarray): Shop rolls 1, 2, ..., empty when the unit cannot be hit
+        cdf (np.ndarray): Probability (%) of having hit by each shop roll
+    """
+
+    nneeded, nleft, _, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+    if nneeded == 0 or cost_odd == 0 or nleft <= 0 or nleft < nneeded or npool < nleft:
+        return np.zeros(0, dtype=int), np.zeros(0)
+
+    cdf = transition_cdf(reroll_transition(nneeded, nleft, npool, cost_odd), tol=tol) * 100
+
+    return np.arange(1, cdf.size+1), cdf
+
+def exact_n_other_shop_curve(unit, nteam:int, npool:int, star:int, level:int, shop) -> tuple:
+    """
+    util.n_other_shop_curve() with the exact reroll model, same arguments and return value.
+    """
+
+    nneeded, ntot_left, _, cost_odd = process_state(unit, nteam, 0, star, level, shop)
+
+    nother = np.arange(1, ntot_left)
+
+    # the copies taken leave the cost pool too, so a pool too small for the copies left stays too small
+    if npool < ntot_left:
+        return ntot_left - nother, np.full(nother.size, np.nan)
+
+    shops = expected_rerolls(nneeded, ntot_left - nother, npool - nother, cost_odd)
+    shops = np.array([ round(rolls, 2) for rolls in shops.tolist() ])
+
+    return ntot_left - nother, shops
+
+def exact_n_pool_shop_curve(unit, nteam:int, nother:int, star:int, level:int, shop, units_per_cost:int) -> tuple:
+    """
+    util.n_pool_shop_curve() with the exact reroll model, same arguments and return value.
+    """
+
+    nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+    ntot = int(shop.game_data.bag_sizes[cost-1])
+
+    npool = np.arange(ntot*units_per_cost - 1, ntot - 1, -1)
+    # every copy of the unit is still counted in each pool size, so none is smaller than nleft
+    npool = npool[npool >= nleft]
+
+    shops = expected_rerolls(nneeded, nleft, npool, cost_odd)
+    shops = np.array([ round(rolls, 2) for rolls in shops.tolist() ])
+
+    return npool - ntot, shops
@@ -0,0 +1,224 @@
+import numpy as np
+from .registry import GameData, resolve_game_data
+
+PLAYERS = 8
+
+# most target units per player
+MAX_TARGETS = 3
+
+# copies owned to reach each star level
+COPIES = {1: 1, 2: 3, 3: 9}
+
+def lobby_config(players:list, rounds:int, game_data:GameData) -> dict:
+    """
+    Checks the players of a lobby and turns them into arrays.
+
+    Args:
+        players (list): One dict per player (at most 8, missing players do not roll) with
+            level (int, or a list with one level per round), rolls (int, or a list with
+            the shops rolled each round) and targets (list of (unit name, star) the player
+            buys copies of until the star level is reached)
+        rounds (int): Number of rounds simulated
+        game_data (GameData): Shared game data giving units, bag sizes and odds
+
+    Returns:
+        dict: units (names of the distinct target units), cost and bag (per unit),
+            targets and need (players x MAX_TARGETS, -1 and 0 for no target),
+            levels and rolls (rounds x players)
+
+    Raises:
+        ValueError: When a player or target is malformed, a unit is unknown or a player lists it twice
+    """
+
+    if not 1 <= len(players) <= PLAYERS:
+        raise ValueError(f'A lobby has between 1 and {PLAYERS} players')
+
+    costs = { name: cost for cost, names in game_data.unit_dict.items() for name in names }
+
+    units = []
+    targets = np.full((PLAYERS, MAX_TARGETS), -1)
+    need = np.zeros((PLAYERS, MAX_TARGETS), dtype=np.int64)
+    levels = np.ones((rounds, PLAYERS), dtype=np.int64)
+    rolls = np.zeros((rounds, PLAYERS), dtype=np.int64)
+
+    for p, player in enumerate(players):
+        if not isinstance(player, dict):
+            raise ValueError(f'Player {p}: must be an object with level, rolls and targets')
+
+        try:
+            levels[:, p] = np.broadcast_to(np.asarray(player.get('level', 1), dtype=np.int64), (rounds,))
+            rolls[:, p] = np.broadcast_to(np.asarray(player.get('rolls', 0), dtype=np.int64), (rounds,))
+        except (TypeError, ValueError):
+            raise ValueError(f'Player {p}: level and rolls must be an integer or one per round')
+
+        if np.any(levels[:, p] < 1) or np.any(levels[:, p] > game_data.odds.shape[0]) or np.any(rolls[:, p] < 0):
+            raise ValueError(f'Player {p}: level or rolls out of range')
+
+        player_targets = player.get('targets', [])
+        if not isinstance(player_targets, (list, tuple)):
+            raise ValueError(f'Player {p}: targets must be a list of (unit name, star)')
+        if len(player_targets) > MAX_TARGETS:
+            raise ValueError(f'Player {p}: at most {MAX_TARGETS} targets')
+
+        for k, target in enumerate(player_targets):
+            if not isinstance(target, (list, tuple)) or len(target) != 2:
+                raise ValueError(f'Player {p}: each target must be a (unit name, star) pair')
+            name, star = target
+            if not isinstance(name, str) or name not in costs:
+                raise ValueError(f'Player {p}: unknown unit {name}')
+            if not isinstance(star, int) or star not in COPIES:
+                raise ValueError(f'Player {p}: star level must be 1, 2 or 3')
+            if any( other[0] == name for other in player_targets[:k] ):
+                raise ValueError(f'Player {p}: each unit can only be a target once')
+            if name not in units:
+                units.append(name)
+            targets[p, k] = units.index(name)
+            need[p, k] = COPIES[star]
+
+    cost = np.array([ costs[name] for name in units ], dtype=np.int64)
+
+    return {
+        'units': tuple(units),
+        'cost': cost,
+        'bag': game_data.bag_sizes[cost - 1].astype(np.int64),
+        'targets': targets,
+        'need': need,
+        'levels': levels,
+        'rolls': rolls,
+    }
+
+def simulate_lobbies(players:list, n_lobbies:int=100_000, rounds:int=20, batch_size:int=10_000,
+                     game_data:GameData=None, rng=None) -> dict:
+    """
+    Monte Carlo simulation of 8 players rolling from one shared pool over many rounds.
+    Each round every player rolls their shops slot by slot: a slot rolls a cost with the
+    odds of the player's level and a unit of that cost in proportion to the copies left,
+    as Shop.fresh_shop() does with Pool.get_unit(), and copies of the player's targets
+    are bought until the star level is reached. Only the targets and the units of each
+    cost out of the pool change the odds, so the state of a lobby is those counts in
+    small integer arrays. A batch of lobbies is advanced together with one block of
+    random numbers per shop.
+
+    Args:
+        players (list): Players of the lobby, see lobby_config()
+        n_lobbies (int): Number of lobbies simulated
+        rounds (int): Number of rounds per lobby
+        batch_size (int): Lobbies simulated at once, bounds memory use
+        game_data (GameData or str): Game data to use, or the key of a set or patch (see registry.GameDataStore). When None (default), the process-wide registry is used.
+        rng (np.random.Generator): Random generator. When None (default), a fresh one is created.
+
+    Returns:
+        dict: The lobby_config() arrays and, counted over lobbies after each round,
+            held[round, unit, copies]: copies of each target unit held by all players,
+            others[round, player, target, copies]: copies of the target held by the other players,
+            same_cost[round, player, target, units]: other units of the target's cost out of the pool,
+            hit[round, player, target]: lobbies where the player has reached the star level
+    """
+
+    game_data = resolve_game_data(game_data)
+    rng = np.random.default_rng() if rng is None else rng
+
+    config = lobby_config(players, rounds, game_data)
+    targets, need, levels, rolls = config['targets'], config['need'], config['levels'], config['rolls']
+    cost, bag = config['cost'], config['bag']
+
+    n_units = len(config['units'])
+    valid = targets >= 0
+    safe_targets = np.where(valid, targets, 0)
+    target_cost = np.where(valid, cost[safe_targets] if n_units else 0, 1)
+    pool_sizes = (game_data.bag_sizes * game_data.units_per_cost).astype(np.int64)
+    max_out = int(need.sum()) + 1
+
+    held_hist = np.zeros((rounds, n_units, int(bag.max(initial=0)) + 1), dtype=np.int64)
+    others_hist = np.zeros((rounds, PLAYERS, MAX_TARGETS, int(bag.max(initial=0)) + 1), dtype=np.int64)
+    same_cost_hist = np.zeros((rounds, PLAYERS, MAX_TARGETS, max_out), dtype=np.int64)
+    hit = np.zeros((rounds, PLAYERS, MAX_TARGETS), dtype=np.int64)
+
+    for start in range(0, n_lobbies, batch_size):
+        size = min(batch_size, n_lobbies - start)
+        lobbies = np.arange(size)
+
+        # copies owned per player and target, per unit out of the pool, per cost out of the pool
+        owned = np.zeros((size, PLAYERS, MAX_TARGETS), dtype=np.int16)
+        out = np.zeros((size, max(n_units, 1)), dtype=np.int16)
+        cost_out = np.zeros((size, 5), dtype=np.int16)
+
+        for r in range(rounds):
+            for shop in range(int(rolls[r].max(initial=0))):
+                draws = rng.random((PLAYERS, 5, size), dtype=np.float32)
+
+                for p in np.flatnonzero(rolls[r] > shop):
+                    if not valid[p].any():
+                        continue
+
+                    odds = game_data.odds[levels[r, p] - 1, target_cost[p] - 1]
+
+                    for slot in range(5):
+                        copies_left = bag[safe_targets[p]] - out[:, safe_targets[p]]
+                        pool_left = pool_sizes[target_cost[p] - 1] - cost_out[:, target_cost[p] - 1]
+                        buying = valid[p] & (owned[:, p] < need[p])
+
+                        with np.errstate(divide='ignore', invalid='ignore'):
+                            slot_odds = np.where(buying & (pool_left > 0), odds * copies_left / pool_left, 0)
+
+                        # the slot lands on target k when the draw falls in its share
+                        k = (draws[p, slot, :, None] >= np.cumsum(slot_odds, axis=1)).sum(axis=1)
+                        bought = k < MAX_TARGETS
+                        if not bought.any():
+                            continue
+
+                        b, k = lobbies[bought], k[bought]
+                        owned[b, p, k] += 1
+                        out[b, safe_targets[p, k]] += 1
+                        cost_out[b, target_cost[p, k] - 1] += 1
+
+            for t in range(n_units):
+                held_hist[r, t] += np.bincount(out[:, t], minlength=held_hist.shape[2])[:held_hist.shape[2]]
+
+            for p, k in zip(*np.nonzero(valid)):
+                t, c = targets[p, k], target_cost[p, k] - 1
+                others = out[:, t] - owned[:, p, k]
+                same_cost = cost_out[:, c] - out[:, t]
+                others_hist[r, p, k] += np.bincount(others, minlength=others_hist.shape[3])[:others_hist.shape[3]]
+                same_cost_hist[r, p, k] += np.bincount(same_cost, minlength=max_out)[:max_out]
+                hit[r, p, k] += int(np.count_nonzero(owned[:, p, k] >= need[p, k]))
+
+    config.update({
+        'n_lobbies': n_lobbies,
+        'held': held_hist,
+        'others': others_hist,
+        'same_cost': same_cost_hist,
+        'hit': hit,
+    })
+
+    return config
+
+def contest_summary(result:dict, round_:int=-1) -> list:
+    """
+    Per player and target numbers after a round, in the terms of the app's inputs:
+    the mean copies held by others (nother) and the mean other same-cost units out
+    of the pool (n_out_of_pool).
+
+    Args:
+        result (dict): Result of simulate_lobbies()
+        round_ (int): Round to summarize, the last one by default
+
+    Returns:
+        list: One dict per player target with player, unit, nother, n_out_of_pool and hit_rate
+    """
+
+    summary = []
+
+    for p, k in zip(*np.nonzero(result['targets'] >= 0)):
+        others = result['others'][round_, p, k]
+        same_cost = result['same_cost'][round_, p, k]
+
+        summary.append({
+            'player': int(p),
+            'unit': result['units'][result['targets'][p, k]],
+            'nother': float(np.arange(others.size) @ others / others.sum()),
+            'n_out_of_pool': float(np.arange(same_cost.size) @ same_cost / same_cost.sum()),
+            'hit_rate': float(result['hit'][round_, p, k] / result['n_lobbies']),
+        })
+
+    return summary
@@ -0,0 +1,286 @@
+import itertools
+import numpy as np
+from .util import process_state
+
+# hit every target, or whichever target comes first
+MODES = ('all', 'any')
+
+# most targets per query, the joint state grows as the product of the copies needed
+MAX_TARGETS = 4
+
+# slots in one shop
+SLOTS = 5
+
+# longest CDF stepped, a few unlikely targets can take thousands of shops to finish
+MAX_SHOPS = 1000
+
+def prepare_targets(targets:list, level:int, shop, mode:str='all'):
+    """
+    Works out the copies needed and left of each target with process_state(), and which
+    targets take part in the roll.
+
+    Args:
+        targets (list): (unit, nteam, nother, star) for each unit rolled for, names must differ
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        mode (str): 'all' to hit every target, 'any' to hit at least one
+
+    Returns:
+        list or str: (nneeded, nleft, cost, cost_odd) of the targets to roll for,
+            or a message when there is nothing to roll for
+
+    Raises:
+        ValueError: When the mode, the number of targets or the unit names are invalid
+    """
+
+    if mode not in MODES:
+        raise ValueError(f"Mode must be one of {', '.join(MODES)}")
+
+    if not 1 <= len(targets) <= MAX_TARGETS:
+        raise ValueError(f'Between 1 and {MAX_TARGETS} units can be rolled for at once')
+
+    if len({ unit.name for unit, *_ in targets }) != len(targets):
+        raise ValueError('Each unit can only be rolled for once')
+
+    states = []
+    for unit, nteam, nother, star in targets:
+        nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+        if nneeded == 0:
+            if mode == 'any':
+                return f"{unit.name} is already 3 starred"
+            continue
+
+        if cost_odd == 0 or nleft <= 0 or nleft < nneeded:
+            if mode == 'all':
+                return f"Cannot hit {unit.name}: " + (f"level too low to find {cost} cost unit" if cost_odd == 0 else "not enough units left in pool")
+            continue
+
+        states.append((nneeded, nleft, cost, cost_odd))
+
+    if not states:
+        return "Units are already 3 starred" if mode == 'all' else "Not enough units left in pool"
+
+    return states
+
+def slot_chain(states:list, pool_sizes:dict, mode:str='all') -> tuple:
+    """
+    One shop slot as a step of a chain over the joint number of copies found of every
+    target, an array with one axis per target. A slot rolls target i with the odds of its
+    cost times its share of that cost's pool, which shrinks as copies of any target of
+    the same cost are bought, as in Pool.get_odds(). Finished targets are not bought
+    again, and finished joint states are absorbing.
+
+    Args:
+        states (list): (nneeded, nleft, cost, cost_odd) of each target from prepare_targets()
+        pool_sizes (dict): Units of each cost left in the pool before any copy is found
+        mode (str): 'all' or 'any', decides which joint states are finished
+
+    Returns:
+        odds (list): Odds of a slot finding the next copy of each target, per joint state
+        stay (np.ndarray): Odds of a slot finding nothing, per joint state
+        finished (np.ndarray): Boolean mask of the finished joint states
+    """
+
+    shape = tuple( nneeded + 1 for nneeded, *_ in states )
+    found = np.indices(shape)
+
+    done = np.array([ found[i] == nneeded for i, (nneeded, *_) in enumerate(states) ])
+    finished = done.all(axis=0) if mode == 'all' else done.any(axis=0)
+
+    # copies of each cost bought so far, per joint state
+    bought = {}
+    for i, (_, _, cost, _) in enumerate(states):
+        bought[cost] = bought.get(cost, 0) + found[i]
+
+    odds = []
+    stay = np.ones(shape)
+
+    for i, (nneeded, nleft, cost, cost_odd) in enumerate(states):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            target_odds = cost_odd * (nleft - found[i]) / (pool_sizes[cost] - bought[cost])
+        target_odds = np.where(~done[i] & ~finished, target_odds, 0)
+
+        odds.append(target_odds)
+        stay -= target_odds
+
+    return odds, stay, finished
+
+def shop_step(odds:list, stay:np.ndarray) -> tuple:
+    """
+    One shop of the slot chain of slot_chain(), the slot step taken SLOTS times from
+    every joint state at once. A shop finds at most SLOTS copies, so the step is kept as
+    the odds of each increment of copies found, a few dozen per joint state, instead of
+    a matrix over every pair of joint states.
+
+    Args:
+        odds (list): Odds of a slot finding the next copy of each target, from slot_chain()
+        stay (np.ndarray): Odds of a slot finding nothing, from slot_chain()
+
+    Returns:
+        reached (np.ndarray): (states, increments) flat index of the joint state each
+            increment leads to, increment 0 finds nothing
+        transition (np.ndarray): (states, increments) odds of each increment in one shop
+    """
+
+    shape = stay.shape
+    size = stay.size
+    found = np.indices(shape).reshape(len(shape), size)
+
+    increments = [ d for d in itertools.product(*( range(min(n - 1, SLOTS) + 1) for n in shape )) if sum(d) <= SLOTS ]
+    index = { d: j for j, d in enumerate(increments) }
+    steps = np.array(increments).reshape(len(increments), len(shape))
+
+    # increments running past a target's copies needed are never taken, they point at state 0
+    inside = np.ones((size, len(increments)), dtype=bool)
+    for axis, n in enumerate(shape):
+        inside &= found[axis][:, None] + steps[:, axis] < n
+    strides = np.array([ int(np.prod(shape[axis+1:])) for axis in range(len(shape)) ])
+    reached = np.where(inside, np.arange(size)[:, None] + steps @ strides, 0)
+
+    stay_at = np.where(inside, stay.ravel()[reached], 0)
+
+    # finding a copy of target i moves each increment to the one with a copy more along axis i
+    moves = []
+    for axis, target_odds in enumerate(odds):
+        sources = [ j for j, d in enumerate(increments) if d[:axis] + (d[axis] + 1,) + d[axis+1:] in index ]
+        destinations = [ index[d[:axis] + (d[axis] + 1,) + d[axis+1:]] for d in (increments[j] for j in sources) ]
+        moves.append((sources, destinations, np.where(inside[:, sources], target_odds.ravel()[reached[:, sources]], 0)))
+
+    transition = np.zeros(reached.shape)
+    transition[:, 0] = 1
+
+    for _ in range(SLOTS):
+        moved = transition * stay_at
+        for sources, destinations, odds_at in moves:
+            moved[:, destinations] += transition[:, sources] * odds_at
+        transition = moved
+
+    return reached, transition
+
+def multi_hit(states:list, pool_sizes:dict, mode:str='all', tol:float=1e-4, min_shops:int=100,
+              max_shops:int=MAX_SHOPS) -> tuple:
+    """
+    CDF and expected number of shops for hitting all or any of several targets. The joint
+    distribution over copies found is stepped one slot at a time with array operations,
+    so the work grows with the number of joint states (at most 10**MAX_TARGETS) rather
+    than the number of ways to roll them. The CDF stops at max_shops whatever its tail.
+    The expectation is exact: copies found never go down, so the expected shops left in
+    each joint state follow from shop_step() one total of copies found at a time, from
+    the most copies down.
+
+    Args:
+        states (list): (nneeded, nleft, cost, cost_odd) of each target from prepare_targets()
+        pool_sizes (dict): Units of each cost left in the pool before any copy is found
+        mode (str): 'all' or 'any'
+        tol (float): Tail probability (0-1) left when the CDF horizon stops growing
+        min_shops (int): Shortest CDF returned
+        max_shops (int): Longest CDF returned
+
+    Returns:
+        cdf (np.ndarray): Probability (0-1) of being finished after shop 1, 2, ...
+        expected (float): Expected number of shops
+
+    Raises:
+        ValueError: When a cost's pool is smaller than the copies of its targets left in it
+    """
+
+    for cost in { cost for _, _, cost, _ in states }:
+        if pool_sizes[cost] < sum( nleft for _, nleft, target_cost, _ in states if target_cost == cost ):
+            raise ValueError(f'Not enough {cost} cost units left in pool for the copies of the units rolled for')
+
+    odds, stay, finished = slot_chain(states, pool_sizes, mode)
+
+    reached, transition = shop_step(odds, stay)
+
+    total = np.indices(stay.shape).reshape(stay.ndim, -1).sum(axis=0)
+    unfinished = ~finished.ravel()
+
+    # expected shops left from each joint state, the states an increment leads to have more copies and come first
+    shops_left = np.zeros(stay.size)
+    for copies in range(int(total.max()), -1, -1):
+        level = np.flatnonzero((total == copies) & unfinished)
+        onward = (transition[level, 1:] * shops_left[reached[level, 1:]]).sum(axis=1)
+        shops_left[level] = (1 + onward) / (1 - transition[level, 0])
+
+    # finding a copy of target i moves one step along axis i
+    sources = [ (slice(None),)*i + (slice(None, -1),) for i in range(len(odds)) ]
+    destinations = [ (slice(None),)*i + (slice(1, None),) for i in range(len(odds)) ]
+
+    state = np.zeros(stay.shape)
+    state.flat[0] = 1
+
+    cdf = []
+
+    while len(cdf) < max_shops:
+
+        for _ in range(SLOTS):
+            moved = [ state[source] * target_odds[source] for source, target_odds in zip(sources, odds) ]
+            state = state * stay
+            for destination, mass in zip(destinations, moved):
+                state[destination] += mass
+
+        cdf.append(state[finished].sum())
+
+        if len(cdf) >= min_shops and 1 - cdf[-1] <= tol:
+            break
+
+    cdf = np.array(cdf)
+    horizon = cdf.size
+    if cdf[-1] >= 1 - tol:
+        horizon = max(min_shops, int(np.argmax(cdf >= 1 - tol)) + 1)
+
+    return cdf[:horizon], float(shops_left[0])
+
+def multi_number_shops(targets:list, pool_sizes:dict, level:int, shop, mode:str='all', round_to_int=True):
+    """
+    Expected number of shops until all (or any) of several units reach their star targets.
+
+    Args:
+        targets (list): (unit, nteam, nother, star) for each unit rolled for
+        pool_sizes (dict): Units of each cost left in the pool, without the copies of the
+            targets already out, as npool in number_shops()
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        mode (str): 'all' or 'any'
+        round_to_int (bool): If True (default), rounds to the nearest integer, else to the hundredths
+
+    Returns:
+        int, float or str: Expected number of shops, or a message when there is nothing to roll for
+    """
+
+    states = prepare_targets(targets, level, shop, mode)
+
+    if isinstance(states, str):
+        return states
+
+    _, rolls = multi_hit(states, pool_sizes, mode)
+
+    return round(rolls) if round_to_int else round(rolls, 2)
+
+def multi_cdf_curve(targets:list, pool_sizes:dict, level:int, shop, mode:str='all', tol:float=1e-4) -> tuple:
+    """
+    Probability of having hit all (or any) of several units by each shop roll.
+
+    Args:
+        targets (list): (unit, nteam, nother, star) for each unit rolled for
+        pool_sizes (dict): Units of each cost left in the pool, as in multi_number_shops()
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        mode (str): 'all' or 'any'
+        tol (float): Tail probability left when the horizon stops growing
+
+    Returns:
+        rolls (np.ndarray): Shop rolls 1, 2, ..., empty when there is nothing to roll for
+        cdf (np.ndarray): Probability (%) of having hit by each shop roll
+    """
+
+    states = prepare_targets(targets, level, shop, mode)
+
+    if isinstance(states, str):
+        return np.zeros(0, dtype=int), np.zeros(0)
+
+    cdf, _ = multi_hit(states, pool_sizes, mode, tol=tol)
+    cdf = cdf * 100
+
+    return np.arange(1, cdf.size+1), cdf
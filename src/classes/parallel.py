@@ -0,0 +1,117 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .simulate import simulate_rolls
+from .lobby import simulate_lobbies
+
+# shards a simulation is split into by default, fixed so results do not depend on the number of workers
+SHARDS = 32
+
+# histograms of simulate_lobbies() that add up across shards
+LOBBY_COUNTS = ('held', 'others', 'same_cost', 'hit')
+
+def shard_sizes(n:int, shards:int=SHARDS) -> list:
+    """
+    Splits n items into shards whose sizes differ by at most one.
+
+    Args:
+        n (int): Number of items, e.g. trials or lobbies
+        shards (int): Number of shards
+
+    Returns:
+        list: Size of each shard, in order
+    """
+
+    return [ n // shards + (i < n % shards) for i in range(shards) ]
+
+def _run_shard(task, n:int, seed:np.random.SeedSequence, kwargs:dict):
+    # top level so it can be sent to worker processes
+    return task(n, np.random.default_rng(seed), **kwargs)
+
+def run_shards(task, n:int, seed=None, shards:int=SHARDS, workers:int=None, **kwargs) -> list:
+    """
+    Runs a simulation in shards across a process pool. Each shard gets its own generator
+    from SeedSequence(seed).spawn(), so shards are statistically independent. The split
+    into shards depends only on n and shards, so the same seed gives bit-identical
+    results with any number of workers.
+
+    Args:
+        task (callable): Top-level function task(n, rng, **kwargs) simulating n items
+        n (int): Number of items to simulate
+        seed (int or np.random.SeedSequence): Master seed. When None (default), fresh entropy is used.
+        shards (int): Number of shards
+        workers (int): Worker processes. 1 runs in this process, None (default) uses every core.
+        **kwargs: Passed on to task
+
+    Returns:
+        list: Result of task for each shard, in shard order
+    """
+
+    seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = shard_sizes(n, shards)
+    seeds = seed.spawn(shards)
+
+    if workers == 1:
+        return [ _run_shard(task, size, child, kwargs) for size, child in zip(sizes, seeds) ]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_run_shard, [task]*shards, sizes, seeds, [kwargs]*shards))
+
+def _rolls_task(n:int, rng, **kwargs) -> tuple:
+    return simulate_rolls(n_trials=n, rng=rng, **kwargs)
+
+def _lobbies_task(n:int, rng, **kwargs) -> dict:
+    return simulate_lobbies(n_lobbies=n, rng=rng, **kwargs)
+
+def parallel_simulate_rolls(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop,
+                            n_trials:int=1_000_000, max_rolls:int=1000, seed=None,
+                            shards:int=SHARDS, workers:int=None) -> tuple:
+    """
+    simulate.simulate_rolls() split across worker processes, see run_shards().
+
+    Args:
+        unit, nteam, npool, nother, star, level, shop: As in simulate_rolls()
+        n_trials (int): Number of roll-downs to simulate
+        max_rolls (int): Shops rolled before a trial is given up on
+        seed (int or np.random.SeedSequence): Master seed
+        shards (int): Number of shards
+        workers (int): Worker processes, None for every core
+
+    Returns:
+        counts (np.ndarray): counts[k] is the number of trials that hit on shop k (1-max_rolls)
+        censored (int): Number of trials that had not hit after max_rolls shops
+    """
+
+    parts = run_shards(_rolls_task, n_trials, seed, shards, workers, unit=unit, nteam=nteam, npool=npool,
+                       nother=nother, star=star, level=level, shop=shop, max_rolls=max_rolls)
+
+    counts = np.sum([ counts for counts, _ in parts ], axis=0)
+    censored = sum( censored for _, censored in parts )
+
+    return counts, censored
+
+def parallel_simulate_lobbies(players:list, n_lobbies:int=100_000, rounds:int=20, game_data=None,
+                              seed=None, shards:int=SHARDS, workers:int=None) -> dict:
+    """
+    lobby.simulate_lobbies() split across worker processes, see run_shards().
+
+    Args:
+        players (list): Players of the lobby, see lobby.lobby_config()
+        n_lobbies (int): Number of lobbies simulated
+        rounds (int): Number of rounds per lobby
+        game_data (GameData): Game data to use. When None (default), the process-wide registry is used.
+        seed (int or np.random.SeedSequence): Master seed
+        shards (int): Number of shards
+        workers (int): Worker processes, None for every core
+
+    Returns:
+        dict: Same as simulate_lobbies(), with the counts of every shard added up
+    """
+
+    parts = run_shards(_lobbies_task, n_lobbies, seed, shards, workers, players=players, rounds=rounds, game_data=game_data)
+
+    result = parts[0]
+    for name in LOBBY_COUNTS:
+        result[name] = np.sum([ part[name] for part in parts ], axis=0)
+    result['n_lobbies'] = n_lobbies
+
+    return result
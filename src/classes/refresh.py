@@ -0,0 +1,156 @@
+import time
+import logging
+import threading
+from .registry import GameData
+from .snapshot import (
+    SNAPSHOT_VERSION, DEFAULT_SET, UNITS_URL, ODDS_URL,
+    fetch_json, parse_units, parse_shop_odds, validate_snapshot, write_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+class Refresher():
+    """
+    Background thread picking up new patches without a restart. Every interval seconds it
+    asks CDragon and DDragon whether their data changed, with conditional requests, so an
+    unchanged source answers 304 and nothing is downloaded. Changed data is validated and
+    frozen into new GameData on this thread, off the request path, and only the finished
+    GameData is handed to on_update to swap in. A failed check keeps the current data and
+    is retried at the next interval.
+
+    Attributes:
+        on_update (callable): Called with the new GameData when the data changed.
+        version (str): Version of the game data in use.
+        interval (float): Seconds between checks.
+        set_ (str): Set number to load.
+        path (str): Snapshot rewritten after an update, so restarts start from it. None (default) to leave it.
+        units_url (str): CDragon units data.
+        odds_url (str): DDragon shop odds data.
+        checks (int): Number of checks made.
+        updates (int): Number of times new data was swapped in.
+        errors (int): Number of failed checks.
+    """
+
+    def __init__(self, on_update, game_data:GameData, interval:float=900, set_:str=DEFAULT_SET, path:str=None,
+                 units_url:str=UNITS_URL, odds_url:str=ODDS_URL) -> None:
+        """
+        Args:
+            on_update (callable): Called with the new GameData when the data changed
+            game_data (GameData): Game data in use
+            interval (float): Seconds between checks, 900 by default
+            set_ (str): Set number to load. Default is '14'.
+            path (str): Snapshot rewritten after an update, e.g. snapshot.SNAPSHOT_PATH. None (default) to leave it
+            units_url (str): CDragon units data
+            odds_url (str): DDragon shop odds data
+        """
+        self.on_update = on_update
+        self.version = game_data.version
+        self.interval = interval
+        self.set_ = set_
+        self.path = path
+        self.units_url = units_url
+        self.odds_url = odds_url
+        self.checks = 0
+        self.updates = 0
+        self.errors = 0
+        # validators and parsed data of the last response from each source
+        self.__sources = {'units': ({}, None), 'odds': ({}, None)}
+        self.__lock = threading.Lock()
+        self.__stopping = threading.Event()
+        self.__thread = None
+
+    def check(self) -> GameData:
+        """
+        Checks both sources once and swaps in new game data when it differs from the data in use.
+        A source that has not changed is not downloaded; its last parsed data is reused.
+
+        Returns:
+            GameData: The new game data, None when nothing changed
+        """
+
+        with self.__lock:
+            self.checks += 1
+
+            units_validators, units = self.__sources['units']
+            odds_validators, odds = self.__sources['odds']
+
+            units_data, units_validators = fetch_json(self.units_url, units_validators)
+            odds_data, odds_validators = fetch_json(self.odds_url, odds_validators)
+
+            if units_data is None and odds_data is None:
+                return None
+
+            units = units if units_data is None else parse_units(units_data, self.set_)
+            odds = odds if odds_data is None else parse_shop_odds(odds_data)
+
+            snapshot = validate_snapshot({
+                'version': SNAPSHOT_VERSION,
+                'set': self.set_,
+                'created': time.time(),
+                'units': units,
+                'odds': odds,
+            }, self.set_)
+            game_data = GameData.from_snapshot(snapshot)
+
+            # only kept once the data is known to be good, so a bad response is downloaded again next time
+            self.__sources = {'units': (units_validators, units), 'odds': (odds_validators, odds)}
+
+            if game_data.version == self.version:
+                return None
+
+            if self.path is not None:
+                try:
+                    write_snapshot(snapshot, self.path)
+                except OSError:
+                    pass # read-only filesystem, keep serving from memory
+
+            self.on_update(game_data)
+            self.version = game_data.version
+            self.updates += 1
+
+            return game_data
+
+    def start(self) -> None:
+        """
+        Starts checking every interval seconds on a daemon thread, unless already running.
+        Threads do not survive fork, so a forked process calls start() again to run its own.
+
+        Returns:
+            None
+        """
+
+        if self.__thread is not None and self.__thread.is_alive():
+            return None
+
+        # a lock held by a check in the parent at fork would never be released here
+        self.__lock = threading.Lock()
+        self.__stopping = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name='patch-refresher', daemon=True)
+        self.__thread.start()
+
+        return None
+
+    def stop(self) -> None:
+        """
+        Stops the thread and waits for a check in progress to finish.
+
+        Returns:
+            None
+        """
+
+        self.__stopping.set()
+
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+        return None
+
+    def __run(self) -> None:
+        while not self.__stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # network errors, bad responses or a new set, none of which may stop the app
+                self.errors += 1
+                logger.warning('Patch data refresh failed: %r', e)
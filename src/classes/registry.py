@@ -0,0 +1,300 @@
+import os
+import re
+import glob
+import json
+import hashlib
+import threading
+import numpy as np
+from types import MappingProxyType
+from collections import OrderedDict
+from .util import BagSizes
+from .snapshot import DEFAULT_SET, SNAPSHOT_PATH, SnapshotError, load_snapshot, read_snapshot, snapshot_path
+
+# sets and patches kept in memory besides the current data, see GameDataStore
+STORE_SIZE = int(os.environ.get('TFT_GAME_DATA_CACHE', 4))
+# bytes of odds and unit names kept in the store, a set is a few kilobytes
+STORE_BYTES = int(os.environ.get('TFT_GAME_DATA_CACHE_BYTES', 1 << 20))
+
+# keys of the store, a set number or the version of some game data
+SET_KEY = re.compile(r'\d{1,3}')
+PATCH_KEY = re.compile(r'[0-9a-f]{12}')
+
+class GameData():
+    """
+    Read-only game data shared by every Pool and Shop in the process.
+    Arrays are marked non-writeable and the object cannot be changed
+    after construction, so it is safe to share between threads.
+
+    Attributes:
+        set_ (str): Set number the data belongs to.
+        unit_dict (MappingProxyType): Unique units available in the game.
+            Keys are cost levels (1-5) and values are tuples of unit names.
+        units_per_cost (np.ndarray): Number of unique units for each cost.
+        bag_sizes (np.ndarray): Copies of each unit in the pool for each cost.
+        odds (np.ndarray): Contiguous level x cost array of shop odds.
+        version (str): Short hash of the data, changes whenever units or odds change.
+        nbytes (int): Bytes held by the odds and unit names, see GameDataStore.
+    """
+
+    def __init__(self, units:dict, odds, set_:str=DEFAULT_SET) -> None:
+        """
+        Freezes units and odds into shared structures.
+
+        Args:
+            units (dict): Unit names keyed by cost (1-5)
+            odds (list): Odds of getting each cost in the shop at each level
+            set_ (str): Set number of the data
+        """
+
+        unit_dict = MappingProxyType({ cost: tuple(units[cost]) for cost in range(1, 6) })
+        units_per_cost = np.array([ len(unit_dict[cost]) for cost in range(1, 6) ])
+        bag_sizes = np.array([ cost.value for cost in BagSizes ])
+        odds = np.ascontiguousarray(odds, dtype=np.float64)
+
+        assert odds.ndim == 2 and odds.shape[1] == 5, "Odds must be a level x cost table"
+
+        for array in (units_per_cost, bag_sizes, odds):
+            array.setflags(write=False)
+
+        digest = hashlib.sha1(json.dumps([set_, {cost: list(names) for cost, names in unit_dict.items()}, odds.tolist()]).encode())
+
+        object.__setattr__(self, 'set_', set_)
+        object.__setattr__(self, 'unit_dict', unit_dict)
+        object.__setattr__(self, 'units_per_cost', units_per_cost)
+        object.__setattr__(self, 'bag_sizes', bag_sizes)
+        object.__setattr__(self, 'odds', odds)
+        object.__setattr__(self, 'version', digest.hexdigest()[:12])
+        object.__setattr__(self, 'nbytes', odds.nbytes + sum( len(name.encode()) for names in unit_dict.values() for name in names ))
+
+    @classmethod
+    def from_snapshot(cls, snapshot:dict) -> 'GameData':
+        """
+        Builds game data from a validated snapshot (see snapshot.load_snapshot()).
+
+        Args:
+            snapshot (dict): Validated snapshot
+
+        Returns:
+            GameData: Frozen game data
+        """
+        return cls(snapshot['units'], snapshot['odds'], snapshot['set'])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('GameData is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError('GameData is read-only')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # rebuilt from plain data, e.g. when sent to a worker process
+        return (GameData, ({ cost: list(names) for cost, names in self.unit_dict.items() }, self.odds.tolist(), self.set_))
+
+
+_game_data = None
+_lock = threading.Lock()
+
+def get_game_data() -> GameData:
+    """
+    Getter for the process-wide game data. The snapshot is loaded on first use only,
+    even when several threads ask for it at the same time.
+
+    Returns:
+        GameData: Shared game data
+    """
+
+    global _game_data
+
+    if _game_data is None:
+        with _lock:
+            if _game_data is None:
+                _game_data = GameData.from_snapshot(load_snapshot())
+
+    return _game_data
+
+def set_game_data(game_data:GameData) -> None:
+    """
+    Replaces the process-wide game data, e.g. with offline data in tests.
+
+    Args:
+        game_data (GameData): Game data to share
+
+    Returns:
+        None
+    """
+
+    global _game_data
+
+    with _lock:
+        _game_data = game_data
+
+    return None
+
+class GameDataStore():
+    """
+    Game data of several sets and patches side by side, e.g. to compare with the last
+    patch. A key is either a set number, loaded on first use from its snapshot (see
+    snapshot.snapshot_path()), or the version of a patch put() here, e.g. the one a
+    refresh replaced. The empty key, the current set and its version give the
+    process-wide game data. Other data is kept up to maxsize entries and max_bytes of
+    odds and unit names (GameData.nbytes), least recently used dropped first. A dropped set is read from its snapshot again on next use, a
+    dropped patch is gone. Requests never reach CDragon/DDragon, a set needs a snapshot.
+
+    Attributes:
+        maxsize (int): Most sets and patches kept besides the current data.
+        max_bytes (int): Most bytes kept, the latest entry stays even when larger.
+        nbytes (int): Bytes of the sets and patches kept.
+        directory (str): Directory of the set snapshots.
+        loads (int): Number of snapshots read.
+        evictions (int): Number of entries dropped for space.
+    """
+
+    def __init__(self, maxsize:int=STORE_SIZE, directory:str=None, max_bytes:int=STORE_BYTES) -> None:
+        """
+        Args:
+            maxsize (int): Most sets and patches kept besides the current data
+            max_bytes (int): Most bytes of odds and unit names kept
+            directory (str): Directory of the set snapshots, the one of the default snapshot by default
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.directory = os.path.dirname(SNAPSHOT_PATH) if directory is None else directory
+        self.loads = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key:str=None) -> GameData:
+        """
+        Getter for the game data of a set or patch, read from its snapshot on first use.
+
+        Args:
+            key (str): Set number or patch version, None or '' for the current data
+
+        Returns:
+            GameData: Shared game data
+
+        Raises:
+            ValueError: With a message to show the user when there is no such set or patch
+        """
+
+        current = get_game_data()
+        key = '' if key is None else str(key)
+
+        if not key or key in (current.set_, current.version):
+            return current
+
+        with self.__lock:
+            game_data = self.__entries.get(key)
+            if game_data is not None:
+                self.__entries.move_to_end(key)
+                return game_data
+
+        if not SET_KEY.fullmatch(key):
+            raise ValueError(f'Patch {key} is no longer available' if PATCH_KEY.fullmatch(key) else f'Unknown set or patch {key}')
+
+        # read outside the lock, a slow disk never blocks other sets
+        try:
+            game_data = GameData.from_snapshot(read_snapshot(snapshot_path(key, self.directory), key))
+        except (OSError, SnapshotError):
+            raise ValueError(f'No game data for set {key}')
+
+        with self.__lock:
+            # another thread may have read the set meanwhile, keep the first copy
+            if key in self.__entries:
+                self.__entries.move_to_end(key)
+                return self.__entries[key]
+
+            self.__insert(key, game_data)
+            self.loads += 1
+
+        return game_data
+
+    def put(self, game_data:GameData, key:str=None) -> None:
+        """
+        Keeps game data in the store.
+
+        Args:
+            game_data (GameData): Game data to keep
+            key (str): Key to keep it under, its version (a patch) by default
+
+        Returns:
+            None
+        """
+
+        with self.__lock:
+            self.__insert(key or game_data.version, game_data)
+
+        return None
+
+    def __insert(self, key:str, game_data:GameData) -> None:
+        """
+        Keeps game data under a key and drops the least recently used entries
+        over maxsize or max_bytes. Callers hold the lock.
+
+        Args:
+            key (str): Key to keep it under
+            game_data (GameData): Game data to keep
+
+        Returns:
+            None
+        """
+
+        old = self.__entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+
+        self.__entries[key] = game_data
+        self.nbytes += game_data.nbytes
+
+        while len(self.__entries) > self.maxsize or (len(self.__entries) > 1 and self.nbytes > self.max_bytes):
+            _, old = self.__entries.popitem(last=False)
+            self.nbytes -= old.nbytes
+            self.evictions += 1
+
+        return None
+
+    def keys(self) -> list:
+        """
+        Keys that get() can answer: every set with a snapshot, and the patches in memory.
+
+        Returns:
+            list: Set numbers in order, then patch versions from the most recently used
+        """
+
+        names = ( os.path.basename(path)[len('game_data-'):-len('.json')] for path in glob.glob(os.path.join(self.directory, 'game_data-*.json')) )
+
+        with self.__lock:
+            keys = list(self.__entries)
+
+        sets = { key for key in list(names) + keys if SET_KEY.fullmatch(key) }
+        patches = [ key for key in reversed(keys) if not SET_KEY.fullmatch(key) ]
+
+        return sorted(sets, key=int) + patches
+
+store = GameDataStore()
+
+def resolve_game_data(game_data=None) -> GameData:
+    """
+    Game data given as itself, as a key of the store, or None for the process-wide game data.
+
+    Args:
+        game_data (GameData or str): Game data, a set number or patch version (see GameDataStore), or None
+
+    Returns:
+        GameData: Shared game data
+    """
+
+    if game_data is None:
+        return get_game_data()
+
+    if isinstance(game_data, str):
+        return store.get(game_data)
+
+    return game_data
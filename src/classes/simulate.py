@@ -0,0 +1,122 @@
+import numpy as np
+from .util import process_state
+
+def slot_odds(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop) -> np.ndarray:
+    """
+    Odds of a single shop slot hitting the desired unit given how many copies have
+    already been found. Each copy found leaves one fewer copy and one fewer unit of the
+    same cost in the pool, the same way number_shops() and cdf_plot() walk the pool.
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        npool (int): Number of units of the same cost of the desired unit left in the pool
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+
+    Returns:
+        np.ndarray: Slot odds indexed by copies found so far, with a trailing 0 once
+            every needed copy is found. Empty when the unit cannot be hit.
+    """
+
+    nneeded, nleft, _, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+    if nneeded == 0 or cost_odd == 0 or nleft <= 0 or nleft < nneeded:
+        return np.zeros(0)
+
+    found = np.arange(nneeded)
+
+    return np.append(cost_odd * (nleft - found) / (npool - found), 0)
+
+def simulate_rolls(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop,
+                   n_trials:int=1_000_000, max_rolls:int=1000, batch_size:int=250_000, rng=None) -> tuple:
+    """
+    Monte Carlo simulation of rolling for a unit. Every trial rolls shops of 5 slots,
+    each slot hitting with the odds of the unit's cost times the unit's share of the
+    cost pool, and the pool counts are updated as copies are found. All trials in a
+    batch are advanced together with array operations, one slot at a time, and
+    finished trials are dropped from the batch.
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        npool (int): Number of units of the same cost of the desired unit left in the pool
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        n_trials (int): Number of roll-downs to simulate
+        max_rolls (int): Shops rolled before a trial is given up on
+        batch_size (int): Trials simulated at once, bounds memory use
+        rng (np.random.Generator): Random generator. When None (default), a fresh one is created.
+
+    Returns:
+        counts (np.ndarray): counts[k] is the number of trials that hit on shop k (1-max_rolls)
+        censored (int): Number of trials that had not hit after max_rolls shops
+    """
+
+    rng = np.random.default_rng() if rng is None else rng
+
+    counts = np.zeros(max_rolls + 1, dtype=np.int64)
+    odds = slot_odds(unit, nteam, npool, nother, star, level, shop)
+
+    if odds.size == 0:
+        return counts, n_trials
+
+    nneeded = odds.size - 1
+    odds = odds.astype(np.float32)
+    censored = 0
+
+    for start in range(0, n_trials, batch_size):
+
+        found = np.zeros(min(batch_size, n_trials - start), dtype=np.int8)
+
+        for roll in range(1, max_rolls + 1):
+
+            for draws in rng.random((5, found.size), dtype=np.float32):
+                found += draws < odds[found]
+
+            done = found == nneeded
+            counts[roll] += np.count_nonzero(done)
+            found = found[~done]
+
+            if found.size == 0:
+                break
+
+        censored += found.size
+
+    return counts, censored
+
+def empirical_cdf(counts:np.ndarray, n_trials:int) -> np.ndarray:
+    """
+    Percentage of trials that hit by each shop roll, on the same scale as cdf_plot().
+
+    Args:
+        counts (np.ndarray): Trials that hit on each shop, from simulate_rolls()
+        n_trials (int): Number of simulated trials, including censored ones
+
+    Returns:
+        np.ndarray: Probability (%) of hitting by shop 1, 2, ... max_rolls
+    """
+
+    return np.cumsum(counts[1:]) / n_trials * 100
+
+def empirical_mean(counts:np.ndarray) -> float:
+    """
+    Average number of shops to hit among trials that hit.
+
+    Args:
+        counts (np.ndarray): Trials that hit on each shop, from simulate_rolls()
+
+    Returns:
+        float: Mean shops to hit, nan when no trial hit
+    """
+
+    hits = counts.sum()
+
+    if hits == 0:
+        return float('nan')
+
+    return float(np.dot(np.arange(counts.size), counts) / hits)
@@ -0,0 +1,310 @@
+import os
+import json
+import time
+
+# bump whenever the layout of the snapshot file changes
+SNAPSHOT_VERSION = 1
+
+DEFAULT_SET = '14'
+
+# url to CDragon for TFT latest patch, could change in the future
+UNITS_URL = 'https://raw.communitydragon.org/latest/cdragon/tft/en_us.json'
+
+# url to DDragon for TFT latest patch
+ODDS_URL = 'https://raw.githubusercontent.com/InFinity54/LoL_DDragon/refs/heads/master/latest/data/en_US/tft-shop-drop-rates-data.json'
+
+SNAPSHOT_PATH = os.environ.get(
+    'TFT_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'game_data.json')
+)
+
+
+def snapshot_path(set_:str=DEFAULT_SET, directory:str=None) -> str:
+    """
+    Location of the snapshot of a set: SNAPSHOT_PATH for the default set, and
+    game_data-<set>.json next to it for the others.
+
+    Args:
+        set_ (str): Set number
+        directory (str): Directory of the snapshots, the one of SNAPSHOT_PATH by default
+
+    Returns:
+        str: Path of the snapshot file
+    """
+
+    if directory is None:
+        if set_ == DEFAULT_SET:
+            return SNAPSHOT_PATH
+        directory = os.path.dirname(SNAPSHOT_PATH)
+
+    return os.path.join(directory, f'game_data-{set_}.json')
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a snapshot file is malformed, from another set or too old to be trusted.
+    """
+
+
+def fetch_json(url:str, validators:dict=None) -> tuple:
+    """
+    GETs a JSON document. With the validators of an earlier response the request is
+    conditional (If-None-Match/If-Modified-Since), and an unchanged document is not sent again.
+
+    Args:
+        url (str): Location of the document
+        validators (dict): etag and last_modified of the last response, None for a plain GET
+
+    Returns:
+        data (dict): Parsed document, None when it has not changed
+        validators (dict): etag and last_modified to send next time
+    """
+
+    # imported here, most starts read the snapshot and never need it
+    import requests
+
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    r = requests.get(url, headers=headers, timeout=30)
+
+    if r.status_code == 304:
+        return None, validators
+
+    r.raise_for_status()
+
+    return json.loads(r.text), {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+
+
+def parse_units(data:dict, set_:str=DEFAULT_SET) -> dict:
+    """
+    Units of a set from CDragon TFT JSON data. Traitless and 0 cost units are removed.
+
+    Args:
+        data (dict): CDragon TFT JSON data
+        set_ (str): Set number to load. Default is '14'.
+
+    Returns:
+        dict: Units sorted by unit cost
+    """
+
+    units = dict()
+
+    for unit in data['sets'][set_]['champions']:
+
+        if unit['cost'] <= 5 and len(unit['traits'])>0:
+
+            if unit['cost'] not in units.keys():
+                units[unit['cost']] = [unit['name']]
+
+            else:
+                units[unit['cost']].append(unit['name'])
+
+    return units
+
+
+def parse_shop_odds(data:dict) -> list:
+    """
+    Shop odds for each level from DDragon shop drop rates data.
+
+    Args:
+        data (dict): DDragon shop drop rates JSON data
+
+    Returns:
+        list: Odds (0-1) of getting each cost in the shop at each level.
+    """
+
+    shop_odds = list()
+
+    for level in data['data']['Shop']:
+
+        level_drop_rates = level['dropRatesByTier'][0:5]
+
+        shop_odds.append([ cost['rate']/100 for cost in level_drop_rates ])
+
+    return shop_odds
+
+
+def fetch_units(set_:str=DEFAULT_SET) -> dict:
+    """
+    Load CDragon TFT JSON data, which contains all units
+    and their costs. Traitless and 0 cost units are removed.
+
+    Args:
+        set_ (str): Set number to load. Default is '14'.
+
+    Returns:
+        dict: Units sorted by unit cost
+    """
+
+    return parse_units(fetch_json(UNITS_URL)[0], set_)
+
+
+def fetch_shop_odds() -> list:
+    """
+    Uses requests to grab shop odds from DDragon for each level
+
+    Returns:
+        list: Odds (0-1) of getting each cost in the shop at each level.
+    """
+
+    return parse_shop_odds(fetch_json(ODDS_URL)[0])
+
+
+def build_snapshot(set_:str=DEFAULT_SET) -> dict:
+    """
+    Fetches units and shop odds from the network and packs them into a snapshot.
+
+    Args:
+        set_ (str): Set number to load. Default is '14'.
+
+    Returns:
+        dict: Snapshot with the units per cost and the level x cost odds table.
+    """
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'set': set_,
+        'created': time.time(),
+        'units': fetch_units(set_),
+        'odds': fetch_shop_odds(),
+    }
+
+
+def write_snapshot(snapshot:dict, path:str=SNAPSHOT_PATH) -> None:
+    """
+    Writes a snapshot to disk. The file is written next to its destination and
+    then moved into place, so readers never see a partially written snapshot.
+
+    Args:
+        snapshot (dict): Snapshot produced by build_snapshot()
+        path (str): Destination of the snapshot file
+
+    Returns:
+        None
+    """
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+
+    os.replace(tmp_path, path)
+
+    return None
+
+
+def validate_snapshot(snapshot:dict, set_:str=DEFAULT_SET, max_age:float=None) -> dict:
+    """
+    Checks that a snapshot has the expected version, set and shape. JSON turns
+    the cost keys into strings, so they are converted back to integers.
+
+    Args:
+        snapshot (dict): Snapshot as read from disk
+        set_ (str): Set number the snapshot must belong to
+        max_age (float): Maximum age of the snapshot in seconds. When None (default),
+            the snapshot never goes stale because of its age.
+
+    Returns:
+        dict: The validated snapshot
+    """
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Snapshot version {snapshot.get('version')} is not {SNAPSHOT_VERSION}")
+
+    if snapshot.get('set') != set_:
+        raise SnapshotError(f"Snapshot is for set {snapshot.get('set')}, not set {set_}")
+
+    if max_age is not None and time.time() - snapshot.get('created', 0) > max_age:
+        raise SnapshotError('Snapshot is stale')
+
+    try:
+        units = { int(cost): list(names) for cost, names in snapshot['units'].items() }
+        odds = [ [ float(odd) for odd in level ] for level in snapshot['odds'] ]
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise SnapshotError(f'Snapshot is malformed: {e}') from e
+
+    if sorted(units.keys()) != [1, 2, 3, 4, 5] or not all(units.values()):
+        raise SnapshotError('Snapshot must contain units for every cost 1-5')
+
+    if len(odds) == 0 or any(len(level) != 5 or abs(sum(level) - 1) > 1e-6 for level in odds):
+        raise SnapshotError('Snapshot shop odds must have 5 costs summing to 1 for each level')
+
+    snapshot = dict(snapshot)
+    snapshot['units'] = units
+    snapshot['odds'] = odds
+
+    return snapshot
+
+
+def read_snapshot(path:str=SNAPSHOT_PATH, set_:str=DEFAULT_SET, max_age:float=None) -> dict:
+    """
+    Reads and validates a snapshot from disk.
+
+    Args:
+        path (str): Location of the snapshot file
+        set_ (str): Set number the snapshot must belong to
+        max_age (float): Maximum age of the snapshot in seconds, None to ignore age
+
+    Returns:
+        dict: The validated snapshot
+    """
+
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except json.JSONDecodeError as e:
+        raise SnapshotError(f'Snapshot is not valid JSON: {e}') from e
+
+    if not isinstance(snapshot, dict):
+        raise SnapshotError('Snapshot is malformed')
+
+    return validate_snapshot(snapshot, set_, max_age)
+
+
+def load_snapshot(set_:str=DEFAULT_SET, path:str=SNAPSHOT_PATH, max_age:float=None) -> dict:
+    """
+    Loads game data from the on-disk snapshot. Only when the snapshot is missing,
+    invalid or stale are CDragon/DDragon queried, in which case the snapshot is
+    rewritten so the next start is fast again.
+
+    Args:
+        set_ (str): Set number to load. Default is '14'.
+        path (str): Location of the snapshot file
+        max_age (float): Maximum age of the snapshot in seconds. Defaults to the
+            TFT_SNAPSHOT_MAX_AGE environment variable, or no limit if it is unset.
+
+    Returns:
+        dict: The validated snapshot
+    """
+
+    if max_age is None and os.environ.get('TFT_SNAPSHOT_MAX_AGE'):
+        max_age = float(os.environ['TFT_SNAPSHOT_MAX_AGE'])
+
+    try:
+        return read_snapshot(path, set_, max_age)
+    except (OSError, SnapshotError):
+        pass
+
+    snapshot = validate_snapshot(build_snapshot(set_), set_)
+
+    try:
+        write_snapshot(snapshot, path)
+    except OSError:
+        pass # read-only filesystem, keep serving from memory
+
+    return snapshot
+
+
+if __name__ == '__main__':
+    # written once at image build, see Dockerfile. TFT_SET=13 adds a snapshot of another set
+    snapshot = build_snapshot(os.environ.get('TFT_SET', DEFAULT_SET))
+    validate_snapshot(snapshot, snapshot['set'])
+    write_snapshot(snapshot, snapshot_path(snapshot['set']))
+    print(f'Wrote set {snapshot["set"]} snapshot to {snapshot_path(snapshot["set"])}')
@@ -1,10 +1,43 @@
+import os
+import json
+import math
+import time
 import numpy as np
 import copy
+import pickle
+import tempfile
+import threading
 import unittest
-from .Unit import Unit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from flask import Flask
+from .Unit import Unit, unit_by_id
 from .Pool import Pool
 from .Shop import Shop
+from .CountPool import CountPool
+from .simulate import simulate_rolls, empirical_cdf, empirical_mean
+from .util import number_shops, n_other_shop_curve, n_pool_shop_curve, cdf_curve
+from .distribution import hit_cdf
+from .bulk import bulk_query, result_rows
+from .multi import MAX_SHOPS, prepare_targets, multi_hit, multi_cdf_curve, multi_number_shops
+from .lobby import simulate_lobbies, contest_summary
+from .parallel import shard_sizes, parallel_simulate_rolls, parallel_simulate_lobbies
+from .hypergeometric import reroll_transition, expected_rerolls, exact_cdf_curve, exact_number_shops, exact_n_other_shop_curve
+from .answers import build_answer_table, load_answer_table
+from ..utils.cache import LRUCache, results, cached_cdf_curve, set_answer_table
+from ..utils.pipeline import parse_state, compute_outputs, select_game
+from ..utils.api import create_api
+from ..utils.metrics import REGISTRY, instrument, register_metrics
+from ..utils.figures import FIGURES, figure_templates, figure_payloads, skeleton, build_figure, write_skeletons, _load_skeletons
+from .snapshot import SNAPSHOT_VERSION, SnapshotError, write_snapshot, read_snapshot, validate_snapshot
+from .testdata import FIXTURE_UNITS, FIXTURE_ODDS, FIXTURE_GAME_DATA, fixture_snapshot
+from .registry import GameData, GameDataStore
+from .refresh import Refresher
+from . import registry
 
+# fixture data with the champions named in TestPool, so Pool() and Shop() never read a local snapshot
+NAMED_GAME_DATA = GameData.from_snapshot(validate_snapshot(fixture_snapshot(units={
+    cost: [ name ] + units[1:] for (cost, units), name in zip(FIXTURE_UNITS.items(), ('Jax', 'Vayne', 'Senna', 'Sejuani', 'Viego'))
+})))
 
 class TestUnit(unittest.TestCase):
     """Testing Unit class"""
@@ -18,10 +51,55 @@ class TestUnit(unittest.TestCase):
         self.assertEqual(unit.name, unit_name, 'Unit name not set correctly')
         self.assertEqual(unit.cost, unit_cost, 'Unit cost not set correctly')
 
+    def test_interned(self):
+        # one read-only unit per champion, found again from its id
+        unit = Unit('Amumu', 1)
+
+        self.assertIs(Unit('Amumu', 1), unit, 'Unit not interned')
+        self.assertIsNot(Unit('Amumu', 2), unit, 'Cost not part of the champion')
+        self.assertIs(unit_by_id(unit.id), unit, 'Id does not give the unit')
+        self.assertIs(pickle.loads(pickle.dumps(unit)), unit, 'Unpickled unit not interned')
+        self.assertIs(copy.deepcopy(unit), unit, 'Unit copied')
+        self.assertFalse(hasattr(unit, '__dict__'), 'Unit has a __dict__')
+        with self.assertRaises(AttributeError):
+            unit.name = 'Other'
+
+        # names that are no champion stay out of the registry
+        other = Unit.unregistered('Typed by a user', 4)
+        self.assertEqual((other.name, other.cost, other.id), ('Typed by a user', 4, -1))
+        self.assertIsNot(Unit.unregistered('Typed by a user', 4), other)
+
+    def test_pool_ids(self):
+        # pools and shops hold ids, and hand out the interned units
+        pool = Pool(game_data=FIXTURE_GAME_DATA)
+        shop = Shop(9, game_data=FIXTURE_GAME_DATA)
+        shop.fresh_shop(pool)
+
+        self.assertTrue(all( isinstance(unit_id, int) for ids in pool.units.values() for unit_id in ids ), 'Pool does not hold ids')
+        for unit in shop.slots:
+            self.assertIs(unit, Unit(unit.name, unit.cost), 'Shop unit not interned')
+
+        # the pool counts copies per id, and slots can still be assigned units
+        drawn = shop.slots[0]
+        self.assertEqual(pool.get_odds(drawn), pool.units[drawn.cost][drawn.id]/pool.size(drawn.cost))
+        shop.slots = [drawn, None, None, None, None]
+        self.assertEqual(shop.slots, [drawn, None, None, None, None], 'Slots not assigned')
+
+        size = pool.size()
+        shop.refresh_shop(pool)
+        self.assertEqual(pool.size(), size + 1 - 5, 'Assigned slots not returned to the pool')
+        self.assertIs(parse_state(json.dumps({'unit_name': FIXTURE_UNITS[4][0], 'cost': 4}), 2, 0, 0, 0, 8, FIXTURE_GAME_DATA)['unit'],
+                      Unit(FIXTURE_UNITS[4][0], 4), 'Request unit not interned')
+        self.assertEqual(parse_state(json.dumps({'unit_name': 'Zed', 'cost': 4}), 2, 0, 0, 0, 8, FIXTURE_GAME_DATA)['unit'].id, -1)
+
 class TestPool(unittest.TestCase):
     """Testing Pool class"""
 
     def setUp(self):
+        # the default pool reads the registry, set to offline data whether or not a snapshot exists
+        self.addCleanup(registry.set_game_data, registry._game_data)
+        registry.set_game_data(NAMED_GAME_DATA)
+
         # initialize a pool of units
         self.pool = Pool()
 
@@ -81,10 +159,56 @@ class TestPool(unittest.TestCase):
             
             self.assertGreater(odds_after_return, odds_after_get, 'Odds not for {} cost increased after return_unit'.format(i))
 
+class TestCountPool(unittest.TestCase):
+    """Testing CountPool class against Pool on fixture data"""
+
+    def setUp(self):
+        self.pool = CountPool(game_data=FIXTURE_GAME_DATA)
+        self.list_pool = Pool(game_data=FIXTURE_GAME_DATA)
+
+    def test_pool_size(self):
+        # sizes should match the list-backed pool
+        for i in range(1, 6):
+            self.assertEqual(self.pool.size(i), self.list_pool.size(i), 'Pool size for {} cost not correct'.format(i))
+
+        self.assertEqual(self.pool.size(), self.list_pool.size(), 'Pool size not correct')
+
+    def test_get_return_odds(self):
+        # odds should follow the counts as units are drawn and returned
+        for i in range(1, 6):
+            cost_pool_size = self.pool.size(i)
+            bag_size = FIXTURE_GAME_DATA.bag_sizes[i-1]
+
+            unit = self.pool.get_unit(i)
+            self.assertEqual(unit.cost, i, 'Unit cost not correct')
+            self.assertEqual(self.pool.size(i), cost_pool_size-1, 'Pool size for {} cost not correct after get_unit'.format(i))
+            self.assertEqual(self.pool.get_odds(unit), (bag_size-1)/(cost_pool_size-1), 'Odds for {} cost not correct'.format(i))
+
+            self.pool.return_unit(unit)
+            self.assertEqual(self.pool.size(i), cost_pool_size, 'Pool size for {} cost not correct after return_unit'.format(i))
+            self.assertEqual(self.pool.get_odds(unit), bag_size/cost_pool_size, 'Odds for {} cost not correct after return_unit'.format(i))
+
+    def test_draw_whole_cost(self):
+        # drawing every copy of a cost should hand out exactly the bag size of each unit
+        cost_pool_size = self.pool.size(5)
+        drawn = [ self.pool.get_unit(5).name for _ in range(cost_pool_size) ]
+
+        for name in FIXTURE_GAME_DATA.unit_dict[5]:
+            self.assertEqual(drawn.count(name), FIXTURE_GAME_DATA.bag_sizes[4], 'Wrong number of {} drawn'.format(name))
+
+        self.assertEqual(self.pool.size(5), 0, 'Pool not empty')
+        self.assertEqual(self.pool.get_odds(Unit(FIXTURE_GAME_DATA.unit_dict[5][0], 5)), 0, 'Odds of an empty cost not 0')
+        with self.assertRaises(AssertionError):
+            self.pool.get_unit(5)
+
 class TestShop(unittest.TestCase):
     """Testing Shop class"""
 
     def setUp(self):
+        # the default shops and pool read the registry, set to offline data whether or not a snapshot exists
+        self.addCleanup(registry.set_game_data, registry._game_data)
+        registry.set_game_data(NAMED_GAME_DATA)
+
         # create shops of all levels and a pool of units
         self.shops = [Shop(i) for i in range(1, 12)]
         self.pool = Pool()
@@ -125,6 +249,914 @@ class TestShop(unittest.TestCase):
 
                 self.assertEqual(unit.cost, i+1, 'Probability of getting a unit of a specific cost working incorrectly')
 
+class TestSnapshot(unittest.TestCase):
+    """Testing game data snapshot"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'game_data.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        # units come back keyed by integer cost with odds intact
+        write_snapshot(fixture_snapshot(), self.path)
+        snapshot = read_snapshot(self.path)
+
+        self.assertEqual(snapshot['units'], FIXTURE_UNITS, 'Units not read back correctly')
+        self.assertEqual(snapshot['odds'], FIXTURE_ODDS, 'Odds not read back correctly')
+
+    def test_stale_or_invalid(self):
+        # wrong set, old version, old file and broken odds should all be rejected
+        cases = (
+            (fixture_snapshot(set='13'), {}),
+            (fixture_snapshot(version=SNAPSHOT_VERSION-1), {}),
+            (fixture_snapshot(created=time.time()-100), {'max_age': 10}),
+            (fixture_snapshot(odds=[[.5, .5, .5, 0, 0]]), {}),
+            (fixture_snapshot(units={1: ['A']}), {}),
+        )
+
+        for snapshot, kwargs in cases:
+            write_snapshot(snapshot, self.path)
+            with self.assertRaises(SnapshotError):
+                read_snapshot(self.path, **kwargs)
+
+class TestGameData(unittest.TestCase):
+    """Testing shared game data registry"""
+
+    def test_shared(self):
+        # every shop and pool should reference the same odds and units, not copies
+        shops = [Shop(i, game_data=FIXTURE_GAME_DATA) for i in range(1, 12)]
+        pool = Pool(game_data=FIXTURE_GAME_DATA)
+
+        for shop in shops:
+            self.assertIs(shop.odds, FIXTURE_GAME_DATA.odds, 'Shop odds copied from registry')
+
+        self.assertIs(pool.unit_dict, FIXTURE_GAME_DATA.unit_dict, 'Pool units copied from registry')
+        self.assertTrue(FIXTURE_GAME_DATA.odds.flags.c_contiguous, 'Odds not a contiguous array')
+        self.assertEqual(pool.size(), np.dot(FIXTURE_GAME_DATA.units_per_cost, FIXTURE_GAME_DATA.bag_sizes), 'Pool size not correct')
+
+    def test_read_only(self):
+        # the registry and its arrays cannot be changed in place
+        with self.assertRaises(ValueError):
+            FIXTURE_GAME_DATA.odds[0, 0] = 0
+        with self.assertRaises(TypeError):
+            FIXTURE_GAME_DATA.unit_dict[1] = ()
+        with self.assertRaises(AttributeError):
+            FIXTURE_GAME_DATA.odds = None
+
+        self.assertIs(copy.deepcopy(FIXTURE_GAME_DATA), FIXTURE_GAME_DATA, 'Registry copied')
+
+class TestGameDataStore(unittest.TestCase):
+    """Testing game data of several sets and patches side by side"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.addCleanup(registry.set_game_data, registry._game_data)
+        registry.set_game_data(FIXTURE_GAME_DATA)
+
+        # an older set with one unit less of each cost and other odds
+        odds = [ list(level) for level in FIXTURE_ODDS ]
+        odds[7] = [.15, .25, .30, .27, .03]
+        self.units = { cost: names[:-1] for cost, names in FIXTURE_UNITS.items() }
+        write_snapshot(fixture_snapshot(set='13', units=self.units, odds=odds), os.path.join(tmpdir.name, 'game_data-13.json'))
+        self.store = GameDataStore(maxsize=2, directory=tmpdir.name)
+
+    def test_lazy(self):
+        # a set is read on first use only, the current data is never read
+        self.assertEqual(self.store.loads, 0)
+        game_data = self.store.get('13')
+
+        self.assertEqual(game_data.unit_dict[1], tuple(self.units[1]), 'Set not read from its snapshot')
+        self.assertIs(self.store.get(13), game_data, 'Set read again')
+        self.assertEqual(self.store.loads, 1)
+        for key in (None, '', FIXTURE_GAME_DATA.set_, FIXTURE_GAME_DATA.version):
+            self.assertIs(self.store.get(key), FIXTURE_GAME_DATA, 'Current data not served')
+
+    def test_eviction(self):
+        # least recently used goes first, a set comes back from its snapshot but a patch is gone
+        set_13 = self.store.get('13')
+        patches = [ GameData(FIXTURE_UNITS, [[1, 0, 0, 0, 0]] * level) for level in (9, 10) ]
+        for patch in patches:
+            self.store.put(patch)
+
+        self.assertEqual(self.store.keys(), ['13'] + [ patch.version for patch in reversed(patches) ])
+        self.assertEqual(self.store.evictions, 1)
+        self.assertIsNot(self.store.get('13'), set_13, 'Evicted set not read again')
+        self.assertEqual(self.store.loads, 2)
+
+        with self.assertRaisesRegex(ValueError, 'no longer available'):
+            self.store.get(patches[0].version)
+        for key in ('12', '../game_data', '1' * 4):
+            with self.assertRaises(ValueError):
+                self.store.get(key)
+
+    def test_byte_budget(self):
+        # entries are dropped once their odds and names exceed the budget, not only by count
+        patches = [ GameData(FIXTURE_UNITS, [[1, 0, 0, 0, 0]] * level) for level in (9, 10) ]
+        store = GameDataStore(maxsize=4, directory=self.store.directory, max_bytes=patches[0].nbytes + patches[1].nbytes - 1)
+        for patch in patches:
+            store.put(patch)
+
+        self.assertEqual(store.keys(), ['13', patches[1].version])
+        self.assertEqual((store.evictions, store.nbytes), (1, patches[1].nbytes))
+
+        store.max_bytes = 0
+        store.get('13')
+        self.assertEqual(store.nbytes, store.get('13').nbytes, 'Latest entry not kept over the budget')
+
+    def test_concurrent_load(self):
+        # threads asking for the same set at once share one copy and count one load
+        barrier = threading.Barrier(4)
+        results = []
+
+        def load():
+            barrier.wait()
+            results.append(self.store.get('13'))
+
+        threads = [ threading.Thread(target=load) for _ in range(4) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({ id(game_data) for game_data in results }), 1, 'Set kept more than once')
+        self.assertEqual(self.store.loads, 1)
+
+    def test_keys(self):
+        # pools, shops, the util math and the API all answer for a key
+        self.store.directory, registry.store.directory = registry.store.directory, self.store.directory
+        self.addCleanup(setattr, registry.store, 'directory', self.store.directory)
+
+        pool = CountPool(game_data='13')
+        self.assertEqual(pool.size(1), len(self.units[1]) * 30, 'Pool not built from set 13')
+        self.assertEqual(Shop(8, game_data='13').odds[7].tolist(), [.15, .25, .30, .27, .03], 'Shop not built from set 13')
+
+        shops = [ Shop(level, game_data=FIXTURE_GAME_DATA) for level in range(1, 12) ]
+        current = (CountPool(game_data=FIXTURE_GAME_DATA), shops)
+        other_pool, other_shops = select_game('13', *current)
+        self.assertIs(other_pool.game_data, registry.store.get('13'))
+        self.assertIs(select_game('13', *current)[0], other_pool, 'Pool of set 13 built again')
+        self.assertIs(select_game('', *current)[0], current[0])
+
+        server = Flask(__name__)
+        server.register_blueprint(create_api(*current))
+        client = server.test_client()
+        answers = [ client.get(f'/api/expected?cost=4&star=2&level=8&data={key}').get_json()['expected'] for key in ('', '13') ]
+        self.assertNotEqual(*answers, 'Set 13 not used')
+        self.assertEqual(client.get('/api/expected?cost=4&star=2&level=8&data=12').status_code, 400)
+
+class TestSimulate(unittest.TestCase):
+    """Testing Monte Carlo roll simulator"""
+
+    def setUp(self):
+        self.shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        self.unit = Unit(FIXTURE_GAME_DATA.unit_dict[4][0], 4)
+        self.npool = int(FIXTURE_GAME_DATA.bag_sizes[3] * FIXTURE_GAME_DATA.units_per_cost[3])
+
+    def test_matches_number_shops(self):
+        # number_shops counts slots/5, a shop holding the last copy is on average 0.4 shops later
+        counts, censored = simulate_rolls(self.unit, 0, self.npool, 0, 2, 8, self.shop, n_trials=200_000, rng=np.random.default_rng(0))
+        expected = number_shops(self.unit, 0, self.npool, 0, 2, 8, self.shop, round_to_int=False)
+
+        self.assertEqual(censored, 0, 'Trials did not finish')
+        self.assertAlmostEqual(empirical_mean(counts), expected + 0.4, delta=0.3, msg='Simulated shops do not match number_shops')
+
+        cdf = empirical_cdf(counts, 200_000)
+        self.assertTrue(np.all(np.diff(cdf) >= 0), 'CDF not increasing')
+        self.assertAlmostEqual(cdf[-1], 100, msg='CDF does not reach 100%')
+
+    def test_cannot_hit(self):
+        # level too low for the cost means every trial is censored
+        counts, censored = simulate_rolls(self.unit, 0, self.npool, 0, 1, 1, self.shop, n_trials=1000)
+
+        self.assertEqual(censored, 1000, 'Trials hit an unreachable unit')
+        self.assertEqual(counts.sum(), 0, 'Trials hit an unreachable unit')
+        self.assertTrue(math.isnan(empirical_mean(counts)), 'Mean of no hits not nan')
+
+class TestSweeps(unittest.TestCase):
+    """Testing vectorized sweeps against number_shops"""
+
+    def setUp(self):
+        self.shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+
+    def assertMatches(self, rolls, expected):
+        if isinstance(expected, str):
+            self.assertTrue(np.isnan(rolls), 'Unreachable state not NaN')
+        else:
+            self.assertEqual(rolls, expected, 'Sweep does not match number_shops')
+
+    def test_n_other_curve(self):
+        # every point should equal a number_shops call, and unreachable points should be NaN
+        for cost in range(1, 6):
+            unit = Unit(FIXTURE_GAME_DATA.unit_dict[cost][0], cost)
+            ntot = FIXTURE_GAME_DATA.bag_sizes[cost-1]
+            npool = ntot * FIXTURE_GAME_DATA.units_per_cost[cost-1] - 5
+
+            for star in (1, 2, 3):
+                n_left, shops = n_other_shop_curve(unit, 0, npool, star, 8, self.shop)
+
+                for n, rolls in zip(ntot - n_left, shops):
+                    self.assertMatches(rolls, number_shops(unit, 0, npool - n, n, star, 8, self.shop, round_to_int=False))
+
+    def test_n_pool_curve(self):
+        for cost in range(1, 6):
+            unit = Unit(FIXTURE_GAME_DATA.unit_dict[cost][0], cost)
+            ntot = FIXTURE_GAME_DATA.bag_sizes[cost-1]
+            units_per_cost = FIXTURE_GAME_DATA.units_per_cost[cost-1]
+
+            for star in (1, 2, 3):
+                n_pool, shops = n_pool_shop_curve(unit, 0, 2, star, 8, self.shop, units_per_cost)
+
+                self.assertEqual(n_pool[0], ntot * (units_per_cost - 1) - 1, 'Sweep not ordered largest pool first')
+
+                for n, rolls in zip(n_pool, shops):
+                    self.assertMatches(rolls, number_shops(unit, 0, n + ntot, 2, star, 8, self.shop, round_to_int=False))
+
+class TestDistribution(unittest.TestCase):
+    """Testing CDF engine"""
+
+    def test_single_copy(self):
+        # one copy is geometric, so missing it for k shops has probability (1-p)^5k
+        cdf = hit_cdf([0.02], tol=1e-6, min_shops=10)
+        shops = np.arange(1, cdf.size+1)
+
+        np.testing.assert_allclose(cdf, 1 - 0.98**(5*shops), err_msg='Single copy CDF not geometric')
+        self.assertGreaterEqual(cdf[-1], 1 - 1e-6, 'Horizon stopped before tolerance')
+        self.assertLess(cdf[-2], 1 - 1e-6, 'Horizon longer than needed')
+
+    def test_min_shops(self):
+        # likely hits stop at the minimum horizon, unlikely ones grow past it
+        self.assertEqual(hit_cdf([0.5], min_shops=100).size, 100, 'Minimum horizon not respected')
+        self.assertGreater(hit_cdf([0.001]*3).size, 1000, 'Unlikely hit cut off')
+
+    def test_matches_simulation(self):
+        # the analytical CDF should agree with Monte Carlo, including the 3-star tail
+        shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+
+        for cost, star in ((4, 2), (5, 3)):
+            unit = Unit(FIXTURE_GAME_DATA.unit_dict[cost][0], cost)
+            npool = int(FIXTURE_GAME_DATA.bag_sizes[cost-1] * FIXTURE_GAME_DATA.units_per_cost[cost-1])
+
+            rolls, cdf = cdf_curve(unit, 0, npool, 0, star, 8, shop)
+            counts, _ = simulate_rolls(unit, 0, npool, 0, star, 8, shop, n_trials=50_000, max_rolls=rolls.size, rng=np.random.default_rng(0))
+
+            self.assertGreaterEqual(cdf[-1], 99.99, 'CDF cut off before the tail')
+            self.assertLess(np.abs(empirical_cdf(counts, 50_000) - cdf).max(), 1, 'CDF does not match simulation')
+
+class TestHypergeometric(unittest.TestCase):
+    """Testing the exact reroll model"""
+
+    def test_transition(self):
+        transition = reroll_transition(9, np.array([9, 20]), np.array([100, 60]), 0.3)
+
+        np.testing.assert_allclose(transition.sum(axis=-1), 1)
+        self.assertTrue(np.all(np.triu(transition, 6) == 0), 'More than 5 copies in one reroll')
+        self.assertTrue(np.all(np.tril(transition, -1) == 0), 'Copies lost in a reroll')
+
+    def test_single_copy(self):
+        # one copy needed is geometric over shops, missing means no copy among the slots of the cost
+        nleft, npool, cost_odd = 7, 90, 0.25
+        miss = sum( math.comb(5, k) * cost_odd**k * (1 - cost_odd)**(5-k) * math.comb(npool - nleft, k) / math.comb(npool, k) for k in range(6) )
+
+        self.assertAlmostEqual(float(expected_rerolls(1, nleft, npool, cost_odd)), 1 / (1 - miss), 9, 'Expected shops not correct')
+
+    def test_cdf_mean(self):
+        # the mean of the CDF is the expected number of shops
+        shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        unit = Unit(FIXTURE_GAME_DATA.unit_dict[4][0], 4)
+
+        rolls, cdf = exact_cdf_curve(unit, 0, 120, 0, 3, 8, shop, tol=1e-9)
+
+        self.assertAlmostEqual(1 + np.sum(1 - cdf[:-1] / 100), exact_number_shops(unit, 0, 120, 0, 3, 8, shop, round_to_int=False), 1)
+
+    def test_pool_too_small(self):
+        # fewer units of the cost left than copies of the unit cannot be hit
+        shop = Shop(9, game_data=FIXTURE_GAME_DATA)
+        unit = Unit(FIXTURE_GAME_DATA.unit_dict[5][0], 5)
+
+        self.assertEqual(exact_number_shops(unit, 0, 5, 0, 3, 9, shop), "Not enough units left in pool")
+        self.assertEqual(exact_cdf_curve(unit, 0, 5, 0, 3, 9, shop)[1].size, 0)
+        self.assertTrue(np.all(np.isnan(exact_n_other_shop_curve(unit, 0, 5, 3, 9, shop)[1])), 'Shops for a pool too small')
+
+class TestMulti(unittest.TestCase):
+    """Testing several units rolled for at once"""
+
+    def setUp(self):
+        self.shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        names = FIXTURE_GAME_DATA.unit_dict[4]
+        self.units = [ Unit(name, 4) for name in names[:3] ]
+
+    def test_single_target(self):
+        # one target is the single unit chain
+        rolls, cdf = multi_cdf_curve([(self.units[0], 1, 2, 2)], {4: 120}, 8, self.shop)
+        single = cdf_curve(self.units[0], 1, 120, 2, 2, 8, self.shop)[1]
+
+        n = min(cdf.size, single.size)
+        np.testing.assert_allclose(cdf[:n], single[:n], atol=1e-9)
+
+    def test_all_any(self):
+        targets = [ (unit, 0, 0, 2) for unit in self.units[:2] ]
+        single = multi_number_shops(targets[:1], {4: 130}, 8, self.shop, round_to_int=False)
+        all_of = multi_number_shops(targets, {4: 130}, 8, self.shop, 'all', round_to_int=False)
+        any_of = multi_number_shops(targets, {4: 130}, 8, self.shop, 'any', round_to_int=False)
+
+        self.assertLess(any_of, single, 'Any of two not faster than one')
+        self.assertGreater(all_of, single, 'All of two not slower than one')
+
+        # the expectation agrees with the mean of the CDF
+        cdf, expected = multi_hit(prepare_targets(targets, 8, self.shop), {4: 130}, tol=1e-9)
+        self.assertAlmostEqual(1 + np.sum(1 - cdf[:-1]), expected, 3)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            prepare_targets([(self.units[0], 0, 0, 2)] * 2, 8, self.shop)
+        with self.assertRaises(ValueError):
+            prepare_targets([(self.units[0], 0, 0, 2)], 8, self.shop, 'most')
+
+        self.assertIsInstance(multi_number_shops([(self.units[0], 0, 20, 2)], {4: 130}, 8, self.shop), str, 'Unreachable unit not reported')
+
+        with self.assertRaises(ValueError):
+            multi_hit(prepare_targets([(self.units[0], 0, 0, 2)], 8, self.shop), {4: 5})
+
+    def test_long_roll(self):
+        # unlikely targets stop the CDF at MAX_SHOPS, the expectation still covers the whole roll
+        shop = Shop(7, game_data=FIXTURE_GAME_DATA)
+        targets = [ (Unit(name, 5), 0, 0, 3) for name in FIXTURE_GAME_DATA.unit_dict[5][:2] ]
+        states = prepare_targets(targets, 7, shop)
+
+        cdf, expected = multi_hit(states, {5: 72})
+        self.assertEqual(cdf.size, MAX_SHOPS, 'Horizon not capped')
+        self.assertGreater(expected, MAX_SHOPS, 'Expectation cut at the horizon')
+
+        # the same expectation as summing the tail of a CDF stepped to the end
+        cdf, _ = multi_hit(states, {5: 72}, tol=1e-12, max_shops=100_000)
+        self.assertAlmostEqual(1 + np.sum(1 - cdf[:-1]), expected, 4)
+
+class TestLobby(unittest.TestCase):
+    """Testing whole lobbies rolling from one pool"""
+
+    def setUp(self):
+        self.names = FIXTURE_GAME_DATA.unit_dict[4]
+
+    def test_single_player(self):
+        # one player after one copy: every slot is an independent try, as in number_shops()
+        players = [{'level': 8, 'rolls': 2, 'targets': [(self.names[0], 1)]}]
+        result = simulate_lobbies(players, 20_000, rounds=3, game_data=FIXTURE_GAME_DATA, rng=np.random.default_rng(0))
+
+        p = FIXTURE_GAME_DATA.odds[7, 3] * FIXTURE_GAME_DATA.bag_sizes[3] / (FIXTURE_GAME_DATA.bag_sizes[3] * FIXTURE_GAME_DATA.units_per_cost[3])
+        expected = 1 - (1 - p) ** (5 * np.array([2, 4, 6]))
+        np.testing.assert_allclose(result['hit'][:, 0, 0] / 20_000, expected, atol=0.02)
+
+    def test_contested(self):
+        players = [ {'level': 8, 'rolls': 3, 'targets': [(self.names[i % 2], 3)]} for i in range(8) ]
+        result = simulate_lobbies(players, 2_000, rounds=5, game_data=FIXTURE_GAME_DATA, rng=np.random.default_rng(1))
+
+        # every lobby is counted once per round and no more copies leave than the bag holds
+        self.assertTrue(np.all(result['held'].sum(axis=2) == 2_000))
+        self.assertTrue(np.all(result['others'][:, :, 0].sum(axis=2) == 2_000))
+
+        # copies held by others only grow, and four players share each unit
+        summary = contest_summary(result)
+        self.assertEqual(len(summary), 8)
+        self.assertGreater(summary[0]['nother'], contest_summary(result, 0)[0]['nother'])
+        self.assertAlmostEqual(summary[0]['n_out_of_pool'], summary[2]['n_out_of_pool'], 6)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            simulate_lobbies([{}] * 9, 10, game_data=FIXTURE_GAME_DATA)
+        with self.assertRaises(ValueError):
+            simulate_lobbies([{'level': 8, 'targets': [('Nobody', 2)]}], 10, game_data=FIXTURE_GAME_DATA)
+        with self.assertRaises(ValueError):
+            simulate_lobbies([{'level': 8, 'targets': [(self.names[0], 4)]}], 10, game_data=FIXTURE_GAME_DATA)
+        for targets in ([(self.names[0],)], [self.names[0]], 'targets', [(self.names[0], 2), (self.names[0], 3)]):
+            with self.assertRaisesRegex(ValueError, 'Player 0', msg=f'Targets {targets} accepted'):
+                simulate_lobbies([{'level': 8, 'targets': targets}], 10, game_data=FIXTURE_GAME_DATA)
+
+class TestParallel(unittest.TestCase):
+    """Testing sharded simulations with seeded generators"""
+
+    def setUp(self):
+        self.shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        self.unit = Unit(FIXTURE_GAME_DATA.unit_dict[4][0], 4)
+
+    def test_shard_sizes(self):
+        self.assertEqual(shard_sizes(10, 4), [3, 3, 2, 2])
+        self.assertEqual(sum(shard_sizes(1_000_003)), 1_000_003)
+
+    def test_reproducible(self):
+        # the same seed gives the same counts in this process and across workers
+        serial = parallel_simulate_rolls(self.unit, 0, 120, 0, 2, 8, self.shop, n_trials=20_000, seed=5, workers=1)
+        pooled = parallel_simulate_rolls(self.unit, 0, 120, 0, 2, 8, self.shop, n_trials=20_000, seed=5, workers=2)
+        np.testing.assert_array_equal(serial[0], pooled[0])
+        self.assertEqual(serial[1], pooled[1])
+
+        other = parallel_simulate_rolls(self.unit, 0, 120, 0, 2, 8, self.shop, n_trials=20_000, seed=6, workers=1)
+        self.assertFalse(np.array_equal(serial[0], other[0]), 'Different seeds gave the same counts')
+
+        players = [{'level': 8, 'rolls': 2, 'targets': [(self.unit.name, 2)]}] * 4
+        lobbies = parallel_simulate_lobbies(players, 1_000, rounds=2, game_data=FIXTURE_GAME_DATA, seed=5, workers=1)
+        self.assertEqual(lobbies['n_lobbies'], 1_000)
+        self.assertTrue(np.all(lobbies['held'].sum(axis=2) == 1_000))
+
+    def test_shop_rng(self):
+        # shops drawn with a seeded generator repeat
+        names = []
+        for _ in range(2):
+            shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+            shop.fresh_shop(CountPool(game_data=FIXTURE_GAME_DATA), np.random.default_rng(3))
+            names.append(shop.shop_names())
+        self.assertEqual(names[0], names[1])
+
+class TestMetrics(unittest.TestCase):
+    """Testing callback and computation instrumentation"""
+
+    def sample(self, name:str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_instrument(self):
+        timed = instrument('callback', callback='test')(lambda x: x * 2)
+        before = self.sample('tft_callback_wall_seconds_count', callback='test')
+
+        self.assertEqual(timed(2), 4)
+        self.assertEqual(self.sample('tft_callback_wall_seconds_count', callback='test'), before + 1)
+        self.assertEqual(self.sample('tft_callback_cpu_seconds_count', callback='test'), before + 1)
+        self.assertEqual(self.sample('tft_callback_rss_growth_bytes_count', callback='test'), before + 1)
+
+    def test_compute_and_cache(self):
+        shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        unit = Unit(FIXTURE_GAME_DATA.unit_dict[4][0], 4)
+        results.clear()
+        misses = self.sample('tft_cache_misses_total', cache='results')
+        computed = self.sample('tft_compute_wall_seconds_count', function='cdf_curve', engine='exact')
+
+        for _ in range(2):
+            cached_cdf_curve(unit, 0, 117, 3, 2, 8, shop, engine='exact')
+
+        # one computation, the second call is a cache hit
+        self.assertEqual(self.sample('tft_compute_wall_seconds_count', function='cdf_curve', engine='exact'), computed + 1)
+        self.assertEqual(self.sample('tft_cache_misses_total', cache='results'), misses + 1)
+
+    def test_route(self):
+        server = Flask(__name__)
+        register_metrics(server)
+        response = server.test_client().get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('tft_compute_wall_seconds_bucket', response.get_data(as_text=True))
+
+class TestCache(unittest.TestCase):
+    """Testing LRU result cache"""
+
+    def test_eviction(self):
+        # least recently used entry goes first once the cache is full
+        cache = LRUCache(maxsize=2)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_compute((key,), lambda: key)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['size']), (1, 3, 1, 2), 'Counters not correct')
+        self.assertEqual(cache.get_or_compute(('a',), lambda: 'new'), 'a', 'Recently used entry evicted')
+        self.assertEqual(cache.get_or_compute(('b',), lambda: 'new'), 'new', 'Least recently used entry kept')
+
+    def test_ttl(self):
+        cache = LRUCache(maxsize=2, ttl=0)
+        cache.get_or_compute(('a',), lambda: 1)
+        time.sleep(0.01)
+
+        self.assertEqual(cache.get_or_compute(('a',), lambda: 2), 2, 'Expired entry served')
+
+    def test_threads(self):
+        # concurrent lookups should neither lose counts nor grow past maxsize
+        cache = LRUCache(maxsize=8)
+
+        def work():
+            for i in range(1000):
+                cache.get_or_compute((i % 16,), lambda: i)
+
+        threads = [ threading.Thread(target=work) for _ in range(8) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 8000, 'Lookups lost')
+        self.assertLessEqual(stats['size'], 8, 'Cache grew past maxsize')
+
+    def test_normalized_key(self):
+        # units of the same cost share entries, and cached arrays cannot be changed
+        shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        names = FIXTURE_GAME_DATA.unit_dict[3]
+        results.clear()
+        hits = results.stats()['hits']
+
+        rolls, cdf = cached_cdf_curve(Unit(names[0], 3), 0, 200, 0, 2, 8, shop)
+        rolls_again, cdf_again = cached_cdf_curve(Unit(names[1], 3), 0, 200, 0, 2, 8, shop)
+
+        self.assertIs(cdf_again, cdf, 'Unit name not dropped from key')
+        self.assertEqual(results.stats()['hits'], hits + 1, 'Cache hit not counted')
+        with self.assertRaises(ValueError):
+            cdf[0] = 0
+
+class TestPipeline(unittest.TestCase):
+    """Testing the shared Submit pipeline"""
+
+    def setUp(self):
+        self.pool = Pool(game_data=FIXTURE_GAME_DATA)
+        self.shops = [ Shop(level, game_data=FIXTURE_GAME_DATA) for level in range(1, 12) ]
+        self.name = FIXTURE_GAME_DATA.unit_dict[4][0]
+        self.unit_data = '{"unit_name": "%s", "cost": 4}' % self.name
+
+    def test_parse_state(self):
+        state = parse_state(self.unit_data, 2, 1, None, '', 8, FIXTURE_GAME_DATA)
+
+        self.assertEqual((state['unit'].name, state['unit'].cost), (self.name, 4), 'Unit not parsed')
+        self.assertEqual((state['nother'], state['n_out_of_pool']), (0, 0), 'Empty inputs not counted as 0')
+
+        for args in ((None, 2, 0, 0, 0, 8), (self.unit_data, 4, 0, 0, 0, 8), (self.unit_data, 2, 0, -1, 0, 8), (self.unit_data, 2, 0, 0, 0, 12), (self.unit_data, 2, 0, 0, 10000, 8)):
+            with self.assertRaises(ValueError):
+                parse_state(*args, FIXTURE_GAME_DATA)
+
+    def test_compute_outputs(self):
+        # one pass gives the same answers as the separate computations
+        state = parse_state(self.unit_data, 2, 1, 2, 5, 8, FIXTURE_GAME_DATA)
+        outputs = compute_outputs(state, self.pool, self.shops)
+
+        unit, shop = state['unit'], self.shops[7]
+        npool = self.pool.size(4) - 5 - 1
+
+        self.assertEqual(outputs['expected'], number_shops(unit, 1, npool - 2, 2, 2, 8, shop), 'Expected shops not correct')
+        np.testing.assert_array_equal(outputs['cdf'][1], cdf_curve(unit, 1, npool - 2, 2, 2, 8, shop)[1])
+        np.testing.assert_array_equal(outputs['n_other'][1], n_other_shop_curve(unit, 1, npool, 2, 8, shop)[1])
+        np.testing.assert_array_equal(outputs['n_pool'][1], n_pool_shop_curve(unit, 1, 2, 2, 8, shop, 13)[1])
+
+    def test_figure_payloads(self):
+        # compact payloads carry the same series as the figures, rounded to the hundredths
+        state = parse_state(self.unit_data, 3, 0, 0, 0, 8, FIXTURE_GAME_DATA)
+        outputs = compute_outputs(state, self.pool, self.shops)
+        roll_payload, other_payload, pool_payload = figure_payloads(state, outputs)
+
+        rolls, cdf = outputs['cdf']
+        self.assertEqual(roll_payload['x0'], rolls[0], 'Roll axis not correct')
+        np.testing.assert_allclose(roll_payload['y'], cdf, atol=0.005)
+        self.assertEqual(other_payload['x'], outputs['n_other'][0].astype(str).tolist(), 'Copies left not correct')
+        self.assertEqual(pool_payload['x0'], outputs['n_pool'][0][0], 'Pool axis not correct')
+        self.assertIn(None, other_payload['y'], 'NaN not sent as null')
+
+        templates = figure_templates()
+        self.assertEqual(tuple(templates), FIGURES, 'Template missing')
+        self.assertEqual(len(templates['roll-prob']['figure']['data'][0]['y']), 0, 'Template carries data')
+
+    def test_build_figure(self):
+        # figures are copies, changing one leaves the skeleton alone
+        fig = build_figure('n-pool', x0=10, dx=-1, y=[1.0, 2.0], layout={'title.text': 'Pool'})
+        fig.update_layout(title_text='Changed')
+
+        self.assertEqual((fig.data[0].x0, fig.data[0].dx, tuple(fig.data[0].y)), (10, -1, (1.0, 2.0)), 'Data not swapped in')
+        self.assertNotIn('text', skeleton('n-pool')['layout']['title'], 'Skeleton changed')
+        self.assertEqual(len(skeleton('n-pool')['data'][0]['y']), 0, 'Skeleton changed')
+
+        # the template is shared, changing it on a figure does not reach the skeleton either
+        fig.update_layout(template_layout_font_size=99)
+        self.assertNotEqual(skeleton('n-pool')['layout']['template']['layout'].get('font', {}).get('size'), 99, 'Skeleton template changed')
+
+class TestStartup(unittest.TestCase):
+    """Testing the app factory and prebuilt figure skeletons"""
+
+    def test_skeleton_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'figures.json')
+            write_skeletons(path)
+            skeletons = _load_skeletons(path)
+            self.assertEqual(skeletons['roll-prob'], json.loads(json.dumps(skeleton('roll-prob'))))
+
+            # skeletons from another plotly version are rebuilt
+            with open(path) as f:
+                saved = json.load(f)
+            saved['plotly'] = '0.0.0'
+            with open(path, 'w') as f:
+                json.dump(saved, f)
+            self.assertIsNone(_load_skeletons(path))
+            self.assertIsNone(_load_skeletons(os.path.join(tmp, 'missing.json')))
+
+    def test_create_app(self):
+        from .. import app as dash_app
+
+        app = dash_app.create_app(FIXTURE_GAME_DATA)
+        self.addCleanup(set_answer_table, None)
+        client = app.server.test_client()
+
+        self.assertIs(dash_app.game[0].game_data, FIXTURE_GAME_DATA)
+        self.assertEqual(client.get('/_dash-layout').status_code, 200)
+        self.assertEqual(client.get('/api/expected?cost=4&star=2&level=8').status_code, 200)
+
+        # a pool emptied by the units out of it is an error message, not a failed callback
+        unit_data = '{"unit_name": "%s", "cost": 5}' % FIXTURE_GAME_DATA.unit_dict[5][0]
+        message = dash_app.submit(1, unit_data, 3, 0, 0, 10000, 9, 'exact', '')[0]
+        self.assertIn('out of the pool', message)
+
+class TestRefresh(unittest.TestCase):
+    """Testing background refresh of patch data, against a local stand-in for CDragon/DDragon"""
+
+    def setUp(self):
+        # the documents served and the requests seen, as (path, status)
+        self.documents = {
+            '/units': {'sets': {'14': {'champions': [
+                {'name': name, 'cost': cost, 'traits': ['Trait']} for cost, names in FIXTURE_UNITS.items() for name in names
+            ] + [{'name': 'Dummy', 'cost': 1, 'traits': []}]}}},
+            '/odds': {'data': {'Shop': [ {'dropRatesByTier': [ {'rate': odd*100} for odd in level ]} for level in FIXTURE_ODDS ]}},
+        }
+        self.requests = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(test.documents[self.path]).encode()
+                etag = f'"{hash(body)}"'
+                status = 304 if self.headers.get('If-None-Match') == etag else 200
+                test.requests.append((self.path, status))
+                self.send_response(status)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body) if status == 200 else 0))
+                self.end_headers()
+                if status == 200:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.updates = []
+        self.refresher = Refresher(self.updates.append, FIXTURE_GAME_DATA, interval=0.05,
+                                   units_url=f'{url}/units', odds_url=f'{url}/odds')
+
+    def new_odds(self):
+        odds = [ list(level) for level in FIXTURE_ODDS ]
+        odds[7] = [.15, .25, .30, .27, .03]
+        self.documents['/odds'] = {'data': {'Shop': [ {'dropRatesByTier': [ {'rate': odd*100} for odd in level ]} for level in odds ]}}
+        return odds
+
+    def test_conditional(self):
+        # same data as in use, then nothing downloaded again
+        self.assertIsNone(self.refresher.check())
+        self.assertIsNone(self.refresher.check())
+        self.assertEqual(self.requests, [('/units', 200), ('/odds', 200), ('/units', 304), ('/odds', 304)])
+        self.assertEqual(self.updates, [], 'Unchanged data swapped in')
+
+        # a new patch changes the odds only, the units are reused from the last download
+        odds = self.new_odds()
+        game_data = self.refresher.check()
+
+        self.assertEqual(self.requests[-2:], [('/units', 304), ('/odds', 200)])
+        self.assertEqual(self.updates, [game_data], 'New data not swapped in')
+        self.assertEqual(game_data.odds.tolist(), odds, 'Odds not updated')
+        self.assertEqual(game_data.unit_dict[1], tuple(FIXTURE_UNITS[1]), 'Units not kept')
+        self.assertEqual(self.refresher.version, game_data.version)
+
+    def test_invalid(self):
+        # bad data is rejected, and downloaded again at the next check
+        self.documents['/odds'] = {'data': {'Shop': [{'dropRatesByTier': [{'rate': 50}] * 5}]}}
+        with self.assertRaises(SnapshotError):
+            self.refresher.check()
+        with self.assertRaises(SnapshotError):
+            self.refresher.check()
+
+        self.assertEqual(self.requests[-1], ('/odds', 200), 'Rejected data cached')
+        self.assertEqual(self.refresher.version, FIXTURE_GAME_DATA.version, 'Rejected data swapped in')
+
+    def test_thread(self):
+        self.new_odds()
+        self.refresher.start()
+        self.addCleanup(self.refresher.stop)
+
+        deadline = time.time() + 10
+        while not self.updates and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.updates), 1, 'Refresher thread did not swap in the new patch')
+
+    def test_refresh_after_fork(self):
+        # a preloading gunicorn master builds the refresher, only the forked workers run it
+        from .. import app as dash_app
+
+        for name, value in (('REFRESH_INTERVAL', 60), ('REFRESH_AFTER_FORK', True), ('refresher', None), ('game', dash_app.game)):
+            self.addCleanup(setattr, dash_app, name, getattr(dash_app, name))
+            setattr(dash_app, name, value)
+        self.addCleanup(set_answer_table, None)
+        self.addCleanup(registry.set_game_data, registry._game_data)
+
+        # the default app reads the registry, set to offline data so no snapshot is loaded or fetched
+        registry.set_game_data(FIXTURE_GAME_DATA)
+        dash_app.create_app()
+
+        self.assertIsNotNone(dash_app.refresher, 'Refresher not built')
+        self.assertNotIn('patch-refresher', [ thread.name for thread in threading.enumerate() ], 'Refresher started before the fork')
+
+    def test_swap(self):
+        # in-flight requests see the old or the new patch whole while the app swaps
+        from .. import app as dash_app
+
+        app = dash_app.create_app(FIXTURE_GAME_DATA)
+        self.addCleanup(set_answer_table, None)
+        self.addCleanup(registry.set_game_data, registry._game_data)
+        client = app.server.test_client()
+
+        self.new_odds()
+        new_game_data = self.refresher.check()
+        answers = []
+        for game_data in (new_game_data, FIXTURE_GAME_DATA):
+            dash_app.swap_game_data(game_data)
+            answers.append(client.get('/api/expected?cost=4&star=2&level=8').get_json()['expected'])
+        self.assertNotEqual(*answers, 'Odds not used after the swap')
+
+        seen, stop = [], threading.Event()
+
+        def request():
+            local = app.server.test_client()
+            while not stop.is_set():
+                seen.append(local.get('/api/expected?cost=4&star=2&level=8').get_json()['expected'])
+
+        threads = [ threading.Thread(target=request) for _ in range(4) ]
+        for thread in threads:
+            thread.start()
+        for game_data in (new_game_data, FIXTURE_GAME_DATA) * 10:
+            dash_app.swap_game_data(game_data)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(seen and set(seen) <= set(answers), 'A request mixed two patches')
+        self.assertIs(registry.get_game_data(), FIXTURE_GAME_DATA, 'Registry not swapped')
+
+        new_units = {**FIXTURE_UNITS, 5: FIXTURE_UNITS[5] + ['New Unit']}
+        dash_app.swap_game_data(GameData(new_units, FIXTURE_ODDS))
+        self.assertIn('New Unit', client.get('/_dash-layout').get_data(as_text=True), 'Layout not rebuilt')
+
+class TestApi(unittest.TestCase):
+    """Testing the JSON API"""
+
+    def setUp(self):
+        pool = Pool(game_data=FIXTURE_GAME_DATA)
+        shops = [ Shop(level, game_data=FIXTURE_GAME_DATA) for level in range(1, 12) ]
+        server = Flask(__name__)
+        server.register_blueprint(create_api(pool, shops))
+        self.client = server.test_client()
+
+    def test_odds(self):
+        response = self.client.get('/api/odds?unit=Zed&cost=4&star=3&level=8&nother=1')
+        body = response.get_json()
+
+        self.assertEqual(response.status_code, 200, 'Request failed')
+        self.assertEqual(set(body), {'expected', 'cdf', 'n_other', 'n_pool', 'state'}, 'Outputs missing')
+        self.assertEqual(body['state']['unit'], 'Zed', 'State not echoed')
+        self.assertEqual(len(body['cdf']['rolls']), len(body['cdf']['probability']), 'CDF arrays differ in length')
+        self.assertIn(None, body['n_other']['shops'], 'NaN not sent as null')
+
+    def test_multi(self):
+        body = {'targets': [{'unit': 'A', 'cost': 4, 'star': 2}, {'unit': 'B', 'cost': 3, 'star': 2, 'nteam': 1}], 'level': 8, 'mode': 'any'}
+        response = self.client.post('/api/multi', json=body)
+
+        self.assertEqual(response.status_code, 200, 'Request failed')
+        self.assertGreater(response.get_json()['expected'], 0, 'Expected shops missing')
+        self.assertEqual(self.client.post('/api/multi', json=dict(body, mode='most')).status_code, 400, 'Invalid mode accepted')
+        self.assertEqual(self.client.post('/api/multi', json=dict(body, n_out_of_pool={4: 1000})).status_code, 400, 'Empty pool accepted')
+
+    def test_engine(self):
+        exact = self.client.get('/api/expected?cost=4&star=3&level=8&engine=exact').get_json()
+
+        self.assertEqual(exact['state']['engine'], 'exact', 'Engine not echoed')
+        self.assertNotEqual(exact['expected'], None, 'Exact engine gave no answer')
+
+    def test_single_output(self):
+        body = self.client.get('/api/expected?cost=4&star=3&level=8&nother=9').get_json()
+
+        self.assertEqual(set(body), {'expected', 'message', 'state'}, 'Other outputs computed')
+        self.assertIsNone(body['expected'], 'Message sent as a number')
+
+    def test_bulk(self):
+        chunks = '\n'.join(['{"cost": [4, 4], "star": [2, 3], "level": [8, 8]}', '{"cost": [1], "star": [1], "level": [1], "nteam": [1]}'])
+        lines = self.client.post('/api/bulk?shops=10', data=chunks, content_type='application/x-ndjson').get_data(as_text=True).splitlines()
+
+        self.assertEqual(len(lines), 3, 'One line per state expected')
+        self.assertEqual(json.loads(lines[2])['nteam'], 1, 'Rows out of order')
+        self.assertIn('probability', json.loads(lines[0]), 'Probability missing')
+
+        self.assertEqual(self.client.post('/api/bulk', json={'cost': [6], 'star': [1], 'level': [1]}).status_code, 400, 'Invalid state accepted')
+
+        # a line that is no object of columns ends the stream with an error line
+        for line in ('[1, 2]', '3'):
+            lines = self.client.post('/api/bulk', data=chunks + '\n' + line, content_type='application/x-ndjson').get_data(as_text=True).splitlines()
+            self.assertEqual(len(lines), 4, 'Rows before the bad line missing')
+            self.assertIn('error', json.loads(lines[3]), 'Bad line not reported')
+
+    def test_invalid(self):
+        for query in ('cost=4&star=2', 'cost=6&star=2&level=8', 'cost=4&star=2&level=8&engine=other', 'cost=4&star=2&level=8&nother=-1', 'cost=four&star=2&level=8',
+                      'cost=5&star=3&level=9&n_out_of_pool=64', 'cost=5&star=3&level=9&n_out_of_pool=100&engine=exact'):
+            response = self.client.get(f'/api/odds?{query}')
+            self.assertEqual(response.status_code, 400, f'{query} accepted')
+            self.assertIn('error', response.get_json(), 'Error message missing')
+
+class TestBulk(unittest.TestCase):
+    """Testing bulk evaluation of game states"""
+
+    def setUp(self):
+        self.shops = [ Shop(level, game_data=FIXTURE_GAME_DATA) for level in range(1, 12) ]
+        grid = np.array(np.meshgrid([1, 3, 5], [1, 2, 3], [2, 5, 8], [0, 2, 7], [0, 3], [0, 20])).reshape(6, -1)
+        self.states = dict(zip(('cost', 'star', 'level', 'nteam', 'nother', 'n_out_of_pool'), grid))
+
+    def test_matches_number_shops(self):
+        result = bulk_query(self.states, FIXTURE_GAME_DATA, shops=20)
+
+        for row in result_rows(result):
+            unit = Unit('Unit', row['cost'])
+            npool = int(FIXTURE_GAME_DATA.bag_sizes[row['cost']-1] * FIXTURE_GAME_DATA.units_per_cost[row['cost']-1]) \
+                - row['n_out_of_pool'] - row['nteam'] - row['nother']
+            args = (unit, row['nteam'], npool, row['nother'], row['star'], row['level'], self.shops[row['level']-1])
+
+            expected = number_shops(*args)
+            self.assertEqual(row['message'] if row['expected'] is None else row['expected'], expected, f'{row} not correct')
+
+            if row['expected'] is not None:
+                self.assertAlmostEqual(row['probability'], cdf_curve(*args)[1][19] / 100, 9, f'{row} probability not correct')
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            bulk_query(dict(self.states, star=self.states['star'] + 1), FIXTURE_GAME_DATA)
+        with self.assertRaises(ValueError):
+            bulk_query({'cost': [1, 2], 'star': [1], 'level': [1, 2]}, FIXTURE_GAME_DATA)
+        with self.assertRaises(ValueError):
+            bulk_query({'cost': [5], 'star': [3], 'level': [9], 'n_out_of_pool': [70]}, FIXTURE_GAME_DATA)
+        with self.assertRaises(ValueError):
+            bulk_query([1, 2], FIXTURE_GAME_DATA)
+
+class TestAnswerTable(unittest.TestCase):
+    """Testing memory-mapped answer table"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmpdir.name, 'answers.bin')
+        build_answer_table(FIXTURE_GAME_DATA, cls.path, nout_max=1)
+        cls.table = load_answer_table(cls.path, FIXTURE_GAME_DATA)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_lookups_match_util(self):
+        # lookups should give the same numbers as computing them
+        shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+
+        for cost in range(1, 6):
+            unit = Unit(FIXTURE_GAME_DATA.unit_dict[cost][0], cost)
+            size = FIXTURE_GAME_DATA.bag_sizes[cost-1] * FIXTURE_GAME_DATA.units_per_cost[cost-1]
+            units_per_cost = FIXTURE_GAME_DATA.units_per_cost[cost-1]
+
+            for star, nteam, nother in ((1, 0, 0), (2, 1, 3), (3, 2, 0)):
+                npool = size - 1 - nteam - nother
+
+                for round_to_int in (True, False):
+                    self.assertEqual(
+                        self.table.number_shops(unit, nteam, npool, nother, star, 8, shop, round_to_int),
+                        number_shops(unit, nteam, npool, nother, star, 8, shop, round_to_int), 'Expected shops do not match')
+
+                # curves running past the stored shops are left to cdf_curve(), the others are the same
+                rolls, cdf = cdf_curve(unit, nteam, npool, nother, star, 8, shop)
+                table_curve = self.table.cdf_curve(unit, nteam, npool, nother, star, 8, shop)
+                self.assertEqual(table_curve is None, rolls.size > 100, 'CDF stored to another horizon')
+                if table_curve is not None:
+                    np.testing.assert_array_equal(table_curve[0], rolls)
+                    np.testing.assert_array_equal(table_curve[1], cdf, 'CDF does not match')
+
+                for table_curve, curve in (
+                    (self.table.n_other_shop_curve(unit, nteam, size - nteam, star, 8, shop), n_other_shop_curve(unit, nteam, size - nteam, star, 8, shop)),
+                    (self.table.n_pool_shop_curve(unit, nteam, nother, star, 8, shop, units_per_cost), n_pool_shop_curve(unit, nteam, nother, star, 8, shop, units_per_cost)),
+                ):
+                    np.testing.assert_array_equal(table_curve[0], curve[0], 'Sweep x values do not match')
+                    np.testing.assert_array_equal(table_curve[1], curve[1], 'Sweep does not match')
+
+    def test_outside_table(self):
+        # states the table does not cover are left to the caller
+        shop = Shop(8, game_data=FIXTURE_GAME_DATA)
+        unit = Unit(FIXTURE_GAME_DATA.unit_dict[4][0], 4)
+
+        self.assertIsNone(self.table.cdf_curve(unit, 0, 100, 0, 2, 8, shop), 'CDF returned for too many units out of the pool')
+        self.assertIsNone(self.table.number_shops(unit, 0, 130, 0, 2, 1, Shop(1, game_data=FIXTURE_GAME_DATA)), 'Answer returned for unreachable unit')
+
+    def test_stale(self):
+        # a table built for other game data is not used
+        other = GameData(FIXTURE_UNITS, FIXTURE_ODDS, set_='13')
+
+        self.assertIsNone(load_answer_table(self.path, other), 'Stale table loaded')
+
 # class TestUtil(unittest.TestCase):
 
 #     def setUp(self):
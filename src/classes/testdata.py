@@ -0,0 +1,40 @@
+import time
+from .snapshot import SNAPSHOT_VERSION, DEFAULT_SET, validate_snapshot
+from .registry import GameData
+
+# Offline game data with the set's unit counts and shop odds, for test.py and the
+# benchmarks, which should not hit the network. Unit names are placeholders. Test
+# only, left out of the Docker image (see .dockerignore).
+FIXTURE_UNITS = { cost: [ f'{cost}-cost Unit {i}' for i in range(n) ] for cost, n in zip(range(1, 6), (13, 13, 13, 13, 8)) }
+FIXTURE_ODDS = [
+    [1, 0, 0, 0, 0],
+    [1, 0, 0, 0, 0],
+    [.75, .25, 0, 0, 0],
+    [.55, .30, .15, 0, 0],
+    [.45, .33, .20, .02, 0],
+    [.30, .40, .25, .05, 0],
+    [.19, .30, .40, .10, .01],
+    [.18, .25, .32, .22, .03],
+    [.10, .20, .25, .35, .10],
+    [.05, .10, .20, .40, .25],
+    [.01, .02, .12, .50, .35],
+]
+
+def fixture_snapshot(**kwargs) -> dict:
+    """
+    Snapshot of the fixture data, fields can be overridden with keyword arguments.
+
+    Returns:
+        dict: Snapshot as written by snapshot.write_snapshot()
+    """
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'set': DEFAULT_SET,
+        'created': time.time(),
+        'units': FIXTURE_UNITS,
+        'odds': FIXTURE_ODDS,
+    }
+    snapshot.update(kwargs)
+    return snapshot
+
+FIXTURE_GAME_DATA = GameData.from_snapshot(validate_snapshot(fixture_snapshot()))
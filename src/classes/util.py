@@ -1,8 +1,7 @@
 import enum
 import numpy as np
-import plotly.express as px
-from scipy.signal import convolve
-from scipy.stats import geom
+from .distribution import hit_cdf
+from ..utils.figures import build_figure, figure_layout
 
 
 
@@ -29,7 +28,7 @@ def process_state(unit, nteam:int, nother:int, star:int, level:int, shop) -> tup
         nother (int): Number of desired unit on other boards or benches
         star (int): Desired star level of desired unit
         level (int): Current team level
-        shop (Shop): A shop object used to get odds for a certiain level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
 
     Returns:
         nneeded (int): Number of copies of the unit needed to reach the desired star level
@@ -51,11 +50,10 @@ def process_state(unit, nteam:int, nother:int, star:int, level:int, shop) -> tup
         nneeded = 1
         
     cost = unit.cost
-    ntot = [ cost.value for cost in BagSizes ]
-    all_odds = shop.odds 
-    odds = all_odds[level-1]
-    cost_odd = odds[cost-1]
-    nleft = ntot[cost-1] - nteam - nother # number left in pool
+    game_data = shop.game_data # shared registry, nothing is copied
+    ntot = int(game_data.bag_sizes[cost-1])
+    cost_odd = float(game_data.odds[level-1, cost-1])
+    nleft = ntot - nteam - nother # number left in pool
     
     return nneeded, nleft, cost, cost_odd
 
@@ -121,15 +119,76 @@ def number_shops(unit, nteam:int, npool:int, nother:int, star:int, level:int, sh
 
         return round(sum(rolls)/5, 2)
 
+def expected_shops(nneeded:int, nleft, npool, cost_odd:float) -> np.ndarray:
+    """
+    Array version of the expectation in number_shops(). nleft and npool can be arrays 
+    (or scalars) that broadcast against each other, so a whole sweep over copies left or 
+    pool size is evaluated at once. The copies needed are laid out along a new first axis 
+    and summed in the same order as number_shops() so the results are identical.
+
+    Args:
+        nneeded (int): Number of copies of the unit needed to reach the desired star level
+        nleft (int or np.ndarray): Number of unit copies left in the pool
+        npool (int or np.ndarray): Number of units of the same cost left in the pool
+        cost_odd (float): Odds of a shop slot rolling the cost as the desired unit
+
+    Returns:
+        np.ndarray: Expected number of shops (unrounded), NaN where there are not 
+            enough copies left or the cost cannot be rolled
+    """
+
+    found = np.arange(nneeded).reshape((-1,) + (1,) * np.ndim(nleft + npool))
+    nleft = np.asarray(nleft)
+    npool = np.asarray(npool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = (nleft - found)/(npool - found) * cost_odd
+        shops = (1/p).sum(axis=0)/5
+
+    return np.where((nleft >= nneeded) & (nleft > 0) & (nneeded > 0) & (cost_odd > 0), shops, np.nan)
+
+def cdf_curve(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, tol:float=1e-4) -> tuple:
+    """
+    Probability of hitting the desired number of copies of a unit by each shop roll.
+    Each copy takes a geometric number of shop slots to find, and the total is followed 
+    with distribution.hit_cdf(), whose horizon grows until less than tol of the 
+    probability is left in the tail.
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        npool (int): Number or percentage of units of the same cost of the desired 
+            unit left in the pool
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        tol (float): Probability (0-1) of not having hit yet at the last shop roll returned
+
+    Returns:
+        rolls (np.ndarray): Shop rolls 1, 2, ..., empty when the unit cannot be hit
+        cdf (np.ndarray): Probability (%) of having hit by each shop roll
+    """
+
+    nneeded, nleft, _, cost_odd = process_state(unit, nteam, nother, star, level, shop)  
+    
+    if nneeded ==0 or cost_odd == 0 or nleft <= 0 or nleft < nneeded:
+        return np.zeros(0, dtype=int), np.zeros(0)
+
+    found = np.arange(nneeded)
+    probs = (nleft - found) / (npool - found) * cost_odd
+
+    cdf = hit_cdf(probs, tol=tol) * 100
+
+    return np.arange(1, cdf.size+1), cdf
+
 def cdf_plot(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop):
     """
     Creates a cumulative distribution function (CDF) plot for the probability of hitting the 
     desired number of copies of a unit in a given number of shop rolls. The probability of 
     hitting the next copy of a unit in a certain amount of shop slots is modeled as geometric process. 
-    The CDF is calculated using the convolving the probability mass functions (PMFs) of the 
-    geometric distribution for each copy needed. The CDF is then calculated by taking the cumulative 
-    sum of the PMF for every 5 shop slots, since a single shop reroll refreshes 5 slots. The CDF is plotted
-    using Plotly Express.
+    The CDF of the total number of slots is calculated by cdf_curve() at every 5 shop slots, 
+    since a single shop reroll refreshes 5 slots. The CDF is plotted using Plotly Express.
     
     Statistics source:  https://www.statlect.com/fundamentals-of-probability/sums-of-independent-random-variables
 
@@ -148,75 +207,60 @@ def cdf_plot(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop):
             desired number of copies of a unit in a given number of shop rolls.
     """
     
-   
-    return_blank = False
+    rolls, cdf = cdf_curve(unit, nteam, npool, nother, star, level, shop)
 
-    nneeded, nleft, _, cost_odd = process_state(unit, nteam, nother, star, level, shop)  
-    
-    if nneeded ==0 or cost_odd == 0 or nleft <= 0 or nleft < nneeded:
-        return_blank = True
-    
-    if return_blank:
-        
-        return px.bar(
-            x=[0],
-            y=[0],
-        )
-    
-    max_rolls = 1000
-    
-    rolls = np.arange(1, max_rolls)
-    
-    p = nleft / npool * cost_odd
-    pmf = geom.pmf(rolls, p)
-    
-    nleft -= 1
-    nneeded -= 1
-    npool -= 1
-    
-    while nneeded > 0:
-        
-        p = nleft / npool * cost_odd
-        pmf_i = geom.pmf(rolls, p)
-        pmf = convolve(pmf, pmf_i, method='direct')
-        
-        nleft -= 1
-        nneeded -= 1
-        npool -= 1
+    return cdf_figure(rolls, cdf, unit, star)
+
+def cdf_figure(rolls:np.ndarray, cdf:np.ndarray, unit, star:int):
+    """
+    Bar plot of a CDF from cdf_curve(). Kept apart from the math so the curve can be 
+    cached independently of the unit name shown in the title. The styling comes 
+    from the figure skeletons in utils.figures.
+
+    Args:
+        rolls (np.ndarray): Shop rolls, empty when the unit cannot be hit
+        cdf (np.ndarray): Probability (%) of having hit by each shop roll
+        unit (Unit): Unit being rolled for
+        star (int): Desired star level of desired unit
+
+    Returns:
+        plotly.graph_objects._figure.Figure: Bar plot of the probability of hitting the 
+            desired number of copies of a unit in a given number of shop rolls.
+    """
     
-    # cumulative sum of pmf for every 5 shop slots, aka a reroll
-    cdf = [ sum(pmf[0:i+1])*100 for i in range(5,len(pmf),5) ]
+    if rolls.size == 0:
+        return build_figure('roll-prob', x=[0], y=[0])
         
-    fig = px.bar(x=np.arange(1, len(cdf)+1), y=cdf)
-    fig.update_layout(
-        title=f"Probability of hitting {star}-star {unit.name} as you roll",
-        template="simple_white",
-        hovermode="x",
-        hoverlabel_font_size=16,
-        font_size=14,
-        title_font_size=20,
-        dragmode=False
-    )
-    fig.update_xaxes(
-        title_text="Shop rolls",
-        range=[0, 100],
-        tick0=0,
-        dtick=20,
-        showspikes=True, 
-        spikesnap="cursor", 
-        spikemode="across",
-        spikethickness=0.5,
-        )
-    fig.update_yaxes(
-        title_text="Probability of hitting",
-        ticksuffix= "%",
-    )
-    fig.update_traces(
-        hovertemplate="# of shop rolls: %{x}<br>Probability of hitting: %{y:.2f}%",
-        marker_color='white', marker_line_color='blue')
-    
-    return fig
+    return build_figure('roll-prob', x=rolls, y=cdf, layout=figure_layout('roll-prob', star=star, name=unit.name))
+
 
+def n_other_shop_curve(unit, nteam:int, npool:int, star:int, level:int, shop) -> tuple:
+    """
+    Expected number of shops for every number of the desired unit taken out of the pool 
+    by other players, computed in one pass with expected_shops().
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        npool (int): Number or percentage of units of the same cost of the desired 
+            unit left in the pool
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+
+    Returns:
+        n_left (np.ndarray): Copies of the unit left in the pool
+        shops (np.ndarray): Expected number of shops to the hundredths, NaN where the unit cannot be hit
+    """
+
+    nneeded, ntot_left, _, cost_odd = process_state(unit, nteam, 0, star, level, shop)
+
+    nother = np.arange(1, ntot_left)
+
+    shops = expected_shops(nneeded, ntot_left - nother, npool - nother, cost_odd)
+    shops = np.array([ round(rolls, 2) for rolls in shops.tolist() ]) # same rounding as number_shops()
+
+    return ntot_left - nother, shops
 
 def n_other_shop_distribution(unit, nteam:int, npool:int, star:int, level:int, shop):
     """
@@ -236,53 +280,54 @@ def n_other_shop_distribution(unit, nteam:int, npool:int, star:int, level:int, s
         plotly.graph_objects._figure.Figure: Bar plot of expected number of shops rolls
     """
     
-    cost = unit.cost
-    
-    ntot = [ cost.value for cost in BagSizes ][cost-1]
-        
-    n_not_on_team = ntot - nteam
-    
-    shops = [ 
-             number_shops(
-                 unit, 
-                 nteam, 
-                 npool - n, 
-                 n, 
-                 star, 
-                 level, 
-                 shop, 
-                 round_to_int=False) 
-             for n in range(1, n_not_on_team)
-             ]
-    
-    n_left = n_not_on_team - np.arange(1, n_not_on_team)
-    
-    shops_for_plot = [ rolls for rolls in shops]
-    n_left = n_left[:len(shops_for_plot)].astype(str)
-    
-    fig = px.bar(x=n_left, y=shops_for_plot)
-    fig.update_layout(
-        xaxis_title=f"# of {unit.name}'s left in pool",
-        yaxis_title="Expected # of shops",
-        title="Effect of # left in pool on expected # of shops",
-        template="simple_white",
-        dragmode=False,
-        hovermode="x",
-        hoverlabel_font_size=16,
-        font_size=14,
-        title_font_size=20,
-    )
-    fig.update_xaxes(
-        showspikes=True, 
-        spikesnap="cursor", 
-        spikemode="across",
-        spikethickness=0.5,
-    )
-    fig.update_traces(
-        hovertemplate="# left: %{x}<br>Expected # of shops: %{y}",
-        marker_color='white', marker_line_color='blue', marker_line_width=1.5)
-    
-    return fig
+    n_left, shops = n_other_shop_curve(unit, nteam, npool, star, level, shop)
+
+    return n_other_figure(n_left, shops, unit)
+
+def n_other_figure(n_left:np.ndarray, shops_for_plot:np.ndarray, unit):
+    """
+    Bar plot of the sweep from n_other_shop_curve().
+
+    Args:
+        n_left (np.ndarray): Copies of the unit left in the pool
+        shops_for_plot (np.ndarray): Expected number of shops for each number of copies left
+        unit (Unit): Unit being rolled for
+
+    Returns:
+        plotly.graph_objects._figure.Figure: Bar plot of expected number of shops rolls
+    """
+
+    return build_figure('n-other', x=n_left.astype(str), y=shops_for_plot, layout=figure_layout('n-other', name=unit.name))
+
+def n_pool_shop_curve(unit, nteam:int, nother:int, star:int, level:int, shop, units_per_cost:int) -> tuple:
+    """
+    Expected number of shops for every number of other units of the same cost left in 
+    the pool, computed in one pass with expected_shops().
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+        units_per_cost (int): How many units of the same cost are in the pool.
+
+    Returns:
+        n_pool (np.ndarray): Other units of the same cost left in the pool, largest first
+        shops (np.ndarray): Expected number of shops to the hundredths, NaN where the unit cannot be hit
+    """
+
+    nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+    ntot = int(shop.game_data.bag_sizes[cost-1])
+
+    npool = np.arange(ntot*units_per_cost - 1, ntot - 1, -1)
+
+    shops = expected_shops(nneeded, nleft, npool, cost_odd)
+    shops = np.array([ round(rolls, 2) for rolls in shops.tolist() ]) # same rounding as number_shops()
+
+    return npool - ntot, shops
 
 def n_pool_shop_distribution(unit, nteam:int, nother:int, star:int, level:int, shop, units_per_cost:int):
     """
@@ -302,51 +347,21 @@ def n_pool_shop_distribution(unit, nteam:int, nother:int, star:int, level:int, s
         plotly.graph_objects._figure.Figure: Bar plot showing the expected number of shops rolls
     """
     
-    cost = unit.cost
-    
-    ntot = [ cost.value for cost in BagSizes ][cost-1]
-    
-    ncost = ntot*units_per_cost
-        
-    shops = [ 
-             number_shops(
-                 unit, 
-                 nteam, 
-                 n, 
-                 nother, 
-                 star, 
-                 level, 
-                 shop, 
-                 round_to_int=False) 
-             for n in range(ntot, ncost)
-             ]
-    
-    shops_for_plot = [ rolls for rolls in shops ]
-    n_pool = np.arange(ntot, ncost) - ntot
-    shops_for_plot.reverse()
-    n_pool = n_pool[::-1]
-    
-    fig = px.bar(x=n_pool, y=shops_for_plot)
-    fig.update_layout(
-        xaxis_title=f"# of other {cost}-costs left in pool",
-        yaxis_title="Expected # of shops",
-        title=f"Effect of {cost}-cost pool size on expected # of shops",
-        template="simple_white",
-        dragmode=False,
-        hovermode="x",
-        hoverlabel_font_size=16,
-        font_size=14,
-        title_font_size=20,
-    )
-    fig.update_xaxes(
-        showspikes=True, 
-        spikesnap="cursor", 
-        spikemode="across",
-        spikethickness=0.5,
-    )
-    fig.update_traces(
-        hovertemplate="# left: %{x}<br>Expected # of shops: %{y}",
-        marker_color='white', marker_line_color='blue'
-    )
+    n_pool, shops = n_pool_shop_curve(unit, nteam, nother, star, level, shop, units_per_cost)
+
+    return n_pool_figure(n_pool, shops, unit.cost)
+
+def n_pool_figure(n_pool:np.ndarray, shops_for_plot:np.ndarray, cost:int):
+    """
+    Bar plot of the sweep from n_pool_shop_curve().
+
+    Args:
+        n_pool (np.ndarray): Other units of the same cost left in the pool
+        shops_for_plot (np.ndarray): Expected number of shops for each pool size
+        cost (int): Cost of the unit being rolled for
+
+    Returns:
+        plotly.graph_objects._figure.Figure: Bar plot showing the expected number of shops rolls
+    """
     
-    return fig
+    return build_figure('n-pool', x=n_pool, y=shops_for_plot, layout=figure_layout('n-pool', cost=cost))
@@ -0,0 +1,224 @@
+import json
+import numpy as np
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from .pipeline import OUTPUTS, build_state, compute_outputs, select_game
+from ..classes.bulk import iter_bulk, result_rows, validate_states
+from ..classes.multi import prepare_targets, multi_hit
+
+# most shop rolls a bulk request may ask hit probabilities for
+MAX_BULK_SHOPS = 1000
+
+# query parameters of a game state and their defaults, None when required
+PARAMETERS = {
+    'unit': '',
+    'cost': None,
+    'star': None,
+    'level': None,
+    'nteam': 0,
+    'nother': 0,
+    'n_out_of_pool': 0,
+    'engine': 'geometric',
+    'data': '',
+}
+
+def _series(values) -> list:
+    # plain lists for json, NaN (unit cannot be hit) becomes null
+    return [ None if value != value else value for value in np.asarray(values).tolist() ]
+
+def _serialize(outputs:dict) -> dict:
+    # numbers and lists only, no figures are built for the API
+    body = {}
+
+    if 'expected' in outputs:
+        expected = outputs['expected']
+        body['expected'] = None if isinstance(expected, str) else expected
+        if isinstance(expected, str):
+            body['message'] = expected
+
+    if 'cdf' in outputs:
+        rolls, cdf = outputs['cdf']
+        body['cdf'] = {'rolls': _series(rolls), 'probability': _series(cdf)}
+
+    if 'n_other' in outputs:
+        n_left, shops = outputs['n_other']
+        body['n_other'] = {'n_left': _series(n_left), 'shops': _series(shops)}
+
+    if 'n_pool' in outputs:
+        n_pool, shops = outputs['n_pool']
+        body['n_pool'] = {'n_pool': _series(n_pool), 'shops': _series(shops)}
+
+    return body
+
+def create_api(pool=None, shops:list=None, current=None) -> Blueprint:
+    """
+    JSON endpoints serving the numbers behind the figures, for bots and overlays. Every
+    endpoint takes a game state as query parameters (see PARAMETERS, the unit name is
+    optional and only echoed back) and answers with the same cached util math as the UI.
+    data picks another set or patch (see classes.registry.GameDataStore), the current
+    game data by default:
+
+    - /api/odds: every output
+    - /api/expected, /api/cdf, /api/n_other, /api/n_pool: one output
+
+    Invalid states get a 400 with an error message. Many states at once go through
+    POST /api/bulk and several units rolled for together through POST /api/multi, see
+    bulk() and multi() below.
+
+    Args:
+        pool (Pool): Pool giving the size of each cost
+        shops (list): Shops for levels 1-11
+        current (callable): Returns the (pool, shops) of each request instead, for game data
+            that is swapped while serving (see app.swap_game_data())
+
+    Returns:
+        flask.Blueprint: Blueprint to register on the Flask server
+    """
+
+    api = Blueprint('api', __name__, url_prefix='/api')
+
+    def game(key:str) -> tuple:
+        # read once per request, so a request never mixes two patches
+        return select_game(key, *((pool, shops) if current is None else current()))
+
+    def answer(outputs:tuple):
+        args = request.args
+
+        missing = [ name for name, default in PARAMETERS.items() if default is None and name not in args ]
+        if missing:
+            return jsonify({'error': f"Missing query parameters: {', '.join(missing)}"}), 400
+
+        values = { name: args.get(name, default) for name, default in PARAMETERS.items() }
+        values['unit'] = values['unit'] or f"{values['cost']}-cost Unit"
+
+        try:
+            pool, shops = game(values['data'])
+            state = build_state(values['unit'], values['cost'], values['star'], values['nteam'], values['nother'],
+                                values['n_out_of_pool'], values['level'], pool.game_data, values['engine'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            body = _serialize(compute_outputs(state, pool, shops, outputs))
+        except (ValueError, ArithmeticError) as e:
+            # a state the math cannot answer is the request's fault, not the server's
+            return jsonify({'error': f'Cannot compute this state: {e}'}), 400
+        body['state'] = {
+            'unit': state['unit'].name,
+            'cost': state['unit'].cost,
+            'star': state['star'],
+            'level': state['level'],
+            'nteam': state['nteam'],
+            'nother': state['nother'],
+            'n_out_of_pool': state['n_out_of_pool'],
+            'engine': state['engine'],
+            'data': values['data'],
+        }
+
+        return jsonify(body)
+
+    @api.get('/odds')
+    def odds():
+        return answer(OUTPUTS)
+
+    @api.get('/<any(expected, cdf, n_other, n_pool):output>')
+    def single(output:str):
+        return answer((output,))
+
+    @api.post('/bulk')
+    def bulk():
+        """
+        Expected shops, and with ?shops=N the probability of hitting within N rolls, for
+        many states. The body is either one json object of columns (see classes.bulk.COLUMNS)
+        or ndjson (application/x-ndjson) with an object of columns per line, read as it
+        arrives. Results stream back as ndjson, one state per line in request order, with
+        ?precise=1 rounding expected shops to the hundredths instead of an integer. An
+        invalid ndjson line ends the stream with an error line.
+        """
+
+        shops_arg = request.args.get('shops')
+        round_to_int = request.args.get('precise', '0') in ('', '0', 'false')
+
+        try:
+            shops = None if shops_arg is None else int(shops_arg)
+        except ValueError:
+            return jsonify({'error': 'shops must be an integer'}), 400
+
+        try:
+            game_data = game(request.args.get('data'))[0].game_data
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if shops is not None and not 1 <= shops <= MAX_BULK_SHOPS:
+            return jsonify({'error': f'shops must be between 1 and {MAX_BULK_SHOPS}'}), 400
+
+        if request.mimetype == 'application/x-ndjson':
+            # parsed lazily while streaming, a huge body is never held at once
+            chunks = ( json.loads(line) for line in request.stream if line.strip() )
+        else:
+            body = request.get_json(silent=True)
+            try:
+                chunks = [ validate_states(body, game_data) ]
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        def lines():
+            try:
+                for result in iter_bulk(chunks, game_data, shops):
+                    yield ''.join( json.dumps(row) + '\n' for row in result_rows(result, round_to_int) )
+            except ValueError as e:
+                yield json.dumps({'error': str(e)}) + '\n'
+
+        return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+    @api.post('/multi')
+    def multi():
+        """
+        Expected shops and CDF for hitting all or any of several units, see classes.multi.
+        The json body has targets (a list of objects with unit, cost, star and optionally
+        nteam and nother), level, mode ('all' or 'any', default 'all') and optionally
+        n_out_of_pool, a mapping from cost to other units of that cost out of the pool, and data.
+        """
+
+        body = request.get_json(silent=True)
+
+        try:
+            if not isinstance(body, dict) or not isinstance(body.get('targets'), list):
+                raise ValueError('Body must be a json object with a list of targets')
+
+            pool, shops = game(body.get('data'))
+
+            targets = []
+            for target in body['targets']:
+                if not isinstance(target, dict) or 'cost' not in target or 'star' not in target:
+                    raise ValueError('Every target needs a cost and a star level')
+                state = build_state(target.get('unit') or f"{target['cost']}-cost Unit", target['cost'], target['star'],
+                                    target.get('nteam'), target.get('nother'), 0, body.get('level'), pool.game_data)
+                targets.append((state['unit'], state['nteam'], state['nother'], state['star']))
+
+            n_out_of_pool = { int(cost): int(n) for cost, n in (body.get('n_out_of_pool') or {}).items() }
+            if any( n < 0 for n in n_out_of_pool.values() ):
+                raise ValueError('Numbers of units out of the pool cannot be negative')
+
+            level = int(body['level'])
+            mode = body.get('mode', 'all')
+            states = prepare_targets(targets, level, shops[level-1], mode)
+
+            if isinstance(states, str):
+                return jsonify({'expected': None, 'message': states})
+
+            # each cost's pool without the copies the targets already have out, as npool in number_shops()
+            pool_sizes = {}
+            for unit, nteam, nother, star in targets:
+                size = pool_sizes.get(unit.cost, pool.size(unit.cost) - n_out_of_pool.get(unit.cost, 0))
+                pool_sizes[unit.cost] = size - nteam - nother
+
+            cdf, expected = multi_hit(states, pool_sizes, mode)
+        except (TypeError, ValueError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'expected': round(expected, 2),
+            'cdf': {'rolls': list(range(1, cdf.size + 1)), 'probability': _series(cdf * 100)},
+        })
+
+    return api
@@ -0,0 +1,238 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from ..classes.util import process_state, number_shops, cdf_curve, n_other_shop_curve, n_pool_shop_curve
+from ..classes import hypergeometric
+from .metrics import instrument, register_cache, answer_lookups
+
+# shop models: independent geometric slots (classes.util), or one exact draw per reroll (classes.hypergeometric).
+# every computation is timed, these only run on a cache and answer table miss
+ENGINES = {
+    engine: { name: instrument('compute', function=name, engine=engine)(compute) for name, compute in functions.items() }
+    for engine, functions in (
+        ('geometric', {
+            'number_shops': number_shops,
+            'cdf_curve': cdf_curve,
+            'n_other_shop_curve': n_other_shop_curve,
+            'n_pool_shop_curve': n_pool_shop_curve,
+        }),
+        ('exact', {
+            'number_shops': hypergeometric.exact_number_shops,
+            'cdf_curve': hypergeometric.exact_cdf_curve,
+            'n_other_shop_curve': hypergeometric.exact_n_other_shop_curve,
+            'n_pool_shop_curve': hypergeometric.exact_n_pool_shop_curve,
+        }),
+    )
+}
+
+class LRUCache():
+    """
+    Bounded, thread-safe least-recently-used cache with hit and miss counters.
+    Values are computed outside the lock, so a slow computation never blocks
+    lookups from other threads; two threads missing the same key at once may
+    both compute it, and the last one wins.
+
+    Attributes:
+        maxsize (int): Most entries kept, 0 disables caching.
+        ttl (float): Seconds an entry stays valid, None for no expiry.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that had to compute their value.
+        evictions (int): Number of entries dropped for space or age.
+    """
+
+    def __init__(self, maxsize:int=4096, ttl:float=None) -> None:
+        """
+        Args:
+            maxsize (int): Most entries kept, 0 disables caching
+            ttl (float): Seconds an entry stays valid, None (default) for no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get_or_compute(self, key:tuple, compute):
+        """
+        Returns the cached value of key, computing and storing it on a miss.
+
+        Args:
+            key (tuple): Hashable, normalized key
+            compute (callable): Called without arguments to produce the value
+
+        Returns:
+            Cached or freshly computed value
+        """
+
+        now = time.monotonic()
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if entry is not None and (self.ttl is None or now - entry[0] <= self.ttl):
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry is not None:
+                del self.__entries[key]
+                self.evictions += 1
+
+            self.misses += 1
+
+        value = compute()
+
+        if self.maxsize > 0:
+            with self.__lock:
+                self.__entries[key] = (now, value)
+                self.__entries.move_to_end(key)
+
+                while len(self.__entries) > self.maxsize:
+                    self.__entries.popitem(last=False)
+                    self.evictions += 1
+
+        return value
+
+    def clear(self) -> None:
+        """
+        Drops every entry, counters are kept.
+
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+        return None
+
+    def stats(self) -> dict:
+        """
+        Getter for cache counters
+
+        Returns:
+            dict: hits, misses, evictions, size, maxsize and hit_rate
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.__entries),
+                'maxsize': self.maxsize,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# precomputed answers, consulted before the cache when the app has mapped one
+answers = None
+
+def set_answer_table(table) -> None:
+    """
+    Serves results from a memory-mapped classes.answers.AnswerTable when possible.
+    States outside the table still go through the cache.
+
+    Args:
+        table (AnswerTable): Mapped table, or None to stop using one
+
+    Returns:
+        None
+    """
+
+    global answers
+    answers = table
+
+    return None
+
+def _lookup(method:str, engine:str, *args):
+    # answer from the precomputed table, None when there is no table or the state is not in it.
+    # The table holds the geometric model only.
+    if answers is None or engine != 'geometric':
+        return None
+
+    answer = getattr(answers, method)(*args)
+    answer_lookups.labels(function=method, result='miss' if answer is None else 'hit').inc()
+
+    return answer
+
+results = LRUCache(
+    maxsize=int(os.environ.get('TFT_CACHE_SIZE', 4096)),
+    ttl=float(os.environ['TFT_CACHE_TTL']) if os.environ.get('TFT_CACHE_TTL') else None,
+)
+register_cache(results, 'results')
+
+def state_key(unit, nteam:int, nother:int, star:int, level:int, shop) -> tuple:
+    """
+    Normalizes a game state to what the math depends on. The unit name only appears in
+    figure titles, and different star levels, team counts and levels often lead to the
+    same copies needed, copies left and odds, so those states share one entry. The game
+    data version keeps entries from an older patch from being served.
+
+    Args:
+        unit (Unit): Unit being rolled for
+        nteam (int): Number of desired unit already purchased
+        nother (int): Number of desired unit on other boards or benches
+        star (int): Desired star level of desired unit
+        level (int): Current team level
+        shop (Shop): A shop object whose shared game data gives the bag sizes and odds
+
+    Returns:
+        tuple: (game data version, cost, copies needed, copies left, cost odds)
+    """
+
+    nneeded, nleft, cost, cost_odd = process_state(unit, nteam, nother, star, level, shop)
+
+    return shop.game_data.version, cost, nneeded, nleft, cost_odd
+
+def _read_only(*arrays) -> tuple:
+    # cached arrays are shared between requests, nobody may change them in place
+    for array in arrays:
+        array.setflags(write=False)
+    return arrays
+
+def cached_number_shops(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, round_to_int=True, engine:str='geometric'):
+    """
+    Memoized classes.util.number_shops(), same arguments and return value. engine picks the shop model, see ENGINES.
+    """
+    answer = _lookup('number_shops', engine, unit, nteam, npool, nother, star, level, shop, round_to_int)
+    if answer is not None:
+        return answer
+    compute = ENGINES[engine]['number_shops']
+    key = ('number_shops', engine, npool, round_to_int) + state_key(unit, nteam, nother, star, level, shop)
+    return results.get_or_compute(key, lambda: compute(unit, nteam, npool, nother, star, level, shop, round_to_int))
+
+def cached_cdf_curve(unit, nteam:int, npool:int, nother:int, star:int, level:int, shop, engine:str='geometric') -> tuple:
+    """
+    Memoized classes.util.cdf_curve(), same arguments and return value. The arrays are read-only.
+    """
+    answer = _lookup('cdf_curve', engine, unit, nteam, npool, nother, star, level, shop)
+    if answer is not None:
+        return answer
+    compute = ENGINES[engine]['cdf_curve']
+    key = ('cdf_curve', engine, npool) + state_key(unit, nteam, nother, star, level, shop)
+    return results.get_or_compute(key, lambda: _read_only(*compute(unit, nteam, npool, nother, star, level, shop)))
+
+def cached_n_other_shop_curve(unit, nteam:int, npool:int, star:int, level:int, shop, engine:str='geometric') -> tuple:
+    """
+    Memoized classes.util.n_other_shop_curve(), same arguments and return value. The arrays are read-only.
+    """
+    answer = _lookup('n_other_shop_curve', engine, unit, nteam, npool, star, level, shop)
+    if answer is not None:
+        return answer
+    compute = ENGINES[engine]['n_other_shop_curve']
+    key = ('n_other_shop_curve', engine, npool) + state_key(unit, nteam, 0, star, level, shop)
+    return results.get_or_compute(key, lambda: _read_only(*compute(unit, nteam, npool, star, level, shop)))
+
+def cached_n_pool_shop_curve(unit, nteam:int, nother:int, star:int, level:int, shop, units_per_cost:int, engine:str='geometric') -> tuple:
+    """
+    Memoized classes.util.n_pool_shop_curve(), same arguments and return value. The arrays are read-only.
+    """
+    answer = _lookup('n_pool_shop_curve', engine, unit, nteam, nother, star, level, shop, units_per_cost)
+    if answer is not None:
+        return answer
+    compute = ENGINES[engine]['n_pool_shop_curve']
+    key = ('n_pool_shop_curve', engine, units_per_cost) + state_key(unit, nteam, nother, star, level, shop)
+    return results.get_or_compute(key, lambda: _read_only(*compute(unit, nteam, nother, star, level, shop, units_per_cost)))
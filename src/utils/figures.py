@@ -0,0 +1,333 @@
+import os
+import copy
+import json
+import threading
+import numpy as np
+import plotly
+import plotly.graph_objects as go
+
+# graph ids are f'{name}-plot', client mode adds f'{name}-data' and f'{name}-template' stores
+FIGURES = ('roll-prob', 'n-other', 'n-pool')
+
+# layout strings that change with the state, as dotted paths into the layout
+LAYOUTS = {
+    'roll-prob': {'title.text': "Probability of hitting {star}-star {name} as you roll"},
+    'n-other': {'xaxis.title.text': "# of {name}'s left in pool"},
+    'n-pool': {
+        'xaxis.title.text': "# of other {cost}-costs left in pool",
+        'title.text': "Effect of {cost}-cost pool size on expected # of shops",
+    },
+}
+
+# skeletons built ahead of time, so starting the app does not build figures with plotly express
+SKELETONS_PATH = os.environ.get(
+    'TFT_SKELETONS_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'figures.json')
+)
+
+_skeletons = None
+_lock = threading.Lock()
+
+def _build_skeletons() -> dict:
+    # all figure styling lives here, the figures are built with plotly express once.
+    # plotly express and its templates take about a second to load, so it is imported here
+    import plotly.express as px
+
+    roll_fig = px.bar(x=[0], y=[0])
+    roll_fig.update_layout(
+        template="simple_white",
+        hovermode="x",
+        hoverlabel_font_size=16,
+        font_size=14,
+        title_font_size=20,
+        dragmode=False
+    )
+    roll_fig.update_xaxes(
+        title_text="Shop rolls",
+        range=[0, 100],
+        tick0=0,
+        dtick=20,
+        showspikes=True,
+        spikesnap="cursor",
+        spikemode="across",
+        spikethickness=0.5,
+        )
+    roll_fig.update_yaxes(
+        title_text="Probability of hitting",
+        ticksuffix= "%",
+    )
+    roll_fig.update_traces(
+        hovertemplate="# of shop rolls: %{x}<br>Probability of hitting: %{y:.2f}%",
+        marker_color='white', marker_line_color='blue')
+
+    other_fig = px.bar(x=['0'], y=[0])
+    other_fig.update_layout(
+        yaxis_title="Expected # of shops",
+        title="Effect of # left in pool on expected # of shops",
+        template="simple_white",
+        dragmode=False,
+        hovermode="x",
+        hoverlabel_font_size=16,
+        font_size=14,
+        title_font_size=20,
+    )
+    other_fig.update_xaxes(
+        showspikes=True,
+        spikesnap="cursor",
+        spikemode="across",
+        spikethickness=0.5,
+    )
+    other_fig.update_traces(
+        hovertemplate="# left: %{x}<br>Expected # of shops: %{y}",
+        marker_color='white', marker_line_color='blue', marker_line_width=1.5)
+
+    pool_fig = px.bar(x=[0], y=[0])
+    pool_fig.update_layout(
+        yaxis_title="Expected # of shops",
+        template="simple_white",
+        dragmode=False,
+        hovermode="x",
+        hoverlabel_font_size=16,
+        font_size=14,
+        title_font_size=20,
+    )
+    pool_fig.update_xaxes(
+        showspikes=True,
+        spikesnap="cursor",
+        spikemode="across",
+        spikethickness=0.5,
+    )
+    pool_fig.update_traces(
+        hovertemplate="# left: %{x}<br>Expected # of shops: %{y}",
+        marker_color='white', marker_line_color='blue'
+    )
+
+    # blank figures shown before the first Submit click or when the inputs are invalid
+    roll_blank = px.bar()
+    roll_blank.update_layout(
+        xaxis_title="Shop rolls",
+        yaxis_title="Probability of hitting",
+        title="Probability of hitting a unit as you roll",
+        template="simple_white",
+        font_size=14,
+        title_font_size=20,
+    )
+
+    other_blank = px.bar()
+    other_blank.update_layout(
+        xaxis_title="# of unit left in pool",
+        yaxis_title="Expected # of shops",
+        title="Effect of # left in pool on expected # of shops",
+        template="simple_white",
+        font_size=14,
+        title_font_size=20,
+    )
+    other_blank.update_traces(hovertemplate="# Left: %{x}<br>Expected # Shops: %{y}")
+
+    pool_blank = px.bar()
+    pool_blank.update_layout(
+        xaxis_title="# of other same-costs left in pool",
+        yaxis_title="Expected # of shops",
+        title="Effect of same-cost pool size on expected # of shops",
+        template="simple_white",
+        font_size=14,
+        title_font_size=20,
+    )
+    pool_blank.update_traces(hovertemplate="# Left: %{x}<br>Expected # Shops: %{y}")
+
+    skeletons = {}
+    for name, fig, blank in zip(FIGURES, (roll_fig, other_fig, pool_fig), (roll_blank, other_blank, pool_blank)):
+        fig.update_traces(x=[], y=[])
+        skeletons[name] = fig.to_dict()
+        skeletons[f'{name}-blank'] = blank.to_dict()
+
+    return skeletons
+
+def write_skeletons(path:str=SKELETONS_PATH) -> None:
+    """
+    Builds the skeletons and saves them for skeleton() to load, tagged with the plotly version.
+
+    Args:
+        path (str): Where to write the skeletons
+
+    Returns:
+        None
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as f:
+        json.dump({'plotly': plotly.__version__, 'skeletons': _build_skeletons()}, f)
+
+    return None
+
+def _load_skeletons(path:str=SKELETONS_PATH) -> dict:
+    # saved skeletons, or None when missing, unreadable or from another plotly version
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(saved, dict) or saved.get('plotly') != plotly.__version__:
+        return None
+
+    skeletons = saved.get('skeletons')
+    if not isinstance(skeletons, dict) or any( name not in skeletons or f'{name}-blank' not in skeletons for name in FIGURES ):
+        return None
+
+    return skeletons
+
+def skeleton(name:str) -> dict:
+    """
+    Getter for a figure skeleton, loaded from SKELETONS_PATH (see write_skeletons()) or
+    built on first use, and shared afterwards. Skeletons must not be changed,
+    build_figure() copies them.
+
+    Args:
+        name (str): One of FIGURES, or f'{name}-blank' for its blank figure
+
+    Returns:
+        dict: Styled figure with no data, as a plotly figure dict
+    """
+
+    global _skeletons
+
+    if _skeletons is None:
+        with _lock:
+            if _skeletons is None:
+                _skeletons = _load_skeletons() or _build_skeletons()
+
+    return _skeletons[name]
+
+def figure_layout(figure:str, **fields) -> dict:
+    """
+    Layout strings of a figure for one state.
+
+    Args:
+        figure (str): One of FIGURES
+        **fields: Values for the placeholders of LAYOUTS[figure], e.g. name, star or cost
+
+    Returns:
+        dict: Dotted layout paths and their text
+    """
+
+    return { path: text.format(**fields) for path, text in LAYOUTS[figure].items() }
+
+def build_figure(name:str, x=None, y=None, x0=None, dx=None, layout:dict=None) -> go.Figure:
+    """
+    Figure factory: copies a skeleton's traces and swaps in the data and layout strings.
+    The copy is not validated again, which is what makes this much cheaper than plotly express.
+
+    Args:
+        name (str): One of FIGURES, or f'{name}-blank' for its blank figure
+        x (array-like): x values, or None to space bars evenly from x0
+        y (array-like): y values
+        x0 (float): First x value when x is None
+        dx (float): Step between x values when x is None
+        layout (dict): Dotted layout paths and their text, e.g. from figure_layout()
+
+    Returns:
+        plotly.graph_objects._figure.Figure: The filled in figure
+    """
+
+    # only the traces and the layout keys written below are copied, the template and
+    # the rest of the layout are shared with the skeleton
+    fig = dict(skeleton(name))
+    fig['data'] = copy.deepcopy(fig['data'])
+    fig['layout'] = dict(fig['layout'])
+
+    if y is not None:
+        trace = fig['data'][0]
+        if x is None:
+            del trace['x']
+            trace['x0'], trace['dx'] = x0, dx
+        else:
+            trace['x'] = x
+        trace['y'] = y
+
+    for path, value in (layout or {}).items():
+        *keys, last = path.split('.')
+        node = fig['layout']
+        for key in keys:
+            child = dict(node.get(key, {}))
+            node[key] = child
+            node = child
+        node[last] = value
+
+    return go.Figure(fig, _validate=False)
+
+def blank_figures() -> tuple:
+    """
+    Blank figures shown before the first Submit click or when the inputs are invalid.
+
+    Returns:
+        tuple: Roll probability, units held and pool size figures
+    """
+
+    return tuple( build_figure(f'{name}-blank') for name in FIGURES )
+
+def figure_templates() -> dict:
+    """
+    Figure skeletons for the client to fill in, sent once with the page layout.
+
+    Returns:
+        dict: For each name in FIGURES, {'figure': skeleton, 'blank': blank figure} as plotly json
+    """
+
+    return { name: {'figure': skeleton(name), 'blank': skeleton(f'{name}-blank')} for name in FIGURES }
+
+def _series(values) -> list:
+    # hundredths are all the hover labels show, NaN goes out as null
+    return [ None if np.isnan(value) else round(value, 2) for value in np.asarray(values, dtype=float).tolist() ]
+
+def figure_payloads(state:dict, outputs:dict) -> tuple:
+    """
+    Compact form of the figures for one Submit click: the y values, an x start and step
+    for evenly spaced axes, and the few layout strings that depend on the state. The
+    client rebuilds the figures from these and the templates (see assets/figures.js).
+
+    Args:
+        state (dict): Parsed state from utils.pipeline.parse_state()
+        outputs (dict): Results from utils.pipeline.compute_outputs()
+
+    Returns:
+        tuple: Roll probability, units held and pool size payloads
+    """
+
+    unit, star = state['unit'], state['star']
+    rolls, cdf = outputs['cdf']
+    n_left, other_shops = outputs['n_other']
+    n_pool, pool_shops = outputs['n_pool']
+
+    if rolls.size == 0:
+        roll_payload = {'x': [0], 'y': [0]}
+    else:
+        roll_payload = {
+            'x0': int(rolls[0]),
+            'dx': 1,
+            'y': _series(cdf),
+            'layout': figure_layout('roll-prob', star=star, name=unit.name),
+        }
+
+    # categorical axis, the copies left are sent as labels
+    other_payload = {
+        'x': n_left.astype(str).tolist(),
+        'y': _series(other_shops),
+        'layout': figure_layout('n-other', name=unit.name),
+    }
+
+    pool_payload = {
+        'x0': int(n_pool[0]) if n_pool.size else 0,
+        'dx': -1,
+        'y': _series(pool_shops),
+        'layout': figure_layout('n-pool', cost=unit.cost),
+    }
+
+    return roll_payload, other_payload, pool_payload
+
+
+if __name__ == '__main__':
+    # written once at image build, see Dockerfile
+    write_skeletons()
+    print(f'Wrote figure skeletons to {SKELETONS_PATH}')
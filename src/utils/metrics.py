@@ -0,0 +1,155 @@
+import os
+import time
+import resource
+import functools
+from flask import Response
+from prometheus_client import CollectorRegistry, Counter, Histogram, ProcessCollector, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# set TFT_METRICS=0 to leave every function uninstrumented and serve no /metrics route
+ENABLED = os.environ.get('TFT_METRICS', '1') != '0'
+
+# app metrics only, kept apart from prometheus_client's global registry
+REGISTRY = CollectorRegistry()
+ProcessCollector(registry=REGISTRY)
+
+LATENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+MEMORY_BUCKETS = (0, 2**16, 2**18, 2**20, 2**22, 2**24, 2**26, 2**28)
+
+# label names of each kind of instrumented function
+KINDS = {
+    'callback': ('callback',),
+    'compute': ('function', 'engine'),
+}
+
+_histograms = {
+    kind: (
+        Histogram(f'tft_{kind}_wall_seconds', f'Wall time per {kind}', labels, registry=REGISTRY, buckets=LATENCY_BUCKETS),
+        Histogram(f'tft_{kind}_cpu_seconds', f'CPU time of the calling thread per {kind}', labels, registry=REGISTRY, buckets=LATENCY_BUCKETS),
+        Histogram(f'tft_{kind}_rss_growth_bytes', f'Resident memory gained during each {kind}', labels, registry=REGISTRY, buckets=MEMORY_BUCKETS),
+    )
+    for kind, labels in KINDS.items()
+}
+
+answer_lookups = Counter('tft_answer_table_lookups', 'Lookups in the precomputed answer table', ('function', 'result'), registry=REGISTRY)
+
+_page_size = resource.getpagesize()
+
+def _open_statm():
+    # a pread of /proc/self/statm is ~20x cheaper than psutil, which reads and parses more.
+    # /proc/self is resolved on open, so a forked worker opens its own
+    global _statm
+    try:
+        _statm = os.open('/proc/self/statm', os.O_RDONLY)
+    except OSError:
+        _statm = None
+
+_open_statm()
+os.register_at_fork(after_in_child=_open_statm)
+
+def _rss() -> int:
+    # resident set size of this process in bytes
+    if _statm is not None:
+        return int(os.pread(_statm, 64, 0).split()[1]) * _page_size
+
+    import psutil
+    return psutil.Process().memory_info().rss
+
+def instrument(kind:str, **labels):
+    """
+    Decorator recording wall time, CPU time and resident memory growth of every call in
+    the histograms of kind (see KINDS). The label children are resolved once here, so a
+    call costs two clock reads, two RSS reads and three observations on top of the
+    function, about 10 microseconds. Memory is the growth of the process RSS rather
+    than traced allocations, tracemalloc would slow every allocation down.
+
+    Args:
+        kind (str): 'callback' or 'compute'
+        **labels: Values of the labels of kind
+
+    Returns:
+        callable: Decorator, which returns the function unchanged when metrics are disabled
+    """
+
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        wall, cpu, memory = ( histogram.labels(**labels) for histogram in _histograms[kind] )
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start_wall, start_cpu, start_rss = time.perf_counter(), time.thread_time(), _rss()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                wall.observe(time.perf_counter() - start_wall)
+                cpu.observe(time.thread_time() - start_cpu)
+                memory.observe(max(_rss() - start_rss, 0))
+
+        return wrapper
+
+    return decorator
+
+class CacheCollector():
+    """
+    Exports the counters of an LRUCache at scrape time, so lookups pay nothing extra.
+
+    Attributes:
+        cache (LRUCache): Cache whose stats() are exported.
+        name (str): Value of the cache label.
+    """
+
+    def __init__(self, cache, name:str) -> None:
+        self.cache = cache
+        self.name = name
+
+    def collect(self):
+        stats = self.cache.stats()
+
+        for counter in ('hits', 'misses', 'evictions'):
+            family = CounterMetricFamily(f'tft_cache_{counter}', f'Result cache {counter}', labels=('cache',))
+            family.add_metric((self.name,), stats[counter])
+            yield family
+
+        for gauge, description in (('size', 'Entries in the result cache'), ('hit_rate', 'Share of lookups answered from the result cache')):
+            family = GaugeMetricFamily(f'tft_cache_{gauge}', description, labels=('cache',))
+            family.add_metric((self.name,), stats[gauge])
+            yield family
+
+def register_cache(cache, name:str) -> None:
+    """
+    Exports the counters of a cache on /metrics.
+
+    Args:
+        cache (LRUCache): Cache to export
+        name (str): Value of the cache label
+
+    Returns:
+        None
+    """
+
+    if ENABLED:
+        REGISTRY.register(CacheCollector(cache, name))
+
+    return None
+
+def register_metrics(server) -> None:
+    """
+    Serves every metric in the Prometheus text format on /metrics.
+
+    Args:
+        server (flask.Flask): Server of the Dash app
+
+    Returns:
+        None
+    """
+
+    if not ENABLED:
+        return None
+
+    @server.get('/metrics')
+    def metrics():
+        return Response(generate_latest(REGISTRY), content_type=CONTENT_TYPE_LATEST)
+
+    return None
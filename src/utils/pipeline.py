@@ -0,0 +1,179 @@
+import json
+import functools
+from ..classes.Unit import Unit
+from ..classes.Shop import Shop
+from ..classes.CountPool import CountPool
+from ..classes.registry import STORE_SIZE, store
+from .cache import ENGINES, cached_number_shops, cached_cdf_curve, cached_n_other_shop_curve, cached_n_pool_shop_curve
+
+OUTPUTS = ('expected', 'cdf', 'n_other', 'n_pool')
+
+def parse_state(unit_data:str, star_level:int, nteam:int, nother:int, n_out_of_pool:int, level:int, game_data, engine:str='geometric') -> dict:
+    """
+    Parses the selected unit and validates the control panel inputs once per Submit click.
+    Empty number inputs count as 0.
+
+    Args:
+        unit_data (str): json string of unit data, comes from the selected unit button
+        star_level (int): Star level of the unit
+        nteam (int): The number of the selected unit you have on your team
+        nother (int): The number of the selected unit on other boards and benches
+        n_out_of_pool (int): The number of units of the same cost as the desired unit that are out of the pool
+        level (int): Your team level
+        game_data (GameData): Shared game data, used for the valid levels
+        engine (str): Shop model, one of cache.ENGINES
+
+    Returns:
+        dict: unit (Unit), star, nteam, nother, n_out_of_pool, level and engine
+
+    Raises:
+        ValueError: With a message to show the user when an input is invalid
+    """
+
+    try:
+        unit_data = json.loads(unit_data)
+        unit_name, cost = unit_data['unit_name'], unit_data['cost']
+    except (TypeError, ValueError, KeyError):
+        raise ValueError('Please select a unit and fill in every input')
+
+    return build_state(unit_name, cost, star_level, nteam, nother, n_out_of_pool, level, game_data, engine)
+
+def build_state(unit_name:str, cost:int, star_level:int, nteam:int, nother:int, n_out_of_pool:int, level:int, game_data, engine:str='geometric') -> dict:
+    """
+    Validates a game state given as plain values, e.g. from the UI or the JSON API.
+    Empty number inputs count as 0.
+
+    Args:
+        unit_name (str): Name of the unit, only shown in titles
+        cost (int): Cost of the unit (1-5)
+        star_level (int): Star level of the unit
+        nteam (int): The number of the selected unit you have on your team
+        nother (int): The number of the selected unit on other boards and benches
+        n_out_of_pool (int): The number of units of the same cost as the desired unit that are out of the pool
+        level (int): Your team level
+        game_data (GameData): Shared game data, used for the valid levels
+        engine (str): Shop model, one of cache.ENGINES
+
+    Returns:
+        dict: unit (Unit), star, nteam, nother, n_out_of_pool, level and engine
+
+    Raises:
+        ValueError: With a message to show the user when an input is invalid
+    """
+
+    try:
+        cost = int(cost)
+        state = {
+            'star': int(star_level),
+            'nteam': int(nteam or 0),
+            'nother': int(nother or 0),
+            'n_out_of_pool': int(n_out_of_pool or 0),
+            'level': int(level),
+        }
+    except (TypeError, ValueError):
+        raise ValueError('Please select a unit and fill in every input')
+
+    if cost not in (1, 2, 3, 4, 5):
+        raise ValueError('Cost must be between 1 and 5')
+
+    if state['star'] not in (1, 2, 3):
+        raise ValueError('Star level must be 1, 2 or 3')
+
+    if not 1 <= state['level'] <= game_data.odds.shape[0]:
+        raise ValueError(f"Level must be between 1 and {game_data.odds.shape[0]}")
+
+    if not 0 <= state['nteam'] <= 8:
+        raise ValueError('Number already purchased must be between 0 and 8')
+
+    if state['nother'] < 0 or state['n_out_of_pool'] < 0:
+        raise ValueError('Numbers of units out of the pool cannot be negative')
+
+    # the copies of the unit stay in the pool, only the other units of its cost can be out of it,
+    # which keeps npool = pool size - n_out_of_pool - nteam at least nleft + nother
+    others = (int(game_data.units_per_cost[cost-1]) - 1) * int(game_data.bag_sizes[cost-1])
+    if state['n_out_of_pool'] > others:
+        raise ValueError(f'At most {others} other {cost} cost units can be out of the pool')
+
+    if engine not in ENGINES:
+        raise ValueError(f"Engine must be one of {', '.join(ENGINES)}")
+
+    # champions of the game data share one interned Unit, other names (only shown in titles) are not interned
+    unit_name = str(unit_name)
+    state['unit'] = Unit(unit_name, cost) if unit_name in game_data.unit_dict[cost] else Unit.unregistered(unit_name, cost)
+    state['engine'] = engine
+
+    return state
+
+def compute_outputs(state:dict, pool, shops:list, outputs:tuple=OUTPUTS) -> dict:
+    """
+    Computes Submit outputs from one parsed state. The pool size, shop and units per
+    cost are looked up once and shared by all the computations.
+
+    Args:
+        state (dict): Parsed state from parse_state()
+        pool (Pool): Pool giving the size of each cost
+        shops (list): Shops for levels 1-11
+        outputs (tuple): Outputs to compute, any of OUTPUTS (default all)
+
+    Returns:
+        dict: expected (int or str), cdf (rolls, cdf), n_other (n_left, shops) and n_pool (n_pool, shops),
+            for the requested outputs
+    """
+
+    unit = state['unit']
+    star, nteam, nother, level, engine = state['star'], state['nteam'], state['nother'], state['level'], state['engine']
+    shop = shops[level-1]
+
+    # pool left of the unit's cost once the known units are taken out
+    npool = pool.size(unit.cost) - state['n_out_of_pool'] - nteam
+    units_per_cost = int(shop.game_data.units_per_cost[unit.cost-1])
+
+    computations = {
+        'expected': lambda: cached_number_shops(unit, nteam, npool - nother, nother, star, level, shop, round_to_int=True, engine=engine),
+        'cdf': lambda: cached_cdf_curve(unit, nteam, npool - nother, nother, star, level, shop, engine),
+        'n_other': lambda: cached_n_other_shop_curve(unit, nteam, npool, star, level, shop, engine),
+        'n_pool': lambda: cached_n_pool_shop_curve(unit, nteam, nother, star, level, shop, units_per_cost, engine),
+    }
+
+    return { output: computations[output]() for output in outputs }
+
+@functools.lru_cache(maxsize=STORE_SIZE)
+def game_state(game_data) -> tuple:
+    """
+    Pool and shops of some game data, built once for each set or patch in the store.
+
+    Args:
+        game_data (GameData): Game data
+
+    Returns:
+        tuple: (pool, shops for levels 1-11)
+    """
+
+    return CountPool(game_data=game_data), [ Shop(level, game_data=game_data) for level in range(1, game_data.odds.shape[0] + 1) ]
+
+def select_game(key:str, pool, shops:list) -> tuple:
+    """
+    Pool and shops to answer with: the given ones for an empty key or the key of their
+    own game data, otherwise those of a set or patch in classes.registry.store.
+
+    Args:
+        key (str): Set number or patch version, None or '' for the given pool and shops
+        pool (Pool): Pool of the current game data
+        shops (list): Shops of the current game data
+
+    Returns:
+        tuple: (pool, shops)
+
+    Raises:
+        ValueError: With a message to show the user when there is no such set or patch
+    """
+
+    if not key:
+        return pool, shops
+
+    game_data = store.get(key)
+
+    if game_data is pool.game_data:
+        return pool, shops
+
+    return game_state(game_data)